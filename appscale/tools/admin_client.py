@@ -1,6 +1,12 @@
 """ A client that makes requests to the AdminServer. """
 
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from .waiter import Waiter
 
 # The default service.
 DEFAULT_SERVICE = 'default'
@@ -20,6 +26,24 @@ class AdminClient(object):
   # The Nginx port for the AdminServer.
   PORT = 17441
 
+  # The maximum number of connections to keep open to each AdminServer.
+  MAX_CONNECTIONS = 10
+
+  # The number of times to retry requests that fail to connect, or that
+  # fail with a status in RETRY_STATUSES. Only idempotent requests are retried
+  # after the AdminServer has received them.
+  MAX_RETRIES = 3
+
+  # Statuses that indicate that the AdminServer is temporarily unavailable.
+  RETRY_STATUSES = (502, 503, 504)
+
+  # The session that every client shares, so that connections are kept alive
+  # between requests and between clients.
+  _session = None
+
+  # Guards the creation of the shared session.
+  _session_lock = threading.Lock()
+
   def __init__(self, host, secret):
     """ Creates a new AdminClient.
 
@@ -32,6 +56,27 @@ class AdminClient(object):
     self.prefix = 'https://{}:{}/v1/apps'.format(host, self.PORT)
     requests.packages.urllib3.disable_warnings(
       requests.packages.urllib3.exceptions.InsecureRequestWarning)
+    self.session = self.get_session()
+
+  @classmethod
+  def get_session(cls):
+    """ Returns the session that clients make requests with.
+
+    Returns:
+      A requests.Session with a pool of keep-alive connections.
+    """
+    with cls._session_lock:
+      if cls._session is None:
+        retry = Retry(total=cls.MAX_RETRIES, backoff_factor=0.5,
+                      status_forcelist=cls.RETRY_STATUSES,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_maxsize=cls.MAX_CONNECTIONS,
+                              max_retries=retry)
+        session = requests.Session()
+        session.verify = False
+        session.mount('https://', adapter)
+        cls._session = session
+      return cls._session
 
   def extract_response(self, response):
     """ Processes AdminServer responses.
@@ -85,8 +130,7 @@ class AdminClient(object):
     if threadsafe is not None:
       body['threadsafe'] = threadsafe
 
-    response = requests.post(versions_url, headers=headers, json=body,
-                             verify=False)
+    response = self.session.post(versions_url, headers=headers, json=body)
     operation = self.extract_response(response)
     try:
       operation_id = operation['name'].split('/')[-1]
@@ -109,7 +153,7 @@ class AdminClient(object):
       format(prefix=self.prefix, project=project_id, service=DEFAULT_SERVICE,
              version=DEFAULT_VERSION)
     headers = {'AppScale-Secret': self.secret}
-    response = requests.delete(version_url, headers=headers, verify=False)
+    response = self.session.delete(version_url, headers=headers)
     operation = self.extract_response(response)
     try:
       # Operation names should match the following template:
@@ -132,5 +176,51 @@ class AdminClient(object):
     headers = {'AppScale-Secret': self.secret}
     operation_url = '{prefix}/{project}/operations/{operation_id}'.format(
       prefix=self.prefix, project=project, operation_id=operation_id)
-    response = requests.get(operation_url, headers=headers, verify=False)
+    response = self.session.get(operation_url, headers=headers)
     return self.extract_response(response)
+
+  def wait_for_operation(self, project, operation_id, deadline):
+    """ Waits for an operation to finish.
+
+    Args:
+      project: A string specifying the project ID.
+      operation_id: A string specifying the operation ID.
+      deadline: The number of seconds to wait for the operation.
+    Returns:
+      A dictionary containing the finished operation's details.
+    Raises:
+      TimeoutException if the operation does not finish in time.
+    """
+    operations = self.wait_for_operations([(project, operation_id)], deadline)
+    return operations[(project, operation_id)]
+
+  def wait_for_operations(self, operations, deadline, on_finish=None):
+    """ Waits for several operations to finish, polling each one until it
+    does. Polls start out frequent and back off while operations run.
+
+    Args:
+      operations: A list of (project ID, operation ID) tuples.
+      deadline: The number of seconds to wait for all of the operations.
+      on_finish: A function that is called with each operation's tuple and
+        details as soon as the operation finishes, or None.
+    Returns:
+      A dictionary mapping each (project ID, operation ID) tuple to the
+      finished operation's details.
+    Raises:
+      TimeoutException if any operation does not finish in time.
+    """
+    pending = list(operations)
+    finished = {}
+
+    def poll_pending():
+      for key in list(pending):
+        operation = self.get_operation(*key)
+        if operation['done']:
+          finished[key] = operation
+          pending.remove(key)
+          if on_finish is not None:
+            on_finish(key, operation)
+      return not pending
+
+    Waiter(deadline=deadline).wait(poll_pending)
+    return finished
@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+""" Keeps the artifacts of packaging applications on the local filesystem, so
+that redeploying an unchanged application doesn't repeat that work. """
+
+
+# General-purpose Python library imports
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+
+# AppScale-specific imports
+from app_manifest import AppManifest
+from appscale_logger import AppScaleLogger
+from local_state import LocalState
+
+
+class AppCache(object):
+  """ AppCache stores three kinds of artifacts under ~/.appscale/cache, each
+  named by a fingerprint of what it was made from:
+
+  - manifests: the hashes of an application's files, keyed by the relative
+    paths, sizes, modes and modification times of the files, so that an
+    unchanged tree doesn't need to be read and hashed again.
+  - tarballs: deterministic tar.gz files of an application, keyed by the
+    contents of its files, so that identical trees yield byte-identical
+    tarballs that only need to be compressed once. Archives that had to be
+    repacked are keyed by the archive's location, size and modification
+    time.
+  - go-extras: the files outside of a Go application that go-app-builder
+    found it to depend on, keyed by the app's Go sources, GOROOT, GOPATH and
+    the go-app-builder binary. They are only used while none of the files
+    and the directories holding them have changed, so that a new or edited
+    dependency is noticed.
+
+  Every use of an artifact marks it as recently used, and the least recently
+  used artifacts are removed once the cache grows past its size limit.
+  """
+
+
+  # The directory that artifacts are stored in, by default.
+  DEFAULT_DIRECTORY = os.path.join(LocalState.LOCAL_APPSCALE_PATH, 'cache')
+
+
+  # The number of bytes that the cache may hold, by default.
+  DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+
+  # The subdirectories that each kind of artifact is stored in.
+  MANIFESTS = 'manifests'
+  TARBALLS = 'tarballs'
+  GO_EXTRAS = 'go-extras'
+  KINDS = (MANIFESTS, TARBALLS, GO_EXTRAS)
+
+
+  # Guards eviction, since several applications can be deployed at once.
+  lock = threading.Lock()
+
+
+  def __init__(self, directory=DEFAULT_DIRECTORY, max_size=DEFAULT_MAX_SIZE,
+               hash_contents=False):
+    """ Creates a new AppCache.
+
+    Args:
+      directory: A str naming the directory to store artifacts in.
+      max_size: An int indicating how many bytes the cache may hold.
+      hash_contents: A bool that indicates if tree and archive fingerprints
+        should include the hashes of file contents, instead of trusting that
+        files with the same size and modification time are unchanged.
+    """
+    self.directory = directory
+    self.max_size = max_size
+    self.hash_contents = hash_contents
+
+
+  def path(self, kind, name):
+    """ Returns the location of an artifact.
+
+    Args:
+      kind: A str naming the kind of artifact.
+      name: A str containing the artifact's name within its kind.
+    Returns:
+      A str containing the location of the artifact.
+    """
+    return os.path.join(self.directory, kind, name)
+
+
+  def new_temp_path(self, kind):
+    """ Returns a location to build an artifact at before it is moved into
+    place, so that readers never see a partial artifact.
+
+    Args:
+      kind: A str naming the kind of artifact.
+    Returns:
+      A str containing an unused location in the kind's directory.
+    """
+    kind_dir = os.path.join(self.directory, kind)
+    if not os.path.isdir(kind_dir):
+      try:
+        os.makedirs(kind_dir)
+      except OSError:
+        # Another deploy may have just made it.
+        if not os.path.isdir(kind_dir):
+          raise
+    return os.path.join(kind_dir, '.new-{0}'.format(uuid.uuid4().hex))
+
+
+  def lookup(self, kind, name):
+    """ Finds an artifact, marking it as recently used.
+
+    Args:
+      kind: A str naming the kind of artifact.
+      name: A str containing the artifact's name within its kind.
+    Returns:
+      A str containing the location of the artifact, or None if it is not in
+      the cache.
+    """
+    location = self.path(kind, name)
+    try:
+      os.utime(location, None)
+    except OSError:
+      return None
+    return location
+
+
+  def store(self, temp_path, kind, name):
+    """ Moves a finished artifact into place, and evicts old artifacts if the
+    cache has grown too large.
+
+    Args:
+      temp_path: A str containing the location the artifact was built at.
+      kind: A str naming the kind of artifact.
+      name: A str containing the artifact's name within its kind.
+    Returns:
+      A str containing the location of the artifact.
+    """
+    location = self.path(kind, name)
+    try:
+      os.rename(temp_path, location)
+    except OSError:
+      # Another deploy stored the same artifact first, which is just as good.
+      if not os.path.exists(location):
+        raise
+      self.remove(temp_path)
+    self.evict(keep=location)
+    return location
+
+
+  @classmethod
+  def remove(cls, location):
+    """ Removes an artifact, ignoring ones that are already gone.
+
+    Args:
+      location: A str containing the location of the artifact.
+    """
+    if os.path.isdir(location):
+      shutil.rmtree(location, ignore_errors=True)
+    elif os.path.exists(location):
+      os.remove(location)
+
+
+  @classmethod
+  def get_size(cls, location):
+    """ Counts the bytes in an artifact.
+
+    Args:
+      location: A str containing the location of a file or directory.
+    Returns:
+      The number of bytes in the file, or in the files under the directory.
+    """
+    if not os.path.isdir(location):
+      return os.path.getsize(location)
+
+    size = 0
+    for root, _, filenames in os.walk(location):
+      for filename in filenames:
+        file_path = os.path.join(root, filename)
+        if not os.path.islink(file_path):
+          size += os.path.getsize(file_path)
+    return size
+
+
+  def evict(self, keep=None):
+    """ Removes the least recently used artifacts until the cache fits within
+    its size limit.
+
+    Args:
+      keep: A str containing the location of an artifact that should not be
+        removed, such as one that is about to be used.
+    """
+    with self.lock:
+      artifacts = []
+      for kind in self.KINDS:
+        kind_dir = os.path.join(self.directory, kind)
+        if not os.path.isdir(kind_dir):
+          continue
+        for name in os.listdir(kind_dir):
+          if name.startswith('.'):
+            continue
+          location = os.path.join(kind_dir, name)
+          try:
+            artifacts.append((os.path.getmtime(location),
+                              self.get_size(location), location))
+          except OSError:
+            continue
+
+      total_size = sum(size for _, size, _ in artifacts)
+      for _, size, location in sorted(artifacts):
+        if total_size <= self.max_size:
+          break
+        if location == keep:
+          continue
+        self.remove(location)
+        total_size -= size
+
+
+  def fingerprint_files(self, files, stats=None):
+    """ Computes a fingerprint of the files in an application.
+
+    Args:
+      files: A dict that maps paths in the application's tarball to the
+        location of each file on the local filesystem.
+      stats: A dict that maps the location of files to their stat results,
+        for the files that have already been stat'd.
+    Returns:
+      A str containing the fingerprint in hexadecimal.
+    """
+    stats = stats or {}
+    hasher = hashlib.sha1()
+    for tarball_path in sorted(files):
+      local_path = files[tarball_path]
+      file_stat = stats.get(local_path) or os.stat(local_path)
+      fields = [tarball_path, str(file_stat.st_size),
+                str(file_stat.st_mode & 0777), repr(file_stat.st_mtime)]
+      if self.hash_contents:
+        fields.append(AppManifest.hash_file(local_path))
+      hasher.update('\0'.join(fields) + '\n')
+    return hasher.hexdigest()
+
+
+  def fingerprint_archive(self, archive_location):
+    """ Computes a fingerprint of an archived application.
+
+    Args:
+      archive_location: A str containing the location of the archive.
+    Returns:
+      A str containing the fingerprint in hexadecimal.
+    """
+    archive_location = os.path.realpath(archive_location)
+    archive_stat = os.stat(archive_location)
+    fields = [archive_location, str(archive_stat.st_size),
+              repr(archive_stat.st_mtime)]
+    if self.hash_contents:
+      fields = [AppManifest.hash_file(archive_location)]
+    return hashlib.sha1('\0'.join(fields)).hexdigest()
+
+
+  def fingerprint_go_build(self, app_base, go_files, goroot, gopath,
+                           builder, stats=None):
+    """ Computes a fingerprint of everything that go-app-builder looks at to
+    find a Go application's dependencies.
+
+    Args:
+      app_base: A str containing the location of the application.
+      go_files: A dict that maps the paths of the app's Go sources to their
+        locations on the local filesystem.
+      goroot: A str containing the location of the Go installation.
+      gopath: A str containing the Go workspace's search path.
+      builder: A str containing the location of the go-app-builder binary.
+      stats: A dict that maps the location of files to their stat results,
+        for the files that have already been stat'd.
+    Returns:
+      A str containing the fingerprint in hexadecimal.
+    """
+    fields = [os.path.realpath(app_base), goroot, gopath,
+              self.fingerprint_files(go_files, stats),
+              self.fingerprint_files({builder: builder})]
+    return hashlib.sha1('\0'.join(fields)).hexdigest()
+
+
+  @classmethod
+  def fingerprint_dependencies(cls, extras):
+    """ Computes a fingerprint of the files that a Go application depends on,
+    and of the directories that hold them.
+
+    Args:
+      extras: A dict that maps the paths of the files in the application's
+        tarball to their locations on the local filesystem.
+    Returns:
+      A str containing the fingerprint in hexadecimal, or None if any of the
+      files or directories is gone.
+    """
+    locations = set(extras.itervalues())
+    locations.update([os.path.dirname(location) for location in locations])
+    hasher = hashlib.sha1()
+    for location in sorted(locations):
+      try:
+        location_stat = os.stat(location)
+      except OSError:
+        return None
+      hasher.update('\0'.join([location, str(location_stat.st_size),
+                               repr(location_stat.st_mtime)]) + '\n')
+    return hasher.hexdigest()
+
+
+  def get_go_extras(self, fingerprint):
+    """ Finds the dependencies that were stored for a Go application.
+
+    Args:
+      fingerprint: A str containing the fingerprint of the application's build
+        inputs.
+    Returns:
+      A dict that maps the paths of the extra files in the application's
+      tarball to their locations on the local filesystem, or None if they
+      have not been stored or might have changed.
+    """
+    location = self.lookup(self.GO_EXTRAS, fingerprint + '.json')
+    if location is None:
+      return None
+
+    try:
+      with open(location) as extras_file:
+        stored = json.load(extras_file)
+    except (IOError, ValueError):
+      return None
+
+    extras = dict((str(path), str(extra_location)) for path, extra_location
+                  in stored['extras'].iteritems())
+    if self.fingerprint_dependencies(extras) != stored['dependencies']:
+      return None
+    return extras
+
+
+  def put_go_extras(self, fingerprint, extras):
+    """ Stores the dependencies of a Go application.
+
+    Args:
+      fingerprint: A str containing the fingerprint of the application's build
+        inputs.
+      extras: A dict that maps the paths of the extra files in the
+        application's tarball to their locations on the local filesystem.
+    """
+    temp_path = self.new_temp_path(self.GO_EXTRAS)
+    with open(temp_path, 'w') as extras_file:
+      json.dump({'extras': extras,
+                 'dependencies': self.fingerprint_dependencies(extras)},
+                extras_file)
+    self.store(temp_path, self.GO_EXTRAS, fingerprint + '.json')
+
+
+  def get_manifest_entries(self, files, stats=None):
+    """ Finds the manifest entries that were stored for a set of files.
+
+    Args:
+      files: A dict that maps paths in the application's tarball to the
+        location of each file on the local filesystem.
+      stats: A dict that maps the location of files to their stat results,
+        for the files that have already been stat'd.
+    Returns:
+      A tuple containing the files' fingerprint and a dict with the stored
+      entries, or None if the files have not been seen before.
+    """
+    fingerprint = self.fingerprint_files(files, stats)
+    location = self.lookup(self.MANIFESTS, fingerprint + '.json')
+    if location is None:
+      return fingerprint, None
+
+    try:
+      with open(location) as manifest_file:
+        return fingerprint, json.load(manifest_file)
+    except (IOError, ValueError):
+      return fingerprint, None
+
+
+  def put_manifest_entries(self, fingerprint, entries):
+    """ Stores the manifest entries for a set of files.
+
+    Args:
+      fingerprint: A str containing the files' fingerprint.
+      entries: A dict containing the manifest's entries.
+    """
+    temp_path = self.new_temp_path(self.MANIFESTS)
+    with open(temp_path, 'w') as manifest_file:
+      json.dump(entries, manifest_file)
+    self.store(temp_path, self.MANIFESTS, fingerprint + '.json')
+
+
+  def tarball_writer(self, name, write_function):
+    """ Wraps a function that writes a tarball so that the tarball is only
+    produced once.
+
+    Args:
+      name: A str identifying the tarball, which must change whenever its
+        contents would.
+      write_function: A function that takes a file-like object and writes the
+        tarball to it.
+    Returns:
+      A function that takes a file-like object and writes the tarball to it,
+      copying the stored tarball if there is one, and storing the tarball
+      otherwise.
+    """
+    def write_tarball(fileobj):
+      location = self.lookup(self.TARBALLS, name)
+      if location is not None:
+        AppScaleLogger.log('Using the cached package of this application')
+        with open(location, 'rb') as cached_file:
+          shutil.copyfileobj(cached_file, fileobj)
+        return
+
+      temp_path = self.new_temp_path(self.TARBALLS)
+      try:
+        with open(temp_path, 'wb') as cached_file:
+          write_function(TeeWriter(fileobj, cached_file))
+      except Exception:
+        self.remove(temp_path)
+        raise
+      self.store(temp_path, self.TARBALLS, name)
+
+    return write_tarball
+
+
+class TeeWriter(object):
+  """ TeeWriter writes everything that is written to it to two file-like
+  objects. """
+
+  def __init__(self, first, second):
+    """ Creates a new TeeWriter.
+
+    Args:
+      first: The first file-like object to write to.
+      second: The second file-like object to write to.
+    """
+    self.first = first
+    self.second = second
+
+  def write(self, data):
+    """ Writes data to both file-like objects.
+
+    Args:
+      data: A str containing the data to write.
+    """
+    self.first.write(data)
+    self.second.write(data)
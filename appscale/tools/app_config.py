@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+""" Reads the settings in an application's app.yaml or appengine-web.xml
+file once, so that every check made before deploying it can share them. """
+
+
+# General-purpose Python library imports
+import os
+import re
+import threading
+import yaml
+
+
+# Third-party imports
+try:
+  from yaml import CSafeLoader as SafeLoader
+except ImportError:
+  from yaml import SafeLoader
+
+
+class AppConfig(object):
+  """ AppConfig holds the settings from an application's configuration file.
+
+  app.yaml files are parsed with libyaml's loader when PyYAML was built with
+  it, and with PyYAML's pure-Python loader otherwise. appengine-web.xml files
+  are searched for the few settings that AppScale needs.
+
+  AppConfigs are memoized by the location of the file, and reused for as
+  long as the file's modification time and size don't change.
+  """
+
+
+  # A regular expression that can be used to see if the given configuration file
+  # is a YAML File.
+  FILE_IS_YAML = re.compile(r'\.yaml\Z')
+
+
+  # A regular expression that can be used to find an appid in a XML file.
+  JAVA_APP_ID_REGEX = re.compile(r'<application>(.*)<\/application>')
+
+
+  # A regular expression for finding the threadsafe key in appengine-web.xml.
+  JAVA_THREADSAFE_REGEX = re.compile(r'<threadsafe>(.*)<\/threadsafe>')
+
+
+  # The AppConfigs that have been loaded, keyed by the location of their
+  # file, along with the modification time and size that they were read at.
+  loaded = {}
+
+
+  # Guards loaded, since several applications can be deployed at once.
+  lock = threading.Lock()
+
+
+  def __init__(self, config_file, contents):
+    """ Creates a new AppConfig, parsing a configuration file's contents.
+
+    Args:
+      config_file: A str containing the location of the app.yaml or
+        appengine-web.xml file.
+      contents: A str containing the file's contents.
+    Raises:
+      yaml.YAMLError: If an app.yaml file is not valid YAML.
+    """
+    self.config_file = config_file
+    self.is_yaml = bool(self.FILE_IS_YAML.search(config_file))
+    if self.is_yaml:
+      settings = yaml.load(contents, Loader=SafeLoader)
+      if not isinstance(settings, dict):
+        settings = {}
+      self.app_id = settings.get('application')
+      self.runtime = settings.get('runtime')
+      self.threadsafe = settings.get('threadsafe')
+      self.skip_files = settings.get('skip_files')
+      self.handlers = settings.get('handlers') or []
+    else:
+      app_id_matchdata = self.JAVA_APP_ID_REGEX.search(contents)
+      threadsafe_matchdata = self.JAVA_THREADSAFE_REGEX.search(contents)
+      self.app_id = app_id_matchdata.group(1) if app_id_matchdata else None
+      self.runtime = 'java'
+      self.threadsafe = threadsafe_matchdata.group(1) \
+        if threadsafe_matchdata else None
+      self.skip_files = None
+      self.handlers = []
+
+
+  @classmethod
+  def load(cls, config_file):
+    """ Reads an application's configuration file, unless it has already been
+    read and hasn't changed since.
+
+    Args:
+      config_file: A str containing the location of the app.yaml or
+        appengine-web.xml file.
+    Returns:
+      An AppConfig for the file.
+    Raises:
+      IOError: If the file can't be read.
+      yaml.YAMLError: If an app.yaml file is not valid YAML.
+    """
+    try:
+      file_stat = os.stat(config_file)
+      version = (file_stat.st_mtime, file_stat.st_size)
+    except OSError:
+      version = None
+
+    with cls.lock:
+      loaded_version, config = cls.loaded.get(config_file, (None, None))
+    if version is not None and version == loaded_version:
+      return config
+
+    with open(config_file, 'r') as file_handle:
+      config = cls(config_file, file_handle.read())
+
+    if version is not None:
+      with cls.lock:
+        cls.loaded[config_file] = (version, config)
+    return config
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+""" Describes the files in an application, so that everything that needs to
+know about them can share a single walk of its directory. """
+
+
+# General-purpose Python library imports
+import fnmatch
+import os
+
+
+# AppScale-specific imports
+from app_scanner import AppScanner
+
+
+class AppIndex(object):
+  """ AppIndex walks an application's directory once, recording each file
+  that is deployed along with its stat result, and each directory. Finding
+  the app's configuration files, its lib directories and its Go sources, and
+  packaging it, are then lookups in the index instead of walks of the tree.
+
+  The index reflects the tree when it was built, so it should only be kept
+  for as long as a single deployment of the app.
+  """
+
+
+  def __init__(self, app_location, scanner=None):
+    """ Creates a new AppIndex, walking the application's directory.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+      scanner: The AppScanner to walk the directory with, or None to use one
+        with the app's own ignore rules.
+    """
+    self.app_location = app_location
+    self.files = {}
+    self.stats = {}
+    self.directories = {}
+    self.files_by_name = {}
+    self.directories_by_name = {}
+
+    scanner = scanner or AppScanner(app_location)
+    for relative_dir, directory, subdirectories, filenames in scanner.walk():
+      for name in subdirectories:
+        local_path = os.path.join(directory, name)
+        self.directories[relative_dir + name] = local_path
+        self.directories_by_name.setdefault(name, []).append(local_path)
+
+      for name in filenames:
+        local_path = os.path.join(directory, name)
+        try:
+          self.stats[local_path] = os.stat(local_path)
+        except OSError:
+          # The file is a broken symbolic link, which can't be deployed.
+          continue
+        self.files[relative_dir + name] = local_path
+        self.files_by_name.setdefault(name, []).append(local_path)
+
+
+  def find_file(self, name):
+    """ Finds the first file with a given name, in the order that os.walk
+    would visit it.
+
+    Args:
+      name: A str containing the name of the file.
+    Returns:
+      A str containing the absolute location of the file, or None if the app
+      has no such file.
+    """
+    locations = self.files_by_name.get(name)
+    if not locations:
+      return None
+    return os.path.abspath(locations[0])
+
+
+  def find_directories(self, name):
+    """ Finds every directory with a given name.
+
+    Args:
+      name: A str containing the name of the directories.
+    Returns:
+      A list of strs containing the absolute locations of the directories.
+    """
+    return [os.path.abspath(local_path)
+            for local_path in self.directories_by_name.get(name, [])]
+
+
+  def match_files(self, pattern):
+    """ Finds the files whose names match a glob.
+
+    Args:
+      pattern: A str containing the glob, such as '*.go'.
+    Returns:
+      A sorted list of strs containing the files' paths relative to the app's
+      directory, separated by '/'.
+    """
+    return sorted(relative_path for relative_path in self.files
+                  if fnmatch.fnmatch(relative_path.rsplit('/', 1)[-1], pattern))
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+""" Describes the files in an application by their contents, so that a
+redeploy only needs to send the files that changed since the last one. """
+
+
+# General-purpose Python library imports
+import hashlib
+import json
+import os
+
+
+# AppScale-specific imports
+from app_packager import AppPackager
+from app_index import AppIndex
+
+
+class AppManifest(object):
+  """ AppManifest maps the path of each file in an application, relative to
+  the application's directory, to the SHA-1 hash, size, mode and modification
+  time of its contents.
+
+  The login node keeps the manifest of the last upload of each application,
+  along with a store of file contents named by their hashes. Comparing a new
+  manifest with the stored one tells us which contents the login node is
+  missing, and REBUILD_SCRIPT then rebuilds the full application tarball from
+  the store.
+  """
+
+
+  # The number of bytes to read at a time when hashing files.
+  HASH_BLOCK_SIZE = 1024 * 1024
+
+
+  # The name that the manifest is stored under in an upload.
+  MANIFEST_MEMBER = 'manifest.json'
+
+
+  # The directory that file contents are stored under in an upload.
+  CONTENTS_DIR = 'contents'
+
+
+  # A Python script that runs on the login node. It takes the location of an
+  # application's manifest and of the content store, and prints the entries of
+  # the manifest whose contents are in the store. It prints nothing if there
+  # is no manifest.
+  STORED_ENTRIES_SCRIPT = r"""
+import json
+import os
+import sys
+
+manifest_path, store_dir = sys.argv[1:3]
+try:
+  with open(manifest_path) as manifest_file:
+    manifest = json.load(manifest_file)
+except (IOError, ValueError):
+  sys.exit(0)
+
+print(json.dumps(dict(
+  (path, entry) for path, entry in manifest.items()
+  if os.path.exists(os.path.join(store_dir, entry['hash'])))))
+"""
+
+
+  # A Python script that runs on the login node. It takes the location of an
+  # upload, the content store, the application's manifest, and the tarball to
+  # write. It adds the upload's contents to the store, checking their hashes,
+  # writes the tarball and the manifest, and then removes contents that no
+  # application's manifest refers to once they are PRUNE_AGE seconds old. It
+  # exits with MISSING_CONTENTS if the store lacks any of the manifest's
+  # contents.
+  REBUILD_SCRIPT = r"""
+import hashlib
+import json
+import os
+import sys
+import tarfile
+import tempfile
+import time
+
+def make_temp_path(path):
+  # Each rebuild writes to a file of its own, so that concurrent rebuilds
+  # don't write to the same file before it is renamed into place.
+  handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                       prefix=os.path.basename(path) + '.',
+                                       suffix='.new')
+  os.close(handle)
+  os.chmod(temp_path, 0o644)
+  return temp_path
+
+upload_path, store_dir, manifest_path, output_path = sys.argv[1:5]
+manifest_dir = os.path.dirname(manifest_path)
+for directory in (store_dir, manifest_dir):
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+
+upload = tarfile.open(upload_path, 'r:*')
+manifest = None
+for member in upload:
+  if member.name == '{manifest_member}':
+    manifest = json.loads(upload.extractfile(member).read().decode('utf-8'))
+    continue
+  digest = os.path.basename(member.name)
+  source = upload.extractfile(member)
+  temp_path = make_temp_path(os.path.join(store_dir, digest))
+  hasher = hashlib.sha1()
+  with open(temp_path, 'wb') as temp_file:
+    while True:
+      block = source.read({block_size})
+      if not block:
+        break
+      hasher.update(block)
+      temp_file.write(block)
+  if hasher.hexdigest() != digest:
+    os.remove(temp_path)
+    sys.exit('Contents of {{0}} changed during the upload'.format(digest))
+  os.rename(temp_path, os.path.join(store_dir, digest))
+upload.close()
+os.remove(upload_path)
+
+missing = [path for path, entry in manifest.items()
+           if not os.path.exists(os.path.join(store_dir, entry['hash']))]
+if missing:
+  sys.stderr.write('Missing contents for {{0}}\n'.format(', '.join(missing)))
+  sys.exit({missing_contents})
+
+temp_output_path = make_temp_path(output_path)
+app_tar = tarfile.open(temp_output_path, 'w:gz')
+for path in sorted(manifest):
+  entry = manifest[path]
+  info = tarfile.TarInfo(path)
+  info.size = entry['size']
+  info.mode = entry['mode']
+  info.mtime = entry['mtime']
+  with open(os.path.join(store_dir, entry['hash']), 'rb') as contents:
+    app_tar.addfile(info, contents)
+app_tar.close()
+os.rename(temp_output_path, output_path)
+
+temp_manifest_path = make_temp_path(manifest_path)
+with open(temp_manifest_path, 'w') as manifest_file:
+  json.dump(manifest, manifest_file)
+os.rename(temp_manifest_path, manifest_path)
+
+referenced = set()
+for name in os.listdir(manifest_dir):
+  if name.endswith('.json'):
+    with open(os.path.join(manifest_dir, name)) as manifest_file:
+      referenced.update(entry['hash']
+                        for entry in json.load(manifest_file).values())
+# Contents that were stored recently may belong to an upload of another app
+# that is still in progress, so only old ones are removed.
+prune_before = time.time() - {prune_age}
+for name in os.listdir(store_dir):
+  content_path = os.path.join(store_dir, name)
+  if name not in referenced and os.path.getmtime(content_path) < prune_before:
+    os.remove(content_path)
+"""
+
+
+  # The exit status of REBUILD_SCRIPT when the store lacks some contents.
+  MISSING_CONTENTS = 3
+
+
+  # The number of seconds that contents no manifest refers to are kept for.
+  PRUNE_AGE = 60 * 60
+
+
+  def __init__(self, files, entries=None, stats=None):
+    """ Creates a new AppManifest, hashing each of the given files.
+
+    Args:
+      files: A dict that maps paths in the application's tarball to the
+        location of each file on the local filesystem.
+      entries: A dict containing the entries of the files, if they are
+        already known, so that the files don't need to be hashed.
+      stats: A dict that maps the location of files to their stat results,
+        for the files that have already been stat'd.
+    """
+    self.files = files
+    self.entries = entries
+    if entries is not None:
+      return
+
+    self.entries = {}
+    stats = stats or {}
+    for tarball_path, local_path in files.iteritems():
+      file_stat = stats.get(local_path) or os.stat(local_path)
+      self.entries[tarball_path] = {
+        'hash': self.hash_file(local_path),
+        'size': file_stat.st_size,
+        'mode': file_stat.st_mode & 0777,
+        'mtime': int(file_stat.st_mtime)
+      }
+
+
+  @classmethod
+  def collect_files(cls, app_location, extras=None, index=None):
+    """ Finds the files in an application that should be uploaded, leaving
+    out the ones that AppScanner skips.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+      extras: A dictionary containing a list of files to include in the upload.
+      index: The AppIndex of the application, or None to walk its directory.
+    Returns:
+      A dict that maps paths in the application's tarball to the location of
+      each file on the local filesystem.
+    """
+    index = index or AppIndex(app_location)
+    app_files = {}
+    for relative_path, local_path in index.files.iteritems():
+      relative_dir, filename = os.path.split(relative_path)
+      app_files[os.path.join(relative_dir or '.', filename)] = local_path
+
+    if extras is not None:
+      app_files.update(extras)
+    return app_files
+
+
+  @classmethod
+  def from_directory(cls, app_location, extras=None, cache=None, index=None):
+    """ Creates an AppManifest for the files in an application.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+      extras: A dictionary containing a list of files to include in the upload.
+      cache: The AppCache to look up and store the files' entries in, or None
+        to always hash the files.
+      index: The AppIndex of the application, or None to walk its directory.
+    Returns:
+      An AppManifest for the application.
+    """
+    index = index or AppIndex(app_location)
+    files = cls.collect_files(app_location, extras, index)
+    if cache is None:
+      return cls(files, stats=index.stats)
+
+    fingerprint, entries = cache.get_manifest_entries(files, index.stats)
+    if entries is not None:
+      return cls(files, entries)
+
+    manifest = cls(files, stats=index.stats)
+    cache.put_manifest_entries(fingerprint, manifest.entries)
+    return manifest
+
+
+  @classmethod
+  def hash_file(cls, local_path):
+    """ Computes the SHA-1 hash of a file's contents.
+
+    Args:
+      local_path: The location of the file on the local filesystem.
+    Returns:
+      A str containing the hash in hexadecimal.
+    """
+    hasher = hashlib.sha1()
+    with open(local_path, 'rb') as local_file:
+      while True:
+        block = local_file.read(cls.HASH_BLOCK_SIZE)
+        if not block:
+          break
+        hasher.update(block)
+    return hasher.hexdigest()
+
+
+  def fingerprint(self):
+    """ Computes a fingerprint of the application's files that only changes
+    when their paths, contents, modes or modification times do.
+
+    Returns:
+      A str containing the fingerprint in hexadecimal.
+    """
+    return hashlib.sha1(json.dumps(self.entries, sort_keys=True)).hexdigest()
+
+
+  def total_size(self):
+    """ Returns the number of bytes in all of the application's files. """
+    return sum(entry['size'] for entry in self.entries.itervalues())
+
+
+  def missing_from(self, stored_entries):
+    """ Finds the files whose contents are not described by another manifest.
+
+    Args:
+      stored_entries: A dict containing the entries of the manifest that the
+        login node has, or None if it has none.
+    Returns:
+      A dict that maps the hash of each missing content to a path in the
+      application's tarball with that content.
+    """
+    stored_hashes = set()
+    if stored_entries:
+      stored_hashes = set(entry['hash']
+                          for entry in stored_entries.itervalues())
+
+    missing = {}
+    for tarball_path, entry in self.entries.iteritems():
+      if entry['hash'] not in stored_hashes:
+        missing.setdefault(entry['hash'], tarball_path)
+    return missing
+
+
+  def content_size(self, missing):
+    """ Counts the bytes of file contents that an upload would send.
+
+    Args:
+      missing: A dict that maps the hash of each content to send to a path in
+        the application's tarball with that content.
+    Returns:
+      The number of bytes of file contents in the upload.
+    """
+    return sum(self.entries[tarball_path]['size']
+               for tarball_path in missing.itervalues())
+
+
+  def write_upload(self, fileobj, missing, packager=None):
+    """ Writes a compressed tar stream containing this manifest and the given
+    contents.
+
+    Args:
+      fileobj: A file-like object to write the stream to.
+      missing: A dict that maps the hash of each content to send to a path in
+        the application's tarball with that content.
+      packager: The AppPackager to compress the stream with, or None to use
+        gzip at the default level.
+    """
+    packager = packager or AppPackager()
+    with packager.open(fileobj) as upload:
+      upload.add_data(self.MANIFEST_MEMBER, json.dumps(self.entries))
+      for digest, tarball_path in sorted(missing.iteritems()):
+        upload.add_file(self.files[tarball_path],
+                        '{0}/{1}'.format(self.CONTENTS_DIR, digest))
+
+
+  def write_tarball(self, fileobj, packager=None):
+    """ Writes a compressed tar stream containing all of the application's
+    files.
+
+    Args:
+      fileobj: A file-like object to write the stream to.
+      packager: The AppPackager to compress the stream with, or None to use
+        gzip at the default level.
+    """
+    (packager or AppPackager()).write_files(fileobj, self.files)
+
+
+class ChecksumWriter(object):
+  """ ChecksumWriter passes data on to a file-like object, keeping count of
+  the bytes written and their SHA-1 hash. """
+
+  def __init__(self, fileobj):
+    """ Creates a new ChecksumWriter.
+
+    Args:
+      fileobj: The file-like object to write to.
+    """
+    self.fileobj = fileobj
+    self.hasher = hashlib.sha1()
+    self.bytes_written = 0
+
+  def write(self, data):
+    """ Writes data to the underlying file-like object.
+
+    Args:
+      data: A str containing the data to write.
+    """
+    self.fileobj.write(data)
+    self.hasher.update(data)
+    self.bytes_written += len(data)
+
+  def hexdigest(self):
+    """ Returns the SHA-1 hash of the data written so far, in hexadecimal. """
+    return self.hasher.hexdigest()
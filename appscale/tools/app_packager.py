@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+""" Packages application files into compressed tar archives, compressing
+independent blocks on several threads at once. """
+
+
+# General-purpose Python library imports
+import bz2
+import multiprocessing
+import os
+import Queue
+import struct
+import tarfile
+import threading
+import time
+import zlib
+from StringIO import StringIO
+
+
+class AppPackager(object):
+  """ AppPackager writes tar archives of application files with a selectable
+  codec and compression level.
+
+  The default codec, gzip, splits the archive into blocks that are deflated
+  independently on a pool of threads, in the manner of pigz, and joins them
+  into a single gzip member that any gzip reader accepts. Files that are
+  already compressed, like jars and images, are stored instead of being
+  deflated again. The bzip2 codec trades speed for smaller archives, and is
+  only understood by readers that detect the compression of an archive.
+  """
+
+
+  # The codec that writes gzip-compatible archives.
+  GZIP = 'gzip'
+
+
+  # The codec that writes bzip2-compressed archives.
+  BZIP2 = 'bzip2'
+
+
+  # The codecs that archives can be written with.
+  CODECS = (GZIP, BZIP2)
+
+
+  # The compression level to use, by default.
+  DEFAULT_LEVEL = 6
+
+
+  # The number of bytes of the archive that are compressed together.
+  BLOCK_SIZE = 128 * 1024
+
+
+  # The extensions of files whose contents are already compressed.
+  STORED_EXTENSIONS = frozenset([
+    '.7z', '.bz2', '.ear', '.eot', '.gif', '.gz', '.ico', '.jar', '.jpeg',
+    '.jpg', '.mp3', '.mp4', '.ogg', '.png', '.tgz', '.war', '.webm', '.webp',
+    '.woff', '.woff2', '.xz', '.zip'
+  ])
+
+
+  def __init__(self, codec=GZIP, level=DEFAULT_LEVEL, workers=None):
+    """ Creates a new AppPackager.
+
+    Args:
+      codec: A str naming the codec to compress archives with.
+      level: An int between 1 and 9 indicating how hard to compress.
+      workers: An int indicating how many threads compress gzip blocks, or
+        None to use one per CPU.
+    Raises:
+      ValueError: If the codec or level is not supported.
+    """
+    if codec not in self.CODECS:
+      raise ValueError('Unknown codec {0}'.format(codec))
+    if not 1 <= level <= 9:
+      raise ValueError('Compression levels are between 1 and 9')
+
+    self.codec = codec
+    self.level = level
+    self.workers = workers or multiprocessing.cpu_count()
+
+
+  @classmethod
+  def is_compressed(cls, path):
+    """ Checks if a file's contents are already compressed, judging by its
+    name.
+
+    Args:
+      path: A str containing the name or location of the file.
+    Returns:
+      True if the file should be stored as is, and False otherwise.
+    """
+    return os.path.splitext(path)[1].lower() in cls.STORED_EXTENSIONS
+
+
+  def open(self, fileobj):
+    """ Starts writing an archive.
+
+    Args:
+      fileobj: A file-like object to write the compressed archive to.
+    Returns:
+      An AppArchive to add files to.
+    """
+    if self.codec == self.BZIP2:
+      compressor = BZ2Writer(fileobj, self.level)
+    else:
+      compressor = ParallelGzipWriter(fileobj, self.level, self.workers,
+                                      self.BLOCK_SIZE)
+    return AppArchive(compressor, self.is_compressed)
+
+
+  def write_files(self, fileobj, files):
+    """ Writes an archive containing the given files.
+
+    Args:
+      fileobj: A file-like object to write the compressed archive to.
+      files: A dict that maps paths in the archive to the location of each
+        file on the local filesystem.
+    """
+    with self.open(fileobj) as archive:
+      for tarball_path in sorted(files):
+        archive.add_file(files[tarball_path], tarball_path)
+
+
+class AppArchive(object):
+  """ AppArchive adds files to a tar archive that is being compressed,
+  telling the compressor which files to store as is. """
+
+  def __init__(self, compressor, is_compressed):
+    """ Creates a new AppArchive.
+
+    Args:
+      compressor: The ParallelGzipWriter or BZ2Writer to write the tar
+        archive to.
+      is_compressed: A function that takes a file's path and returns True if
+        its contents are already compressed.
+    """
+    self.compressor = compressor
+    self.is_compressed = is_compressed
+    self.tar = tarfile.open(fileobj=compressor, mode='w', dereference=True)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.close()
+    else:
+      self.compressor.abort()
+
+  @classmethod
+  def normalize(cls, info):
+    """ Clears the parts of a member's header that depend on who packaged it,
+    so that identical files always produce identical archives.
+
+    Args:
+      info: The tarfile.TarInfo describing the member.
+    Returns:
+      The same TarInfo.
+    """
+    info.uid = info.gid = 0
+    info.uname = info.gname = ''
+    info.mtime = int(info.mtime)
+    return info
+
+  def add_file(self, local_path, tarball_path):
+    """ Adds a file from the local filesystem to the archive.
+
+    Args:
+      local_path: A str containing the location of the file.
+      tarball_path: A str containing the path to store the file under.
+    """
+    info = self.normalize(self.tar.gettarinfo(local_path, tarball_path))
+    self.compressor.set_stored(self.is_compressed(local_path))
+    try:
+      with open(local_path, 'rb') as local_file:
+        self.tar.addfile(info, local_file)
+    finally:
+      self.compressor.set_stored(False)
+
+  def add_member(self, info, member_file):
+    """ Adds a member read from another archive to the archive.
+
+    Args:
+      info: The tarfile.TarInfo describing the member, named with the path
+        to store it under.
+      member_file: A file-like object to read the member's contents from, or
+        None if it has no contents.
+    """
+    self.compressor.set_stored(self.is_compressed(info.name))
+    try:
+      self.tar.addfile(self.normalize(info), member_file)
+    finally:
+      self.compressor.set_stored(False)
+
+  def add_data(self, tarball_path, data):
+    """ Adds a file with the given contents to the archive.
+
+    Args:
+      tarball_path: A str containing the path to store the file under.
+      data: A str containing the file's contents.
+    """
+    info = tarfile.TarInfo(tarball_path)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    self.tar.addfile(self.normalize(info), StringIO(data))
+
+  def close(self):
+    """ Finishes the archive and its compressed stream. """
+    try:
+      self.tar.close()
+    except Exception:
+      self.compressor.abort()
+      raise
+    self.compressor.close()
+
+
+class ParallelGzipWriter(object):
+  """ ParallelGzipWriter compresses what is written to it into a single gzip
+  member, deflating each block on a pool of threads.
+
+  Each block is deflated on its own and ends on a byte boundary with a sync
+  flush, so the blocks can be joined into one deflate stream. Blocks that are
+  marked as stored are written at level 0, which wraps them in stored deflate
+  blocks.
+  """
+
+  # The byte that marks the operating system as unknown in gzip headers.
+  UNKNOWN_OS = 255
+
+  def __init__(self, fileobj, level, workers, block_size):
+    """ Creates a new ParallelGzipWriter and writes the gzip header.
+
+    Args:
+      fileobj: A file-like object to write the compressed stream to.
+      level: An int between 1 and 9 indicating how hard to compress.
+      workers: An int indicating how many threads compress blocks.
+      block_size: An int indicating how many bytes are compressed together.
+    """
+    self.fileobj = fileobj
+    self.level = level
+    self.block_size = block_size
+    self.crc = zlib.crc32('') & 0xffffffff
+    self.size = 0
+    self.stored = False
+    self.buffer = []
+    self.buffered = 0
+
+    # Blocks are written in the order they were queued, so at most a few per
+    # worker are held in memory at once.
+    self.in_flight = []
+    self.max_in_flight = workers * 2
+    self.tasks = Queue.Queue()
+    self.threads = []
+    if workers > 1:
+      for _ in range(workers):
+        thread = threading.Thread(target=self.compress_blocks)
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+
+    extra_flags = '\x02' if level == 9 else '\x04' if level == 1 else '\x00'
+    # The header has no modification time, so that the same archive is always
+    # compressed to the same bytes.
+    self.fileobj.write('\x1f\x8b\x08\x00' + struct.pack('<I', 0) +
+                       extra_flags + chr(self.UNKNOWN_OS))
+
+  @classmethod
+  def deflate(cls, data, level):
+    """ Compresses a block so that it can be followed by other blocks.
+
+    Args:
+      data: A str containing the block.
+      level: An int between 0 and 9 indicating how hard to compress.
+    Returns:
+      A str containing the raw deflate data.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+  def compress_blocks(self):
+    """ Compresses queued blocks until a None is queued. """
+    while True:
+      task = self.tasks.get()
+      if task is None:
+        return
+      data, level, result, done = task
+      try:
+        result['data'] = self.deflate(data, level)
+      except Exception as error:
+        result['error'] = error
+      done.set()
+
+  def set_stored(self, stored):
+    """ Selects whether the data written next is stored or deflated.
+
+    Args:
+      stored: A bool indicating if the data is already compressed.
+    """
+    if stored != self.stored:
+      self.queue_block()
+      self.stored = stored
+
+  def tell(self):
+    """ Returns the number of uncompressed bytes written so far. """
+    return self.size
+
+  def write(self, data):
+    """ Compresses data into the stream.
+
+    Args:
+      data: A str containing the data to write.
+    """
+    if not data:
+      return
+    self.crc = zlib.crc32(data, self.crc) & 0xffffffff
+    self.size += len(data)
+    self.buffer.append(data)
+    self.buffered += len(data)
+    if self.buffered >= self.block_size:
+      self.queue_block()
+
+  def queue_block(self):
+    """ Hands the buffered data to the compressing threads. """
+    if not self.buffered:
+      return
+    data = ''.join(self.buffer)
+    self.buffer = []
+    self.buffered = 0
+    level = 0 if self.stored else self.level
+
+    if not self.threads:
+      self.fileobj.write(self.deflate(data, level))
+      return
+
+    if len(self.in_flight) >= self.max_in_flight:
+      self.write_oldest_block()
+    result = {}
+    done = threading.Event()
+    self.tasks.put((data, level, result, done))
+    self.in_flight.append((result, done))
+
+  def write_oldest_block(self):
+    """ Waits for the oldest queued block to be compressed and writes it.
+
+    Raises:
+      Exception: If the block could not be compressed.
+    """
+    result, done = self.in_flight.pop(0)
+    done.wait()
+    if 'error' in result:
+      raise result['error']
+    self.fileobj.write(result['data'])
+
+  def close(self):
+    """ Writes the remaining blocks and the gzip trailer. """
+    self.queue_block()
+    try:
+      while self.in_flight:
+        self.write_oldest_block()
+    finally:
+      self.stop_threads()
+    final_block = zlib.compressobj(self.level, zlib.DEFLATED,
+                                   -zlib.MAX_WBITS).flush(zlib.Z_FINISH)
+    self.fileobj.write(final_block + struct.pack('<II', self.crc,
+                                                 self.size & 0xffffffff))
+
+  def abort(self):
+    """ Stops compressing without finishing the stream. """
+    self.in_flight = []
+    self.stop_threads()
+
+  def stop_threads(self):
+    """ Waits for the compressing threads to finish their work and exit. """
+    for _ in self.threads:
+      self.tasks.put(None)
+    for thread in self.threads:
+      thread.join()
+    self.threads = []
+
+
+class BZ2Writer(object):
+  """ BZ2Writer compresses what is written to it into a bzip2 stream. """
+
+  def __init__(self, fileobj, level):
+    """ Creates a new BZ2Writer.
+
+    Args:
+      fileobj: A file-like object to write the compressed stream to.
+      level: An int between 1 and 9 indicating how hard to compress.
+    """
+    self.fileobj = fileobj
+    self.compressor = bz2.BZ2Compressor(level)
+    self.size = 0
+
+  def set_stored(self, stored):
+    """ Does nothing, since bzip2 has no way to store data as is. """
+    pass
+
+  def tell(self):
+    """ Returns the number of uncompressed bytes written so far. """
+    return self.size
+
+  def write(self, data):
+    """ Compresses data into the stream.
+
+    Args:
+      data: A str containing the data to write.
+    """
+    self.size += len(data)
+    self.fileobj.write(self.compressor.compress(data))
+
+  def close(self):
+    """ Writes the end of the stream. """
+    self.fileobj.write(self.compressor.flush())
+
+  def abort(self):
+    """ Stops compressing without finishing the stream. """
+    pass
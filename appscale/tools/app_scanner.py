@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+""" Finds the files in an application that should be deployed, skipping the
+ones that its owner or App Engine's skip_files say to leave out. """
+
+
+# General-purpose Python library imports
+import fnmatch
+import os
+import re
+import yaml
+
+
+# Third-party imports
+try:
+  from os import scandir
+except ImportError:
+  try:
+    from scandir import scandir
+  except ImportError:
+    scandir = None
+
+
+# AppScale-specific imports
+from app_config import AppConfig
+from custom_exceptions import AppEngineConfigException
+
+
+class AppScanner(object):
+  """ AppScanner walks an application's directory, yielding the files to
+  deploy one at a time, so that memory use doesn't grow with the size of the
+  tree.
+
+  A file or directory is left out if it matches the skip_files regular
+  expressions in the app's app.yaml, or the last of the ignore patterns that
+  it matches doesn't start with '!'. The ignore patterns are DEFAULT_IGNORES
+  followed by the lines of the app's .appscaleignore file, and work like
+  .gitignore patterns: a pattern ending in '/' only matches directories, one
+  containing a '/' is matched against the path from the app's directory, and
+  any other is matched against the name alone. Wildcards never match a '/',
+  so 'static/*.png' only matches the images directly in static, but a '**'
+  between slashes matches any number of directories. Directories that are
+  left out are not descended into.
+
+  Directories are listed with os.scandir, or the scandir package on Python 2,
+  when it is available, so that telling files from directories doesn't need a
+  stat call for each entry.
+  """
+
+
+  # The name of the file that App Engine reads skip_files from.
+  APP_YAML = 'app.yaml'
+
+
+  # The name of the file that lists an application's ignore patterns.
+  IGNORE_FILE = '.appscaleignore'
+
+
+  # The patterns of files and directories that are never deployed, such as
+  # version control metadata, dependency caches and compiled Python files.
+  DEFAULT_IGNORES = [
+    '.git/', '.hg/', '.svn/', '.bzr/', 'CVS/', '.idea/', '.vscode/',
+    '__pycache__/', 'node_modules/', '*.pyc', '*.pyo', '*~', '#*#',
+    '.DS_Store', '.*.swp', IGNORE_FILE
+  ]
+
+
+  def __init__(self, app_location, ignore_patterns=None):
+    """ Creates a new AppScanner, reading the app's ignore rules.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+      ignore_patterns: A list of strs containing patterns to ignore, or None
+        to read them from the app's .appscaleignore file.
+    Raises:
+      AppEngineConfigException: If the app's skip_files are not valid regular
+        expressions.
+    """
+    self.app_location = app_location
+    if ignore_patterns is None:
+      ignore_patterns = self.read_ignore_file(app_location)
+    self.rules = self.parse_patterns(self.DEFAULT_IGNORES + ignore_patterns)
+    self.skip_files = self.read_skip_files(app_location)
+
+
+  @classmethod
+  def read_ignore_file(cls, app_location):
+    """ Reads the ignore patterns that an application lists.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+    Returns:
+      A list of strs containing the patterns, or an empty list if the app has
+      no .appscaleignore file.
+    """
+    try:
+      with open(os.path.join(app_location, cls.IGNORE_FILE)) as ignore_file:
+        return ignore_file.read().splitlines()
+    except IOError:
+      return []
+
+
+  @classmethod
+  def parse_patterns(cls, patterns):
+    """ Turns ignore patterns into rules.
+
+    Args:
+      patterns: A list of strs containing ignore patterns. Blank lines and
+        lines starting with '#' are skipped.
+    Returns:
+      A list of tuples, each containing a list of the globs to match against
+      each part of the path, whether they are matched against the whole
+      relative path, whether they only match directories, and whether a match
+      includes the path instead of leaving it out.
+    """
+    rules = []
+    for pattern in patterns:
+      pattern = pattern.strip()
+      if not pattern or pattern.startswith('#'):
+        continue
+
+      include = pattern.startswith('!')
+      pattern = pattern.lstrip('!')
+      directories_only = pattern.endswith('/')
+      pattern = pattern.rstrip('/')
+      anchored = '/' in pattern
+      rules.append((pattern.lstrip('/').split('/'), anchored,
+                    directories_only, include))
+    return rules
+
+
+  @classmethod
+  def match_parts(cls, globs, parts):
+    """ Checks if a path matches a pattern, one part at a time.
+
+    Args:
+      globs: A list of strs containing the globs that each part of the path
+        must match, where '**' matches any number of parts.
+      parts: A list of strs containing the parts of the path.
+    Returns:
+      True if the path matches the pattern, and False otherwise.
+    """
+    if not globs:
+      return not parts
+    if globs[0] == '**':
+      return any(cls.match_parts(globs[1:], parts[index:])
+                 for index in range(len(parts) + 1))
+    return bool(parts) and fnmatch.fnmatchcase(parts[0], globs[0]) and \
+      cls.match_parts(globs[1:], parts[1:])
+
+
+  @classmethod
+  def read_skip_files(cls, app_location):
+    """ Reads the skip_files setting from an application's app.yaml.
+
+    Args:
+      app_location: The location on the local filesystem where the application
+        can be found.
+    Returns:
+      A compiled regular expression that matches the relative paths to skip,
+      or None if the app doesn't set skip_files.
+    Raises:
+      AppEngineConfigException: If skip_files is not a valid regular
+        expression.
+    """
+    app_yaml = os.path.join(app_location, cls.APP_YAML)
+    if not os.path.exists(app_yaml):
+      return None
+
+    try:
+      skip_files = AppConfig.load(app_yaml).skip_files
+    except (IOError, yaml.YAMLError):
+      return None
+    if not skip_files:
+      return None
+
+    # App Engine joins a list of expressions into one that must match the
+    # whole path.
+    if isinstance(skip_files, list):
+      skip_files = '|'.join('(?:{0})'.format(regex) for regex in skip_files)
+    try:
+      return re.compile('^(?:{0})$'.format(skip_files))
+    except re.error as regex_error:
+      raise AppEngineConfigException('Invalid skip_files in {0}: {1}'.format(
+        app_yaml, regex_error))
+
+
+  def is_skipped(self, relative_path, is_directory):
+    """ Checks if a file or directory should be left out of the deployment.
+
+    Args:
+      relative_path: A str containing the path from the app's directory,
+        separated by '/'.
+      is_directory: A bool indicating if the path is a directory.
+    Returns:
+      True if the path should be left out, and False otherwise.
+    """
+    if self.skip_files is not None and self.skip_files.match(relative_path):
+      return True
+
+    parts = relative_path.split('/')
+    skipped = False
+    for globs, anchored, directories_only, include in self.rules:
+      if directories_only and not is_directory:
+        continue
+      if self.match_parts(globs, parts if anchored else parts[-1:]):
+        skipped = not include
+    return skipped
+
+
+  @classmethod
+  def list_directory(cls, directory):
+    """ Lists the entries in a directory.
+
+    Args:
+      directory: A str containing the location of the directory.
+    Yields:
+      Tuples containing each entry's name and whether it is a directory,
+      following symbolic links.
+    """
+    if scandir is None:
+      for name in os.listdir(directory):
+        yield name, os.path.isdir(os.path.join(directory, name))
+      return
+
+    for entry in scandir(directory):
+      try:
+        yield entry.name, entry.is_dir()
+      except OSError:
+        # The entry is a broken symbolic link.
+        yield entry.name, False
+
+
+  def walk(self):
+    """ Walks the application's directory like os.walk does from the top
+    down, without descending into directories that are left out. Directories
+    that can't be listed are passed over.
+
+    Yields:
+      Tuples containing the path of each directory relative to the app's
+      directory, which is empty for the app's directory and ends in '/'
+      otherwise, its location on the local filesystem, and sorted lists of
+      the names of the subdirectories and files in it that are deployed.
+    """
+    pending = [('', self.app_location)]
+    while pending:
+      relative_dir, directory = pending.pop()
+      try:
+        entries = sorted(self.list_directory(directory))
+      except OSError:
+        continue
+
+      subdirectories = []
+      filenames = []
+      for name, is_directory in entries:
+        if self.is_skipped(relative_dir + name, is_directory):
+          continue
+        if is_directory:
+          subdirectories.append(name)
+        else:
+          filenames.append(name)
+
+      yield relative_dir, directory, subdirectories, filenames
+
+      # Directories are popped off the end, so push them in reverse to visit
+      # them in order.
+      for name in reversed(subdirectories):
+        pending.append((relative_dir + name + '/',
+                        os.path.join(directory, name)))
+
+
+  def iter_files(self):
+    """ Walks the application's directory. The files in each directory are
+    yielded in sorted order, before those in its subdirectories.
+
+    Yields:
+      Tuples containing the path of each file to deploy, relative to the
+      app's directory and separated by '/', and its location on the local
+      filesystem.
+    """
+    for relative_dir, directory, _, filenames in self.walk():
+      for name in filenames:
+        yield relative_dir + name, os.path.join(directory, name)
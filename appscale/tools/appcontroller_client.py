@@ -3,9 +3,11 @@
 
 # General-purpose Python library imports
 import json
+import Queue
 import socket
-import signal
 import ssl
+import sys
+import threading
 import time
 
 
@@ -19,6 +21,9 @@ from custom_exceptions import AppControllerException
 from custom_exceptions import AppScaleException
 from custom_exceptions import BadSecretException
 from custom_exceptions import TimeoutException
+from json_transport import JSONProxy
+from response_cache import ResponseCache
+from soap_transport import PooledHTTPTransport
 
 
 class AppControllerClient():
@@ -63,18 +68,47 @@ class AppControllerClient():
   LONGER_TIMEOUT = 20
 
 
-  def __init__(self, host, secret):
+  # The number of times we should retry SOAP calls that fail with SSL errors.
+  # These are intermittent, so they don't count against the normal retries.
+  MAX_SSL_RETRIES = 10
+
+
+  # The number of seconds that answers to read-only SOAP calls can be reused
+  # for, keyed by the name of the SOAP method.
+  CACHE_TTLS = {
+    'does_user_exist': 30,
+    'get_all_private_ips': 30,
+    'get_all_public_ips': 30,
+    'get_app_info_map': 10,
+    'get_cluster_stats_json': 5,
+    'get_property': 10,
+    'get_role_info': 10
+  }
+
+
+  def __init__(self, host, secret, keyname=None):
     """Creates a new AppControllerClient.
 
     Args:
       host: The location where an AppController can be found.
       secret: A str containing the secret key, used to authenticate this client
         when talking to remote AppControllers.
+      keyname: A str naming the deployment, which allows answers to read-only
+        calls to be cached on disk. None if they should only be cached in this
+        client.
     """
     self.host = host
     self.server = SOAPpy.SOAPProxy('https://%s:%s' % (host,
       self.PORT))
+    # Reuse connections to the AppController across calls and clients.
+    self.server.transport = PooledHTTPTransport()
+    # If selected, use JSON instead of SOAP for whichever methods the
+    # AppController serves that way, which it is asked about on the first
+    # call.
+    if JSONProxy.is_enabled():
+      self.server = JSONProxy('{0}:{1}'.format(host, self.PORT), self.server)
     self.secret = secret
+    self.cache = ResponseCache(keyname)
 
     # Disable certificate verification for Python 2.7.9.
     if hasattr(ssl, '_create_unverified_context'):
@@ -85,6 +119,8 @@ class AppControllerClient():
     *args):
     """Runs the given function, aborting it if it runs too long.
 
+    This can be called from any thread, and from several threads at once.
+
     Args:
       timeout_time: The number of seconds that we should allow function to
         execute for.
@@ -100,39 +136,28 @@ class AppControllerClient():
       AppControllerException: If the AppController we're trying to connect to is
         not running at the given IP address, or if it rejects the SOAP request.
     """
-    def timeout_handler(_, __):
-      """Raises a TimeoutException if the function we want to execute takes
-      too long to run.
-
-      Raises:
-        TimeoutException: If a SIGALRM is raised.
-      """
-      raise TimeoutException()
-
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(timeout_time)  # trigger alarm in timeout_time seconds
-    try:
-      retval = function(*args)
-    except TimeoutException:
-      return default
-    except socket.error as exception:
-      signal.alarm(0)  # turn off the alarm before we retry
-      if num_retries > 0:
-        time.sleep(1)
-        return self.run_with_timeout(timeout_time, default, num_retries - 1,
-          function, *args)
-      else:
+    ssl_retries = self.MAX_SSL_RETRIES
+    while True:
+      try:
+        retval = self.call_with_deadline(timeout_time, function, *args)
+        break
+      except TimeoutException:
+        return default
+      except ssl.SSLError as exception:
+        # these are intermittent, so don't decrement our retry count for this
+        if ssl_retries > 0:
+          ssl_retries -= 1
+          continue
+        raise AppControllerException("Got SSL exception: {}".format(
+          exception))
+      except socket.error as exception:
+        if num_retries > 0:
+          num_retries -= 1
+          time.sleep(1)
+          continue
         raise AppControllerException("Got exception from socket: {}".format(
           exception))
 
-    except ssl.SSLError:
-      # these are intermittent, so don't decrement our retry count for this
-      signal.alarm(0)  # turn off the alarm before we retry
-      return self.run_with_timeout(timeout_time, default, num_retries, function,
-        *args)
-    finally:
-      signal.alarm(0)  # turn off the alarm
-
     if retval == self.BAD_SECRET_MESSAGE:
       raise BadSecretException("Could not authenticate successfully" + \
         " to the AppController. You may need to change the keyname in use.")
@@ -140,6 +165,75 @@ class AppControllerClient():
     return retval
 
 
+  def run_cached(self, method_name, timeout_time, default, num_retries, *args):
+    """Runs a read-only SOAP call, reusing a recent answer to the same call if
+    there is one.
+
+    Args:
+      method_name: A str naming the SOAP method, which must be in CACHE_TTLS.
+      timeout_time: The number of seconds that we should allow the call to
+        execute for.
+      default: The value that should be returned if the timeout is exceeded.
+        It is never cached, and neither are errors.
+      num_retries: The number of times we should retry the SOAP call if we see
+        an unexpected exception.
+      *args: The arguments that will be passed to the SOAP method, besides the
+        secret.
+    Returns:
+      The answer to the SOAP call.
+    """
+    key = '{0} {1} {2}'.format(self.host, method_name, json.dumps(args))
+    found, value = self.cache.get(key)
+    if found:
+      return value
+
+    value = self.run_with_timeout(timeout_time, default, num_retries,
+      getattr(self.server, method_name), *(args + (self.secret,)))
+    is_error = isinstance(value, basestring) and value.startswith('Error')
+    if value != default and not is_error:
+      self.cache.put(key, value, self.CACHE_TTLS[method_name])
+    return value
+
+
+  def call_with_deadline(self, timeout_time, function, *args):
+    """Runs the given function in a separate thread, and waits a limited time
+    for it to finish.
+
+    Unlike an alarm signal, this works from any thread. A call that misses its
+    deadline is abandoned, and finishes in the background.
+
+    Args:
+      timeout_time: The number of seconds that we should allow function to
+        execute for.
+      function: The function that should be executed.
+      *args: The arguments that will be passed to function.
+    Returns:
+      Whatever function(*args) returns.
+    Raises:
+      TimeoutException: If the function does not finish in time.
+      Any exception that the function raises.
+    """
+    outcome = Queue.Queue(maxsize=1)
+
+    def call():
+      try:
+        outcome.put((True, function(*args)))
+      except Exception:
+        outcome.put((False, sys.exc_info()))
+
+    worker = threading.Thread(target=call)
+    worker.daemon = True
+    worker.start()
+    try:
+      succeeded, value = outcome.get(timeout=timeout_time)
+    except Queue.Empty:
+      raise TimeoutException()
+
+    if not succeeded:
+      raise value[0], value[1], value[2]
+    return value
+
+
   def set_parameters(self, locations, params):
     """Passes the given parameters to an AppController, allowing it to start
     configuring API services in this AppScale deployment.
@@ -158,6 +252,7 @@ class AppControllerClient():
       self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
       self.server.set_parameters, json.dumps(locations), json.dumps(params),
       self.secret)
+    self.cache.invalidate()
     if result.startswith('Error'):
       raise AppControllerException(result)
 
@@ -170,8 +265,8 @@ class AppControllerClient():
       A list of the public IP addresses of each machine in this AppScale
       deployment.
     """
-    all_ips = self.run_with_timeout(self.DEFAULT_TIMEOUT, "", self.DEFAULT_NUM_RETRIES,
-      self.server.get_all_public_ips, self.secret)
+    all_ips = self.run_cached('get_all_public_ips', self.DEFAULT_TIMEOUT, "",
+      self.DEFAULT_NUM_RETRIES)
     if all_ips == "":
       return []
     else:
@@ -186,8 +281,8 @@ class AppControllerClient():
       A list of the private IP addresses of each machine in this AppScale
       deployment.
     """
-    all_ips = self.run_with_timeout(self.DEFAULT_TIMEOUT, "", self.DEFAULT_NUM_RETRIES,
-      self.server.get_all_private_ips, self.secret)
+    all_ips = self.run_cached('get_all_private_ips', self.DEFAULT_TIMEOUT, "",
+      self.DEFAULT_NUM_RETRIES)
     if all_ips == "":
       return []
     else:
@@ -202,8 +297,8 @@ class AppControllerClient():
       A dict that contains the public IP address, private IP address, and a list
       of the API services that each node runs in this AppScale deployment.
     """
-    role_info = self.run_with_timeout(self.DEFAULT_TIMEOUT, "", self.DEFAULT_NUM_RETRIES,
-      self.server.get_role_info, self.secret)
+    role_info = self.run_cached('get_role_info', self.DEFAULT_TIMEOUT, "",
+      self.DEFAULT_NUM_RETRIES)
     if role_info == "":
       return {}
     else:
@@ -216,8 +311,8 @@ class AppControllerClient():
     Returns:
       A str that indicates what the AppController reports its status as.
     """
-    stats = self.run_with_timeout(self.DEFAULT_TIMEOUT, "{}", self.DEFAULT_NUM_RETRIES,
-      self.server.get_cluster_stats_json, self.secret)
+    stats = self.run_cached('get_cluster_stats_json', self.DEFAULT_TIMEOUT, "{}",
+      self.DEFAULT_NUM_RETRIES)
     return json.loads(stats)
 
 
@@ -242,8 +337,10 @@ class AppControllerClient():
     Returns:
       The result of executing the SOAP call on the remote AppController.
     """
-    return self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
+    result = self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
       self.server.start_roles_on_nodes, roles_to_nodes, self.secret)
+    self.cache.invalidate()
+    return result
 
   def is_appscale_terminated(self):
     """Queries the AppController to see if the system has been terminated.
@@ -271,6 +368,7 @@ class AppControllerClient():
                                        self.DEFAULT_NUM_RETRIES,
                                        self.server.run_terminate, clean,
                                        self.secret)
+    self.cache.invalidate()
     if request_id == "Error":
       raise AppControllerException("Unable to send request to stop AppScale "
                                    "deployment to AppController.")
@@ -305,8 +403,10 @@ class AppControllerClient():
       remote_app_location: The location on the remote machine where the App
         Engine application can be found.
     """
-    return self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
+    result = self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
       self.server.done_uploading, app_id, remote_app_location, self.secret)
+    self.cache.invalidate()
+    return result
 
 
   def update(self, apps_to_run):
@@ -317,8 +417,10 @@ class AppControllerClient():
       apps_to_run: A list of apps to start running on nodes running the App
         Engine service.
     """
-    return self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
+    result = self.run_with_timeout(self.DEFAULT_TIMEOUT, "Error", self.DEFAULT_NUM_RETRIES,
       self.server.update, apps_to_run, self.secret)
+    self.cache.invalidate()
+    return result
 
 
   def get_app_info_map(self):
@@ -330,8 +432,8 @@ class AppControllerClient():
       haproxy, or dev_appserver ports host that app, with an additional field
       indicating what language the app is written in.
     """
-    return json.loads(self.run_with_timeout(self.DEFAULT_TIMEOUT, '{}', self.DEFAULT_NUM_RETRIES,
-      self.server.get_app_info_map, self.secret))
+    return json.loads(self.run_cached('get_app_info_map', self.DEFAULT_TIMEOUT,
+      '{}', self.DEFAULT_NUM_RETRIES))
 
 
   def relocate_app(self, appid, http_port, https_port):
@@ -350,9 +452,11 @@ class AppControllerClient():
       A str that indicates if the operation was successful, and in unsuccessful
       cases, the reason why the operation failed.
     """
-    return self.run_with_timeout(self.LONGER_TIMEOUT, "Relocate request timed out.",
+    result = self.run_with_timeout(self.LONGER_TIMEOUT, "Relocate request timed out.",
       self.DEFAULT_NUM_RETRIES, self.server.relocate_app, appid, http_port,
         https_port, self.secret)
+    self.cache.invalidate()
+    return result
 
 
   def get_property(self, property_regex):
@@ -368,8 +472,8 @@ class AppControllerClient():
       value. This dict is empty when (1) no matches are found, or (2) if the
       SOAP call times out.
     """
-    return json.loads(self.run_with_timeout(self.DEFAULT_TIMEOUT, '{}', self.DEFAULT_NUM_RETRIES,
-      self.server.get_property, property_regex, self.secret))
+    return json.loads(self.run_cached('get_property', self.DEFAULT_TIMEOUT, '{}',
+      self.DEFAULT_NUM_RETRIES, property_regex))
 
 
   def set_property(self, property_name, property_value):
@@ -384,9 +488,11 @@ class AppControllerClient():
       'OK'), or the reason why the request failed (e.g., the property name
       referred to a non-existent instance variable).
     """
-    return self.run_with_timeout(self.DEFAULT_TIMEOUT, 'Set property request timed out.',
+    result = self.run_with_timeout(self.DEFAULT_TIMEOUT, 'Set property request timed out.',
       self.DEFAULT_NUM_RETRIES, self.server.set_property, property_name,
       property_value, self.secret)
+    self.cache.invalidate()
+    return result
 
 
   def deployment_id_exists(self):
@@ -455,6 +561,7 @@ class AppControllerClient():
     result = self.run_with_timeout(self.DEFAULT_TIMEOUT,
       'Reset password request timed out.', self.DEFAULT_NUM_RETRIES,
       self.server.reset_password, username, encrypted_password, self.secret)
+    self.cache.invalidate()
     if result != 'true':
       raise Exception(result)
 
@@ -467,10 +574,9 @@ class AppControllerClient():
     """
     while True:
       try:
-        user_exists = self.run_with_timeout(
+        user_exists = self.run_cached('does_user_exist',
           self.DEFAULT_TIMEOUT, 'Request to check if user exists timed out.',
-          self.DEFAULT_NUM_RETRIES, self.server.does_user_exist, username,
-          self.secret)
+          self.DEFAULT_NUM_RETRIES, username)
         if user_exists == 'true':
           return True
         elif user_exists == 'false':
@@ -509,6 +615,7 @@ class AppControllerClient():
         AppScaleLogger.log("Backing off and trying again")
         time.sleep(10)
 
+    self.cache.invalidate()
     if result != 'true':
       raise Exception(result)
 
@@ -521,10 +628,12 @@ class AppControllerClient():
         authorizations.
     """
     AppScaleLogger.log('Granting admin privileges to %s' % username)
-    return self.run_with_timeout(self.DEFAULT_TIMEOUT,
+    result = self.run_with_timeout(self.DEFAULT_TIMEOUT,
       'Set admin role request timed out.', self.DEFAULT_NUM_RETRIES,
       self.server.set_admin_role, username, is_cloud_admin,
       capabilities, self.secret)
+    self.cache.invalidate()
+    return result
 
   def get_app_admin(self, app_id):
     """ Queries the AppController to see which user owns the given application.
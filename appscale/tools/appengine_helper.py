@@ -5,10 +5,11 @@
 import os
 import socket
 import re
-import yaml
 
 
 # AppScale-specific imports
+from app_config import AppConfig
+from app_index import AppIndex
 from custom_exceptions import AppEngineConfigException
 
 
@@ -25,15 +26,15 @@ class AppEngineHelper(object):
 
   # A regular expression that can be used to see if the given configuration file
   # is a YAML File.
-  FILE_IS_YAML = re.compile(r'\.yaml\Z')
+  FILE_IS_YAML = AppConfig.FILE_IS_YAML
 
 
   # A regular expression that can be used to find an appid in a XML file.
-  JAVA_APP_ID_REGEX = re.compile(r'<application>(.*)<\/application>')
+  JAVA_APP_ID_REGEX = AppConfig.JAVA_APP_ID_REGEX
 
 
   # A regular expression for finding the threadsafe key in appengine-web.xml.
-  JAVA_THREADSAFE_REGEX = re.compile(r'<threadsafe>(.*)<\/threadsafe>')
+  JAVA_THREADSAFE_REGEX = AppConfig.JAVA_THREADSAFE_REGEX
 
 
   # A list of language runtimes that App Engine apps can be written in.
@@ -99,37 +100,37 @@ class AppEngineHelper(object):
 
 
   @classmethod
-  def get_appengine_web_xml_location(cls, app_dir):
+  def get_appengine_web_xml_location(cls, app_dir, index=None):
     """Returns the location that we expect an appengine-web.xml file to be found
     within an App Engine application.
 
     Args:
       app_dir: The location on the filesystem where the App Engine application
         is located.
+      index: The AppIndex of the application, or None to walk its directory.
     Returns:
       The location of the appengine-web.xml file for the given application.
     """
-    for root, sub_dirs, files in os.walk(app_dir):
-      for file in files:
-        if file == cls.APPENGINE_WEB_XML:
-          return os.path.abspath(os.path.join(root, file))
+    index = index or AppIndex(app_dir)
+    return index.find_file(cls.APPENGINE_WEB_XML)
 
 
   @classmethod
-  def is_sdk_mismatch(cls, app_dir):
+  def is_sdk_mismatch(cls, app_dir, index=None):
     """ Returns if the sdk jar is the right version within an App Engine
     application.
 
     Args:
       app_dir: The location on the filesystem where the App Engine application
         is located.
+      index: The AppIndex of the application, or None to walk its directory.
     Returns:
       A boolean value indicating if the user may have an sdk version
       compatibility error with AppScale.
     """
     target_jar = cls.JAVA_SDK_JAR_PREFIX + '-' + cls.SUPPORTED_SDK_VERSION \
       + '.jar'
-    paths = cls.get_appengine_lib_locations(app_dir)
+    paths = cls.get_appengine_lib_locations(app_dir, index)
     mismatch = True
     for path in paths:
       lib_files = os.listdir(path)
@@ -143,57 +144,55 @@ class AppEngineHelper(object):
     return mismatch
 
   @classmethod
-  def get_appengine_lib_locations(cls, app_dir):
+  def get_appengine_lib_locations(cls, app_dir, index=None):
     """ Returns the locations of all lib folders within an App Engine
     application.
 
     Args:
       app_dir: The location on the filesystem where the App Engine application
         is located.
+      index: The AppIndex of the application, or None to walk its directory.
     Returns:
       A list, all the lib folder paths in the given application.
     """
-    paths = []
-    for root, sub_dirs, files in os.walk(app_dir):
-      for dir in sub_dirs:
-        if dir == cls.LIB:
-          paths.append(os.path.abspath(os.path.join(root, dir)))
-    return paths
+    index = index or AppIndex(app_dir)
+    return index.find_directories(cls.LIB)
 
   @classmethod
-  def get_app_id_from_app_config(cls, app_dir):
+  def get_app_id_from_app_config(cls, app_dir, index=None, app_config=None):
     """Checks the configuration file packages with the given App Engine app to
     determine what the user has set as this application's name.
 
     Args:
       app_dir: The directory on the local filesystem where the App Engine
         application can be found.
+      index: The AppIndex of the application, or None to walk its directory.
+      app_config: The AppConfig of the application, or None to read it from
+        its directory.
     Returns:
       A str indicating the application ID for this application.
     Raises:
       AppEngineConfigException: If there is no application ID set for this
         application.
     """
-    app_config_file = cls.get_config_file_from_dir(app_dir)
-    if cls.FILE_IS_YAML.search(app_config_file):
-      yaml_contents = yaml.safe_load(cls.read_file(app_config_file))
-      if 'application' in yaml_contents and yaml_contents['application'] != '':
-        return yaml_contents['application']
+    app_config = app_config or cls.get_app_config(app_dir, index)
+    if app_config.is_yaml:
+      if app_config.app_id is not None and app_config.app_id != '':
+        return app_config.app_id
       else:
         raise AppEngineConfigException("No valid application ID found in " +
           "your app.yaml. " + cls.REGEX_MESSAGE)
     else:
-      xml_contents = cls.read_file(app_config_file)
-      app_id_matchdata = cls.JAVA_APP_ID_REGEX.search(xml_contents)
-      if app_id_matchdata:
-        return app_id_matchdata.group(1)
+      if app_config.app_id is not None:
+        return app_config.app_id
       else:
         raise AppEngineConfigException("No application ID found in " +
           "your appengine-web.xml. " + cls.REGEX_MESSAGE)
 
 
   @classmethod
-  def get_app_runtime_from_app_config(cls, app_dir):
+  def get_app_runtime_from_app_config(cls, app_dir, index=None,
+                                      app_config=None):
     """Checks the configuration file packaged with the given App Engine app to
     determine what language runtime should be used to deploy this app.
 
@@ -203,18 +202,19 @@ class AppEngineHelper(object):
     Args:
       app_dir: The directory on the local filesystem where the App Engine
         application can be found.
+      index: The AppIndex of the application, or None to walk its directory.
+      app_config: The AppConfig of the application, or None to read it from
+        its directory.
     Returns:
       A str indicating which runtime should be used to run this application.
     Raises:
       AppEngineConfigException: If there is no runtime set for this application.
     """
-    app_config_file = cls.get_config_file_from_dir(app_dir)
-    if cls.FILE_IS_YAML.search(app_config_file):
-      yaml_contents = yaml.safe_load(cls.read_file(app_config_file))
-      if 'runtime' in yaml_contents and yaml_contents['runtime'] in \
-        cls.ALLOWED_RUNTIMES:
-        return yaml_contents['runtime']
-      elif 'runtime' in yaml_contents and yaml_contents['runtime'] in \
+    app_config = app_config or cls.get_app_config(app_dir, index)
+    if app_config.is_yaml:
+      if app_config.runtime in cls.ALLOWED_RUNTIMES:
+        return app_config.runtime
+      elif app_config.runtime is not None and app_config.runtime in \
         cls.DEPRECATED_RUNTIMES:
         raise AppEngineConfigException("This runtime is deprecated and no " + \
           "longer supported.")
@@ -224,29 +224,27 @@ class AppEngineHelper(object):
       return 'java'
 
   @classmethod
-  def is_threadsafe(cls, app_dir):
+  def is_threadsafe(cls, app_dir, index=None, app_config=None):
     """ Retrieves threadsafe value from version configuration.
 
     Args:
       app_dir: The directory containing the version source code.
+      index: The AppIndex of the application, or None to walk its directory.
+      app_config: The AppConfig of the application, or None to read it from
+        its directory.
     Returns:
       A boolean containing the value of threadsafe.
     Raises:
       AppEngineConfigException if the version is configured incorrectly.
     """
-    app_config_file = cls.get_config_file_from_dir(app_dir)
-    if cls.FILE_IS_YAML.search(app_config_file):
-      yaml_contents = yaml.safe_load(cls.read_file(app_config_file))
-      try:
-        threadsafe = yaml_contents['threadsafe']
-      except KeyError:
+    app_config = app_config or cls.get_app_config(app_dir, index)
+    threadsafe = app_config.threadsafe
+    if app_config.is_yaml:
+      if threadsafe is None:
         raise AppEngineConfigException(
           '"threadsafe" must be definined in your app.yaml.')
     else:
-      xml_contents = cls.read_file(app_config_file)
-      try:
-        threadsafe = cls.JAVA_THREADSAFE_REGEX.search(xml_contents).group(1)
-      except AttributeError:
+      if threadsafe is None:
         raise AppEngineConfigException(
           '"threadsafe" must be definined in your appengine-web.xml.')
 
@@ -262,13 +260,32 @@ class AppEngineHelper(object):
     return threadsafe
 
   @classmethod
-  def get_config_file_from_dir(cls, app_dir):
+  def get_app_config(cls, app_dir, index=None):
+    """Reads the configuration file of the given App Engine app, reusing the
+    settings from the last time it was read if it hasn't changed since.
+
+    Args:
+      app_dir: The directory on the local filesystem where the App Engine
+        application can be found.
+      index: The AppIndex of the application, or None to walk its directory.
+    Returns:
+      An AppConfig containing the application's settings.
+    Raises:
+      AppEngineConfigException: If there is no configuration file for this
+      application.
+    """
+    return AppConfig.load(cls.get_config_file_from_dir(app_dir, index))
+
+
+  @classmethod
+  def get_config_file_from_dir(cls, app_dir, index=None):
     """Finds the location of the app.yaml or appengine-web.xml file in the
     provided App Engine app.
 
     Args:
       app_dir: The directory on the local filesystem where the App Engine
         application can be found.
+      index: The AppIndex of the application, or None to walk its directory.
     Returns:
       A str containing the path to the configuration file on the local
         filesystem.
@@ -278,8 +295,10 @@ class AppEngineHelper(object):
     """
     if os.path.exists(cls.get_app_yaml_location(app_dir)):
       return cls.get_app_yaml_location(app_dir)
-    elif os.path.exists(cls.get_appengine_web_xml_location(app_dir)):
-      return cls.get_appengine_web_xml_location(app_dir)
+
+    appengine_web_xml = cls.get_appengine_web_xml_location(app_dir, index)
+    if os.path.exists(appengine_web_xml):
+      return appengine_web_xml
     else:
       raise AppEngineConfigException("Couldn't find an app.yaml or " +
         "appengine-web.xml file in {0}".format(app_dir))
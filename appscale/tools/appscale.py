@@ -74,9 +74,12 @@ class AppScale():
   USAGE = """Usage: appscale command [<args>]
 
 Available commands:
-  deploy <app>                      Deploys a Google App Engine app to AppScale:
+  deploy <app> [--email EMAIL]      Deploys a Google App Engine app to AppScale:
                                     <app> can be the top level directory with the
                                     code or a tar.gz of the source tree.
+  deploy <app> <app>... [--email EMAIL] [--parallel N]
+                                    Deploys several apps at once, packaging
+                                    and copying up to N of them at a time.
   create-user [--admin]             Creates a new user. If --admin option is specified, 
                                     it will create the user as an admin.
   down [--clean][--terminate]       Gracefully terminates the currently
@@ -515,6 +518,57 @@ Available commands:
       AppScalefileException: If there is no AppScalefile in the current working
       directory.
     """
+    command = self.get_upload_app_flags(email)
+    command.append("--file")
+    command.append(app)
+
+    # Finally, exec the command. Don't worry about validating it -
+    # appscale-upload-app will do that for us.
+    options = ParseArgs(command, "appscale-upload-app").args
+    return AppScaleTools.upload_app(options)
+
+
+  def deploy_apps(self, apps, email=None, parallel=None):
+    """ Deploys several Google App Engine applications at once, with the
+    configuration options found in the AppScalefile in the current working
+    directory.
+
+    Args:
+      apps: A list of paths (absolute or relative) to the Google App Engine
+        applications that should be uploaded.
+      email: The email of user
+      parallel: The number of applications to package and copy at once, or
+        None to use the default.
+    Returns:
+      A dict that maps the path of each application to a tuple containing the
+        host and port where it is serving traffic from.
+    Raises:
+      AppScalefileException: If there is no AppScalefile in the current working
+      directory.
+    """
+    command = self.get_upload_app_flags(email)
+    if parallel is not None:
+      command.append("--parallel")
+      command.append(str(parallel))
+    command.append("--files")
+    command.extend(apps)
+
+    options = ParseArgs(command, "appscale-upload-app").args
+    return AppScaleTools.upload_apps(options)
+
+
+  def get_upload_app_flags(self, email=None):
+    """ Constructs the flags for an appscale-upload-app command from the
+    contents of the AppScalefile in the current working directory.
+
+    Args:
+      email: The email of user
+    Returns:
+      A list of strs containing the flags.
+    Raises:
+      AppScalefileException: If there is no AppScalefile in the current working
+      directory.
+    """
     contents = self.read_appscalefile()
 
     # Construct an upload-app command from the file's contents
@@ -534,13 +588,7 @@ Available commands:
       command.append("--email")
       command.append(email)
 
-    command.append("--file")
-    command.append(app)
-
-    # Finally, exec the command. Don't worry about validating it -
-    # appscale-upload-app will do that for us.
-    options = ParseArgs(command, "appscale-upload-app").args
-    return AppScaleTools.upload_app(options)
+    return command
 
 
   def undeploy(self, appid):
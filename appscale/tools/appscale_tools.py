@@ -6,9 +6,7 @@ import errno
 import getpass
 import json
 import os
-import Queue
 import re
-import shutil
 import socket
 import sys
 import threading
@@ -25,37 +23,30 @@ from tabulate import tabulate
 from SOAPpy import faultType
 
 from agents.factory import InfrastructureAgentFactory
+from app_cache import AppCache
+from app_index import AppIndex
+from app_manifest import AppManifest
+from app_packager import AppPackager
 from appcontroller_client import AppControllerClient
 from appengine_helper import AppEngineHelper
 from appscale_logger import AppScaleLogger
+from archived_app import ArchivedApp
+from async_appcontroller_client import AsyncAppControllerClient
 from cluster_stats import NodeStats, AppInfo
 from custom_exceptions import AppControllerException
 from custom_exceptions import AppEngineConfigException
 from custom_exceptions import AppScaleException
 from custom_exceptions import BadConfigurationException
 from custom_exceptions import ShellException
+from custom_exceptions import TimeoutException
 from local_state import APPSCALE_VERSION
 from local_state import LocalState
 from node_layout import NodeLayout
 from remote_helper import RemoteHelper
 from version_helper import latest_tools_version
+from waiter import Waiter
 from .admin_client import AdminClient
-
-
-def async_layout_upgrade(ip, keyname, script, error_bucket, verbose=False):
-  """ Run a command over SSH and place exceptions in a bucket.
-
-  Args:
-    ip: A string containing and IP address.
-    keyname: A string containing the deployment keyname.
-    script: A string to run as a command over SSH.
-    error_bucket: A thread-safe queue.
-    verbose: A boolean indicating whether or not to log verbosely.
-  """
-  try:
-    RemoteHelper.ssh(ip, keyname, script, verbose)
-  except ShellException as ssh_error:
-    error_bucket.put(ssh_error)
+from .admin_client import AdminError
 
 
 MIN_FREE_DISK_DB = 40.0
@@ -113,9 +104,10 @@ class AppScaleTools(object):
   APPSCALE_REPO = "~/appscale"
 
 
-  # Bootstrap command to run.
-  BOOTSTRAP_CMD = '{}/bootstrap.sh >> /var/log/appscale/bootstrap.log'.\
-    format(APPSCALE_REPO)
+  # Bootstrap command to run. Its output is also sent back so that it can be
+  # followed while the bootstrap runs.
+  BOOTSTRAP_CMD = 'set -o pipefail; {}/bootstrap.sh 2>&1 | '\
+    'tee -a /var/log/appscale/bootstrap.log'.format(APPSCALE_REPO)
 
 
   # Command to run the upgrade script from /appscale/scripts directory.
@@ -129,6 +121,29 @@ class AppScaleTools(object):
   # Location of the upgrade status file on the remote machine.
   UPGRADE_STATUS_FILE_LOC = '/var/log/appscale/upgrade-status-'
 
+
+  # The prefix of the lines that report changes to the upgrade status file.
+  UPGRADE_STATUS_MARKER = 'APPSCALE-UPGRADE-STATUS'
+
+
+  # A script that runs the upgrade script in the background, and reports each
+  # change to its status file over the same SSH session.
+  UPGRADE_WATCH_SCRIPT = '''{command} &
+upgrade_pid=$!
+last_status=''
+while true; do
+  running=true
+  kill -0 $upgrade_pid 2> /dev/null || running=false
+  status=$(tr -d '\\n' < {status_file} 2> /dev/null)
+  if [ -n "$status" ] && [ "$status" != "$last_status" ]; then
+    echo "{marker} $status"
+    last_status=$status
+  fi
+  [ $running = true ] || break
+  sleep 1
+done
+wait $upgrade_pid'''
+
   @classmethod
   def add_instances(cls, options):
     """Adds additional machines to an AppScale deployment.
@@ -152,16 +167,22 @@ class AppScaleTools(object):
       ips_to_check = []
       for ip_group in options.ips.values():
         ips_to_check.extend(ip_group)
+
+      check_ssh = lambda ip: RemoteHelper.ssh(ip, options.keyname, "ls",
+                                              options.verbose)
+      _, errors = RemoteHelper.fan_out(ips_to_check, check_ssh,
+                                       fail_fast=True)
       for ip in ips_to_check:
         # throws a ShellException if the SSH key doesn't work
-        RemoteHelper.ssh(ip, options.keyname, "ls", options.verbose)
+        if ip in errors:
+          raise errors[ip]
 
     # Finally, find an AppController and send it a message to add
     # the given nodes with the new roles.
     AppScaleLogger.log("Sending request to add instances")
     login_ip = LocalState.get_login_host(options.keyname)
     acc = AppControllerClient(login_ip, LocalState.get_secret_key(
-      options.keyname))
+      options.keyname), options.keyname)
     acc.start_roles_on_nodes(json.dumps(options.ips))
 
     # TODO(cgb): Should we wait for the new instances to come up and get
@@ -209,15 +230,20 @@ class AppScaleTools(object):
         "placement strategy: " + str(node_layout.errors()))
 
     all_ips = [node.public_ip for node in node_layout.nodes]
+
+    # first, make sure ssh is actually running on the host machines
+    not_ready = RemoteHelper.wait_for_ports(
+      [(ip, RemoteHelper.SSH_PORT) for ip in all_ips], options.verbose,
+      deadline=RemoteHelper.PORT_PROBE_TIMEOUT)
+    if not_ready:
+      ips = ', '.join(ip for ip, _ in not_ready)
+      raise AppScaleException("SSH does not appear to be running at {0}. " \
+        "Are the machines at {0} up and running? Make sure your IPs are " \
+        "correct!".format(ips))
+
+    # next, set up passwordless ssh. This is done one machine at a time, since
+    # ssh-copy-id may prompt for each machine's password.
     for ip in all_ips:
-      # first, make sure ssh is actually running on the host machine
-      if not RemoteHelper.is_port_open(ip, RemoteHelper.SSH_PORT,
-        options.verbose):
-        raise AppScaleException("SSH does not appear to be running at {0}. " \
-          "Is the machine at {0} up and running? Make sure your IPs are " \
-          "correct!".format(ip))
-
-      # next, set up passwordless ssh
       AppScaleLogger.log("Executing ssh-copy-id for host: {0}".format(ip))
       if options.auto:
         LocalState.shell("{0} root@{1} {2} {3}".format(cls.EXPECT_SCRIPT, ip,
@@ -241,10 +267,13 @@ class AppScaleTools(object):
     """
     try:
       login_host = LocalState.get_login_host(options.keyname)
-      login_acc = AppControllerClient(login_host,
-        LocalState.get_secret_key(options.keyname))
-      all_private_ips = login_acc.get_all_private_ips()
-      cluster_stats = login_acc.get_cluster_stats()
+      login_acc = AsyncAppControllerClient(AppControllerClient(login_host,
+        LocalState.get_secret_key(options.keyname), options.keyname))
+      # Ask for both at once, since neither depends on the other.
+      all_private_ips_future = login_acc.get_all_private_ips()
+      cluster_stats_future = login_acc.get_cluster_stats()
+      all_private_ips = all_private_ips_future.result()
+      cluster_stats = cluster_stats_future.result()
     except (faultType, AppControllerException, BadConfigurationException):
       AppScaleLogger.warn("AppScale deployment is probably down")
       raise
@@ -531,7 +560,7 @@ class AppScaleTools(object):
     """
     shadow_host = LocalState.get_host_with_role(options.keyname, 'shadow')
     acc = AppControllerClient(shadow_host, LocalState.get_secret_key(
-      options.keyname))
+      options.keyname), options.keyname)
 
     return acc.get_property(options.property)
 
@@ -551,7 +580,7 @@ class AppScaleTools(object):
     """
     login_host = LocalState.get_login_host(options.keyname)
     acc = AppControllerClient(login_host, LocalState.get_secret_key(
-      options.keyname))
+      options.keyname), options.keyname)
 
     app_info_map = acc.get_app_info_map()
     if options.appname not in app_info_map.keys():
@@ -594,19 +623,14 @@ class AppScaleTools(object):
     admin_client = AdminClient(login_host, secret)
 
     operation_id = admin_client.delete_version(options.appname)
-    deadline = time.time() + cls.MAX_OPERATION_TIME
-    while True:
-      if time.time() > deadline:
-        raise AppScaleException('The undeploy operation took too long.')
-
-      operation = admin_client.get_operation(options.appname, operation_id)
-      if not operation['done']:
-        time.sleep(1)
-        continue
+    try:
+      operation = admin_client.wait_for_operation(
+        options.appname, operation_id, cls.MAX_OPERATION_TIME)
+    except TimeoutException:
+      raise AppScaleException('The undeploy operation took too long.')
 
-      if 'error' in operation:
-        raise AppScaleException(operation['error']['message'])
-      break
+    if 'error' in operation:
+      raise AppScaleException(operation['error']['message'])
 
     AppScaleLogger.success('Done shutting down {}.'.format(options.appname))
 
@@ -737,11 +761,9 @@ class AppScaleTools(object):
     secret_key = LocalState.get_secret_key(options.keyname)
     acc = AppControllerClient(head_node, secret_key)
     try:
-      while not acc.is_initialized():
-        AppScaleLogger.log('Waiting for head node to initialize...')
-        # This can take some time in particular the first time around, since
-        # we will have to initialize the database.
-        time.sleep(cls.SLEEP_TIME*3)
+      # This can take some time in particular the first time around, since
+      # we will have to initialize the database.
+      Waiter(description='head node to initialize').wait(acc.is_initialized)
     except socket.error as socket_error:
       AppScaleLogger.warn('Unable to initialize AppController: {}'.
                           format(socket_error.message))
@@ -795,7 +817,7 @@ class AppScaleTools(object):
     """
     shadow_host = LocalState.get_host_with_role(options.keyname, 'shadow')
     acc = AppControllerClient(shadow_host, LocalState.get_secret_key(
-      options.keyname))
+      options.keyname), options.keyname)
     result = acc.set_property(options.property_name, options.property_value)
     if result == 'OK':
       AppScaleLogger.success("Successfully updated the given property.")
@@ -872,106 +894,329 @@ class AppScaleTools(object):
 
 
   @classmethod
-  def upload_app(cls, options):
-    """Uploads the given App Engine application into AppScale.
+  def prepare_app(cls, app_path, options, cache=None):
+    """Reads the configuration needed to deploy the given App Engine
+    application. Archived applications are read in place, without being
+    extracted.
 
     Args:
+      app_path: A str naming a directory, tar.gz file, or zip file that holds
+        the application.
       options: A Namespace that has fields for each parameter that can be
         passed in via the command-line interface.
+      cache: The AppCache to reuse a Go app's dependencies from, or None to
+        find them again.
     Returns:
-      A tuple containing the host and port where the application is serving
-        traffic from.
+      A dict containing the directory or archive that holds the application
+        ('location'), the ArchivedApp that reads it if it is archived
+        ('archive'), the app's 'app_id', 'language', 'threadsafe' setting,
+        extra files to upload ('extras'), and the AppIndex of its files if it
+        is a directory ('index').
+    Raises:
+      AppEngineConfigException: If app_path is not an application.
     """
-    if cls.TAR_GZ_REGEX.search(options.file):
-      file_location = LocalState.extract_tgz_app_to_dir(options.file,
-        options.verbose)
-      created_dir = True
-    elif cls.ZIP_REGEX.search(options.file):
-      file_location = LocalState.extract_zip_app_to_dir(options.file,
-        options.verbose)
-      created_dir = True
-    elif os.path.isdir(options.file):
-      file_location = options.file
-      created_dir = False
+    file_location = app_path
+    archive = None
+    app_config = None
+    index = None
+    if cls.TAR_GZ_REGEX.search(app_path) or cls.ZIP_REGEX.search(app_path):
+      archive = ArchivedApp(app_path)
+      app_config = archive.app_config
+      app_id = AppEngineHelper.get_app_id_from_app_config(
+        file_location, app_config=app_config)
+    elif os.path.isdir(app_path):
+      index = AppIndex(file_location)
+      try:
+        app_id = AppEngineHelper.get_app_id_from_app_config(file_location,
+                                                            index)
+      except AppEngineConfigException as config_error:
+        AppScaleLogger.log(config_error)
+        if 'yaml' in str(config_error):
+          raise config_error
+
+        # Java App Engine users may have specified their war directory. In
+        # that case, just move up one level, back to the app's directory.
+        file_location = file_location + os.sep + ".."
+        index = AppIndex(file_location)
+        app_id = AppEngineHelper.get_app_id_from_app_config(file_location,
+                                                            index)
     else:
       raise AppEngineConfigException('{0} is not a tar.gz file, a zip file, ' \
         'or a directory. Please try uploading either a tar.gz file, a zip ' \
-        'file, or a directory.'.format(options.file))
-
-    try:
-      app_id = AppEngineHelper.get_app_id_from_app_config(file_location)
-    except AppEngineConfigException as config_error:
-      AppScaleLogger.log(config_error)
-      if 'yaml' in str(config_error):
-        raise config_error
-
-      # Java App Engine users may have specified their war directory. In that
-      # case, just move up one level, back to the app's directory.
-      file_location = file_location + os.sep + ".."
-      app_id = AppEngineHelper.get_app_id_from_app_config(file_location)
+        'file, or a directory.'.format(app_path))
 
     app_language = AppEngineHelper.get_app_runtime_from_app_config(
-      file_location)
+      file_location, index, app_config)
     threadsafe = None
     if app_language in ['python27', 'java']:
-      threadsafe = AppEngineHelper.is_threadsafe(file_location)
+      threadsafe = AppEngineHelper.is_threadsafe(file_location, index,
+                                                 app_config)
     AppEngineHelper.validate_app_id(app_id)
 
     extras = {}
     if app_language == 'go':
-      extras = LocalState.get_extra_go_dependencies(options.file, options.test)
+      extras = LocalState.get_extra_go_dependencies(app_path, options.test,
+                                                    index, cache)
 
     if app_language == 'java':
-      if AppEngineHelper.is_sdk_mismatch(file_location):
+      if archive is not None:
+        sdk_mismatch = archive.is_sdk_mismatch()
+      else:
+        sdk_mismatch = AppEngineHelper.is_sdk_mismatch(file_location, index)
+      if sdk_mismatch:
         AppScaleLogger.warn('AppScale did not find the correct SDK jar ' +
           'versions in your app. The current supported ' +
           'SDK version is ' + AppEngineHelper.SUPPORTED_SDK_VERSION + '.')
 
-    login_host = LocalState.get_login_host(options.keyname)
-    secret_key = LocalState.get_secret_key(options.keyname)
-    admin_client = AdminClient(login_host, secret_key)
+    return {
+      'location': file_location,
+      'archive': archive,
+      'app_id': app_id,
+      'language': app_language,
+      'threadsafe': threadsafe,
+      'extras': extras,
+      'index': index
+    }
+
+
+  @classmethod
+  def get_deploying_user(cls, options):
+    """Determines which user applications should be deployed as.
 
+    Args:
+      options: A Namespace that has fields for each parameter that can be
+        passed in via the command-line interface.
+    Returns:
+      A str containing the e-mail address of the user.
+    """
     if options.test:
-      username = LocalState.DEFAULT_USER
+      return LocalState.DEFAULT_USER
     elif options.email:
-      username = options.email
+      return options.email
     else:
-      username = LocalState.get_username_from_stdin(is_admin=False)
+      return LocalState.get_username_from_stdin(is_admin=False)
+
+
+  @classmethod
+  def wait_for_version(cls, admin_client, app_id, operation_id):
+    """Waits for the AdminServer to finish deploying an application.
+
+    Args:
+      admin_client: An AdminClient for the deployment.
+      app_id: A str containing the application's ID.
+      operation_id: A str identifying the deployment operation.
+    Returns:
+      A str containing the URL that the application can be reached at.
+    Raises:
+      AppScaleException: If the deployment failed or took too long.
+    """
+    try:
+      operation = admin_client.wait_for_operation(
+        app_id, operation_id, cls.MAX_OPERATION_TIME)
+    except TimeoutException:
+      raise AppScaleException('The deployment operation took too long.')
 
-    remote_file_path = RemoteHelper.copy_app_to_host(file_location,
-      options.keyname, options.verbose, extras)
+    return cls.get_version_url(operation)
 
-    AppScaleLogger.log('Deploying project: {}'.format(app_id))
+
+  @classmethod
+  def get_version_url(cls, operation):
+    """Reads the outcome of a finished deployment operation.
+
+    Args:
+      operation: A dict containing the finished operation's details.
+    Returns:
+      A str containing the URL that the application can be reached at.
+    Raises:
+      AppScaleException: If the deployment failed.
+    """
+    if 'error' in operation:
+      raise AppScaleException(operation['error']['message'])
+    return operation['response']['versionUrl']
+
+
+  @classmethod
+  def get_app_cache(cls, options):
+    """Decides where packaging work for applications should be cached.
+
+    Args:
+      options: A Namespace that has fields for each parameter that can be
+        passed in via the command-line interface.
+    Returns:
+      An AppCache, or None if the user asked not to use one.
+    """
+    if options.no_cache:
+      return None
+    return AppCache(hash_contents=options.cache_hash_contents)
+
+
+  @classmethod
+  def upload_app(cls, options):
+    """Uploads the given App Engine application into AppScale.
+
+    Args:
+      options: A Namespace that has fields for each parameter that can be
+        passed in via the command-line interface.
+    Returns:
+      A tuple containing the host and port where the application is serving
+        traffic from.
+    """
+    cache = cls.get_app_cache(options)
+    app = cls.prepare_app(options.file, options, cache)
+
+    login_host = LocalState.get_login_host(options.keyname)
+    secret_key = LocalState.get_secret_key(options.keyname)
+    admin_client = AdminClient(login_host, secret_key)
+    username = cls.get_deploying_user(options)
+
+    packager = AppPackager(options.compression, options.compression_level)
+    if app['archive'] is not None:
+      remote_file_path = RemoteHelper.copy_archive_to_host(app['archive'],
+        app['app_id'], options.keyname, options.verbose, packager, cache)
+    else:
+      remote_file_path = RemoteHelper.copy_app_to_host(app['location'],
+        options.keyname, options.verbose, app['extras'], packager, cache,
+        app['index'])
+
+    AppScaleLogger.log('Deploying project: {}'.format(app['app_id']))
     operation_id = admin_client.create_version(
-      app_id, username, remote_file_path, app_language, threadsafe)
+      app['app_id'], username, remote_file_path, app['language'],
+      app['threadsafe'])
 
     # now that we've told the AppController to start our app, find out what port
     # the app is running on and wait for it to start serving
     AppScaleLogger.log("Please wait for your app to start serving.")
-
-    deadline = time.time() + cls.MAX_OPERATION_TIME
-    while True:
-      if time.time() > deadline:
-        raise AppScaleException('The deployment operation took too long.')
-      operation = admin_client.get_operation(app_id, operation_id)
-      if not operation['done']:
-        time.sleep(1)
-        continue
-
-      if 'error' in operation:
-        raise AppScaleException(operation['error']['message'])
-      version_url = operation['response']['versionUrl']
-      break
+    version_url = cls.wait_for_version(admin_client, app['app_id'],
+                                       operation_id)
 
     AppScaleLogger.success(
       'Your app can be reached at the following URL: {}'.format(version_url))
 
-    if created_dir:
-      shutil.rmtree(file_location)
-
     http_port = int(version_url.split(':')[-1])
     return (login_host, http_port)
 
+
+  @classmethod
+  def upload_apps(cls, options):
+    """Uploads several App Engine applications into AppScale at once.
+
+    Deploying each app is split into stages that are pipelined across apps:
+    one app can be packaged while another one is copied to the login node.
+    At most options.parallel apps are packaged, and at most options.parallel
+    apps are copied, at once. The deployment operations of every app that
+    was handed to the AdminServer are then polled together, in one loop.
+
+    Args:
+      options: A Namespace that has fields for each parameter that can be
+        passed in via the command-line interface.
+    Returns:
+      A dict that maps the path of each application to a tuple containing the
+        host and port where it is serving traffic from.
+    Raises:
+      AppScaleException: If any of the applications could not be deployed.
+    """
+    login_host = LocalState.get_login_host(options.keyname)
+    secret_key = LocalState.get_secret_key(options.keyname)
+    admin_client = AdminClient(login_host, secret_key)
+    username = cls.get_deploying_user(options)
+
+    packager = AppPackager(options.compression, options.compression_level)
+    cache = cls.get_app_cache(options)
+    packaging_slots = threading.BoundedSemaphore(options.parallel)
+    copying_slots = threading.BoundedSemaphore(options.parallel)
+    statuses = {}
+    for app_path in options.files:
+      statuses[app_path] = {'app_id': app_path, 'start': time.time()}
+
+    def set_stage(app_path, stage):
+      AppScaleLogger.log('[{0}] {1}'.format(statuses[app_path]['app_id'],
+                                            stage))
+
+    def deploy(app_path):
+      with packaging_slots:
+        set_stage(app_path, 'Packaging')
+        app = cls.prepare_app(app_path, options, cache)
+        statuses[app_path]['app_id'] = app['app_id']
+        if app['archive'] is None:
+          manifest = AppManifest.from_directory(
+            app['location'], app['extras'], cache, app['index'])
+
+      with copying_slots:
+        set_stage(app_path, 'Copying to {0}'.format(login_host))
+        if app['archive'] is not None:
+          remote_file_path = RemoteHelper.copy_archive_to_host(
+            app['archive'], app['app_id'], options.keyname, options.verbose,
+            packager, cache)
+        else:
+          remote_file_path = RemoteHelper.copy_manifest_to_host(
+            manifest, app['app_id'], options.keyname, options.verbose,
+            packager, cache)
+        operation_id = admin_client.create_version(
+          app['app_id'], username, remote_file_path, app['language'],
+          app['threadsafe'])
+
+      set_stage(app_path, 'Waiting for the AdminServer')
+      return app['app_id'], operation_id
+
+    # Each app gets its own thread, since most of them spend their time
+    # waiting for a slot.
+    operations, errors = RemoteHelper.fan_out(
+      options.files, deploy, max_workers=len(options.files))
+
+    app_paths = {operation: app_path
+                 for app_path, operation in operations.iteritems()}
+    version_urls = {}
+
+    def finish(operation_key, operation):
+      app_path = app_paths[operation_key]
+      statuses[app_path]['seconds'] = time.time() - \
+        statuses[app_path]['start']
+      try:
+        version_urls[app_path] = cls.get_version_url(operation)
+      except AppScaleException as error:
+        errors[app_path] = error
+        return
+      AppScaleLogger.success('[{0}] Serving at {1}'.format(
+        statuses[app_path]['app_id'], version_urls[app_path]))
+
+    wait_error = None
+    try:
+      admin_client.wait_for_operations(app_paths.keys(),
+                                       cls.MAX_OPERATION_TIME, finish)
+    except TimeoutException:
+      wait_error = AppScaleException('The deployment operation took too long.')
+    except AdminError as error:
+      wait_error = error
+
+    # Apps whose operations hadn't finished yet fail along with the wait.
+    if wait_error is not None:
+      for app_path in app_paths.itervalues():
+        if app_path not in version_urls and app_path not in errors:
+          errors[app_path] = wait_error
+
+    header = ('APP', 'STATUS', 'SECONDS', 'DETAILS')
+    table = []
+    for app_path in options.files:
+      status = statuses[app_path]
+      seconds = status.get('seconds', time.time() - status['start'])
+      if app_path in version_urls:
+        table.append((status['app_id'], 'deployed', seconds,
+                      version_urls[app_path]))
+      else:
+        error = errors.get(app_path)
+        table.append((status['app_id'], 'failed', seconds,
+                      '{0}: {1}'.format(app_path, error)))
+    AppScaleLogger.log("\n" + tabulate(table, headers=header,
+                                       tablefmt="plain", floatfmt=".1f"))
+
+    if errors:
+      raise AppScaleException('{0} of {1} apps could not be deployed.'.format(
+        len(errors), len(options.files)))
+
+    return {app_path: (login_host, int(version_url.split(':')[-1]))
+            for app_path, version_url in version_urls.iteritems()}
+
+
   @classmethod
   def upgrade(cls, options):
     """ Upgrades the deployment to the latest AppScale version.
@@ -1055,49 +1300,53 @@ class AppScaleTools(object):
       replication=node_layout.replication
     )
     master_public_ip = node_layout.head_node().public_ip
+    upgrade_status_file = cls.UPGRADE_STATUS_FILE_LOC + timestamp + ".json"
+    watch_script = cls.UPGRADE_WATCH_SCRIPT.format(
+      command=upgrade_script_command, status_file=upgrade_status_file,
+      marker=cls.UPGRADE_STATUS_MARKER)
 
     AppScaleLogger.log("Running upgrade script to check if any other upgrade is needed.")
-    # Run the upgrade command as a background process.
-    error_bucket = Queue.Queue()
-    threading.Thread(
-      target=async_layout_upgrade,
-      args=(master_public_ip, options.keyname, upgrade_script_command,
-            error_bucket, options.verbose)
-    ).start()
-
     last_message = None
-    while True:
-      # Check if the SSH thread has crashed.
-      try:
-        ssh_error = error_bucket.get(block=False)
-        AppScaleLogger.warn('Error executing upgrade script')
-        LocalState.generate_crash_log(ssh_error, traceback.format_exc())
-      except Queue.Empty:
-        pass
-
-      upgrade_status_file = cls.UPGRADE_STATUS_FILE_LOC + timestamp + ".json"
-      command = 'cat' + " " + upgrade_status_file
-      upgrade_status = RemoteHelper.ssh(
-        master_public_ip, options.keyname, command, options.verbose)
-      json_status = json.loads(upgrade_status)
-
-      if 'status' not in json_status or 'message' not in json_status:
-        raise AppScaleException('Invalid status log format')
-
-      if json_status['status'] == 'complete':
-        AppScaleLogger.success(json_status['message'])
-        break
-
-      if json_status['status'] == 'inProgress':
-        if json_status['message'] != last_message:
-          AppScaleLogger.log(json_status['message'])
-          last_message = json_status['message']
-        time.sleep(cls.SLEEP_TIME)
-        continue
-
-      # Assume the message is an error.
-      AppScaleLogger.warn(json_status['message'])
-      raise AppScaleException(json_status['message'])
+    completed = False
+    try:
+      for line in RemoteHelper.ssh_stream(master_public_ip, options.keyname,
+                                          watch_script, options.verbose):
+        if not line.startswith(cls.UPGRADE_STATUS_MARKER):
+          AppScaleLogger.verbose('{0}: {1}'.format(master_public_ip, line),
+                                 options.verbose)
+          continue
+
+        try:
+          json_status = json.loads(line[len(cls.UPGRADE_STATUS_MARKER):])
+        except ValueError:
+          # The status file was read while it was being written.
+          continue
+
+        if 'status' not in json_status or 'message' not in json_status:
+          raise AppScaleException('Invalid status log format')
+
+        if json_status['status'] == 'complete':
+          AppScaleLogger.success(json_status['message'])
+          completed = True
+          continue
+
+        if json_status['status'] == 'inProgress':
+          if json_status['message'] != last_message:
+            AppScaleLogger.log(json_status['message'])
+            last_message = json_status['message']
+          continue
+
+        # Assume the message is an error.
+        AppScaleLogger.warn(json_status['message'])
+        raise AppScaleException(json_status['message'])
+    except ShellException as ssh_error:
+      AppScaleLogger.warn('Error executing upgrade script')
+      LocalState.generate_crash_log(ssh_error, traceback.format_exc())
+      raise AppScaleException('Error executing upgrade script')
+
+    if not completed:
+      raise AppScaleException('The upgrade script finished without reporting '
+                              'its status')
 
   @classmethod
   def shut_down_appscale_if_running(cls, options):
@@ -1142,17 +1391,14 @@ class AppScaleTools(object):
 
     AppScaleLogger.log("Upgrading AppScale code to the latest version on "
       "these machines: {}".format(unique_ips))
-    threads = []
     error_ips = []
-    for ip in unique_ips:
-      t = threading.Thread(target=cls.run_bootstrap, args=(ip, options, error_ips))
-      threads.append(t)
-
-    for x in threads:
-      x.start()
-
-    for x in threads:
-      x.join()
+    bootstrap = lambda ip: cls.run_bootstrap(ip, options, error_ips)
+    _, errors = RemoteHelper.fan_out(unique_ips, bootstrap,
+                                     description='Upgrading AppScale code')
+    for ip, exception in errors.iteritems():
+      AppScaleLogger.warn('Unable to upgrade AppScale code on {}: {}'.format(
+        ip, exception))
+      error_ips.append(ip)
 
     if not error_ips:
       cls.run_upgrade_script(options, node_layout)
@@ -1160,7 +1406,11 @@ class AppScaleTools(object):
   @classmethod
   def run_bootstrap(cls, ip, options, error_ips):
     try:
-      RemoteHelper.ssh(ip, options.keyname, cls.BOOTSTRAP_CMD, options.verbose)
+      for line in RemoteHelper.ssh_stream(ip, options.keyname,
+          cls.BOOTSTRAP_CMD, options.verbose,
+          num_retries=LocalState.DEFAULT_NUM_RETRIES, prefix=ip,
+          timestamps=True):
+        AppScaleLogger.verbose(line, options.verbose)
       AppScaleLogger.success(
         'Successfully updated and built AppScale on {}'.format(ip))
     except ShellException:
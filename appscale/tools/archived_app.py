@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+""" Reads applications that are packaged as tar.gz or zip files without
+extracting them, so that a prebuilt archive can be deployed as is. """
+
+
+# General-purpose Python library imports
+import copy
+import os
+import shutil
+import stat
+import tarfile
+import time
+import zipfile
+
+
+# AppScale-specific imports
+from app_config import AppConfig
+from appengine_helper import AppEngineHelper
+from custom_exceptions import AppEngineConfigException
+
+
+class ArchivedApp(object):
+  """ ArchivedApp reads an archived application's member list and its
+  configuration file straight from the archive, in memory.
+
+  Archives may hold the application itself, or a single directory that holds
+  it, just as when they used to be extracted. A tar.gz file that holds the
+  application itself is uploaded without being changed. Other archives are
+  repacked into a tar.gz stream as they are uploaded, with each member read
+  from the archive, so they are never written to disk either.
+  """
+
+
+  # The number of bytes copied at a time when an archive is passed through.
+  BLOCK_SIZE = 128 * 1024
+
+
+  # The first bytes of every gzip file.
+  GZIP_MAGIC = '\x1f\x8b'
+
+
+  # The name of the file that Python, Go and PHP apps are configured in.
+  APP_YAML = 'app.yaml'
+
+
+  # The mode that zip members without Unix permissions are given.
+  DEFAULT_MODE = 0644
+
+
+  # The value of ZipInfo.create_system for members made on Unix, whose
+  # external attributes hold the file's mode.
+  ZIP_UNIX_SYSTEM = 3
+
+
+  def __init__(self, archive_location):
+    """ Creates a new ArchivedApp, reading the archive's member list and its
+    configuration file.
+
+    Args:
+      archive_location: A str containing the location of the tar.gz or zip
+        file.
+    Raises:
+      AppEngineConfigException: If the file is not a valid archive, or if it
+        has no app.yaml or appengine-web.xml file.
+    """
+    self.archive_location = archive_location
+    self.is_zip = zipfile.is_zipfile(archive_location)
+    try:
+      if self.is_zip:
+        names, configs = self.read_zip()
+      else:
+        names, configs = self.read_tar()
+    except (tarfile.TarError, zipfile.BadZipfile, IOError, EOFError) as error:
+      raise AppEngineConfigException('{0} is not a valid tar.gz or zip file: '
+                                     '{1}'.format(archive_location, error))
+
+    self.root = self.find_root(names)
+    self.paths = sorted(name[len(self.root):] for name in names
+                        if name.startswith(self.root) and name != self.root)
+    self.app_config = self.find_config(configs)
+
+    # The AdminServer reads the application's files from the root of a
+    # gzipped tarball, which is exactly what such an archive already is.
+    self.passthrough = not self.is_zip and not self.root and \
+      self.is_gzip(archive_location)
+
+
+  @classmethod
+  def normalize_name(cls, name):
+    """ Removes the parts of a member's name that don't affect where it would
+    be extracted to.
+
+    Args:
+      name: A str containing the name of a member in an archive.
+    Returns:
+      A str containing the name without a leading './' or a trailing '/'.
+    """
+    while name.startswith('./'):
+      name = name[2:]
+    return name.rstrip('/')
+
+
+  @classmethod
+  def is_gzip(cls, archive_location):
+    """ Checks if a file is gzip-compressed.
+
+    Args:
+      archive_location: A str containing the location of the file.
+    Returns:
+      True if the file starts with the gzip magic number, and False otherwise.
+    """
+    with open(archive_location, 'rb') as archive_file:
+      return archive_file.read(len(cls.GZIP_MAGIC)) == cls.GZIP_MAGIC
+
+
+  def is_config_file(self, name):
+    """ Checks if a member could be the application's configuration file.
+
+    Args:
+      name: A str containing the member's normalized name.
+    Returns:
+      True if the member is named app.yaml or appengine-web.xml, and False
+      otherwise.
+    """
+    return os.path.basename(name) in (self.APP_YAML,
+                                      AppEngineHelper.APPENGINE_WEB_XML)
+
+
+  def read_tar(self):
+    """ Reads a tar file's member list, and the contents of the members that
+    could be the application's configuration file.
+
+    Returns:
+      A tuple containing a set of the normalized names of the members and of
+      the directories that hold them, and a dict that maps the names of the
+      possible configuration files to their contents.
+    """
+    names = set()
+    configs = {}
+    with tarfile.open(self.archive_location, 'r:*') as tar:
+      for member in tar:
+        name = self.normalize_name(member.name)
+        if not name:
+          continue
+        names.update(self.get_parents(name))
+        names.add(name + '/' if member.isdir() else name)
+        if member.isfile() and self.is_config_file(name):
+          configs[name] = tar.extractfile(member).read()
+    return names, configs
+
+
+  def read_zip(self):
+    """ Reads a zip file's member list, and the contents of the members that
+    could be the application's configuration file.
+
+    Returns:
+      A tuple containing a set of the normalized names of the members and of
+      the directories that hold them, and a dict that maps the names of the
+      possible configuration files to their contents.
+    """
+    names = set()
+    configs = {}
+    with zipfile.ZipFile(self.archive_location) as archive:
+      for info in archive.infolist():
+        name = self.normalize_name(info.filename)
+        if not name:
+          continue
+        is_directory = info.filename.endswith('/')
+        names.update(self.get_parents(name))
+        names.add(name + '/' if is_directory else name)
+        if not is_directory and not self.is_zip_symlink(info) and \
+          self.is_config_file(name):
+          configs[name] = archive.read(info)
+    return names, configs
+
+
+  @classmethod
+  def is_zip_symlink(cls, zip_info):
+    """ Checks if a zip member is a symbolic link, as stored by 'zip -y'.
+
+    Args:
+      zip_info: The zipfile.ZipInfo describing the member.
+    Returns:
+      True if the member is a symbolic link, whose contents are the path that
+      it points to, and False otherwise.
+    """
+    return zip_info.create_system == cls.ZIP_UNIX_SYSTEM and \
+      stat.S_ISLNK(zip_info.external_attr >> 16)
+
+
+  @classmethod
+  def get_parents(cls, name):
+    """ Lists the directories that hold a member, which archives don't always
+    have members for.
+
+    Args:
+      name: A str containing the member's normalized name.
+    Returns:
+      A list of strs containing the directories' names, each ending in '/'.
+    """
+    parts = name.split('/')[:-1]
+    return ['/'.join(parts[:depth]) + '/' for depth in range(1, len(parts) + 1)]
+
+
+  @classmethod
+  def find_root(cls, names):
+    """ Finds the directory in an archive that holds the application. Users
+    can archive their application or a directory that holds it, and some
+    platforms add dot files to every directory, which are not counted.
+
+    Args:
+      names: A set of strs containing the normalized names of the members,
+        with directories ending in '/'.
+    Returns:
+      A str containing the directory's name followed by '/', or an empty str
+      if the application is at the root of the archive.
+    """
+    top_level = set(name.split('/')[0] for name in names)
+    top_level = [name for name in top_level if not name.startswith('.')]
+    if len(top_level) == 1 and top_level[0] + '/' in names:
+      return top_level[0] + '/'
+    return ''
+
+
+  def find_config(self, configs):
+    """ Picks the application's configuration file, preferring an app.yaml
+    at the application's root to the shallowest appengine-web.xml.
+
+    Args:
+      configs: A dict that maps the names of possible configuration files to
+        their contents.
+    Returns:
+      An AppConfig for the configuration file.
+    Raises:
+      AppEngineConfigException: If the application has no configuration file.
+    """
+    app_yaml = self.root + self.APP_YAML
+    if app_yaml in configs:
+      return AppConfig(app_yaml, configs[app_yaml])
+
+    appengine_web_xmls = sorted(
+      (name.count('/'), name) for name in configs
+      if name.startswith(self.root) and
+      os.path.basename(name) == AppEngineHelper.APPENGINE_WEB_XML)
+    if appengine_web_xmls:
+      _, name = appengine_web_xmls[0]
+      return AppConfig(name, configs[name])
+
+    raise AppEngineConfigException("Couldn't find an app.yaml or " +
+      "appengine-web.xml file in {0}".format(self.archive_location))
+
+
+  def is_sdk_mismatch(self):
+    """ Returns if the archive lacks the version of the App Engine SDK jar
+    that AppScale supports, like AppEngineHelper.is_sdk_mismatch does for
+    directories.
+
+    Returns:
+      A boolean value indicating if the user may have an sdk version
+      compatibility error with AppScale.
+    """
+    target_jar = AppEngineHelper.JAVA_SDK_JAR_PREFIX + '-' + \
+      AppEngineHelper.SUPPORTED_SDK_VERSION + '.jar'
+    for path in self.paths:
+      directory, name = os.path.split(path)
+      if os.path.basename(directory) == AppEngineHelper.LIB and \
+        target_jar in name:
+        return False
+    return True
+
+
+  def belongs_to_app(self, name):
+    """ Checks if a member is part of the application.
+
+    Args:
+      name: A str containing the member's normalized name.
+    Returns:
+      True if the member is under the application's directory, and False
+      otherwise.
+    """
+    return bool(name) and name.startswith(self.root) and \
+      name + '/' != self.root
+
+
+  def iter_tar_members(self):
+    """ Reads the members of a tar file that belong to the application.
+
+    Yields:
+      Tuples containing a TarInfo for each member, named by its path in the
+      application, and a file-like object with its contents, or None if it
+      has no contents.
+    """
+    with tarfile.open(self.archive_location, 'r:*') as tar:
+      for member in tar:
+        name = self.normalize_name(member.name)
+        if not self.belongs_to_app(name):
+          continue
+
+        info = copy.copy(member)
+        info.name = name[len(self.root):]
+        if member.islnk():
+          info.linkname = self.normalize_name(member.linkname)[len(self.root):]
+        if member.isfile():
+          yield info, tar.extractfile(member)
+        else:
+          yield info, None
+
+
+  def iter_zip_members(self):
+    """ Reads the members of a zip file that belong to the application.
+
+    Yields:
+      Tuples containing a TarInfo for each member, named by its path in the
+      application, and a file-like object with its contents, or None if it
+      has no contents.
+    """
+    with zipfile.ZipFile(self.archive_location) as archive:
+      for zip_info in archive.infolist():
+        name = self.normalize_name(zip_info.filename)
+        if not self.belongs_to_app(name):
+          continue
+
+        info = tarfile.TarInfo(name[len(self.root):])
+        info.mtime = time.mktime(zip_info.date_time + (0, 0, -1))
+        info.mode = (zip_info.external_attr >> 16) & 0777 or self.DEFAULT_MODE
+        if zip_info.filename.endswith('/'):
+          info.type = tarfile.DIRTYPE
+          info.mode |= 0111
+          yield info, None
+        elif self.is_zip_symlink(zip_info):
+          info.type = tarfile.SYMTYPE
+          info.linkname = archive.read(zip_info)
+          yield info, None
+        else:
+          info.size = zip_info.file_size
+          yield info, archive.open(zip_info)
+
+
+  def write_tarball(self, fileobj, packager):
+    """ Writes the application as a gzipped tarball, passing the archive
+    through unchanged if it already is one.
+
+    Args:
+      fileobj: A file-like object to write the tarball to.
+      packager: The gzip AppPackager to repack the archive with.
+    """
+    if self.passthrough:
+      with open(self.archive_location, 'rb') as archive_file:
+        shutil.copyfileobj(archive_file, fileobj, self.BLOCK_SIZE)
+      return
+
+    members = self.iter_zip_members() if self.is_zip \
+      else self.iter_tar_members()
+    with packager.open(fileobj) as archive:
+      for info, member_file in members:
+        archive.add_member(info, member_file)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+""" Lets callers talk to AppControllers without waiting for each call to
+finish, so that calls to many machines, or several calls to one machine, can
+be in flight at once. """
+
+
+# General-purpose Python library imports
+import Queue
+import sys
+import threading
+import time
+
+
+# AppScale-specific imports
+from appcontroller_client import AppControllerClient
+from custom_exceptions import TimeoutException
+
+
+class CallFuture(object):
+  """ CallFuture holds the outcome of a call that runs in the background. """
+
+
+  def __init__(self):
+    """ Creates a new CallFuture for a call that has not finished yet. """
+    self.finished = threading.Event()
+    self.value = None
+    self.exc_info = None
+
+
+  def set_result(self, value):
+    """ Records that the call returned.
+
+    Args:
+      value: Whatever the call returned.
+    """
+    self.value = value
+    self.finished.set()
+
+
+  def set_exception(self, exc_info):
+    """ Records that the call raised an exception.
+
+    Args:
+      exc_info: The tuple that sys.exc_info returned for the exception.
+    """
+    self.exc_info = exc_info
+    self.finished.set()
+
+
+  def done(self):
+    """ Checks if the call has finished.
+
+    Returns:
+      True if the call returned or raised an exception, and False otherwise.
+    """
+    return self.finished.is_set()
+
+
+  def result(self, timeout=None):
+    """ Waits for the call to finish, and returns what it returned.
+
+    Args:
+      timeout: The number of seconds to wait for the call, or None to wait
+        until it finishes.
+    Returns:
+      Whatever the call returned.
+    Raises:
+      TimeoutException: If the call did not finish in time.
+      Any exception that the call raised.
+    """
+    if not self.finished.wait(timeout):
+      raise TimeoutException("Call did not finish within {0} seconds".
+                             format(timeout))
+    if self.exc_info is not None:
+      raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+    return self.value
+
+
+class AsyncAppControllerClient(object):
+  """ AsyncAppControllerClient has the same methods as AppControllerClient,
+  but each one returns a CallFuture right away instead of waiting for the
+  AppController to answer.
+
+  Calls run on a pool of worker threads that is shared by every client, and
+  keep the per-call timeouts and retries of the AppControllerClient that they
+  wrap. AppControllerClient itself remains the synchronous interface.
+  """
+
+
+  # The maximum number of calls that can run at once, across all clients.
+  MAX_WORKERS = 20
+
+
+  # A Queue of (future, function, args, kwargs) tuples for calls that have not
+  # started yet.
+  pending_calls = Queue.Queue()
+
+
+  # The worker threads that have been started.
+  workers = []
+
+
+  # The number of worker threads that are waiting for a call to run, and that
+  # no call in pending_calls has been handed to yet.
+  idle_workers = 0
+
+
+  # The number of calls in pending_calls that wait for a busy worker, because
+  # MAX_WORKERS were running when they were submitted.
+  unclaimed_calls = 0
+
+
+  # Guards workers, idle_workers and unclaimed_calls.
+  lock = threading.Lock()
+
+
+  def __init__(self, client):
+    """ Creates a new AsyncAppControllerClient.
+
+    Args:
+      client: The AppControllerClient whose calls should run in the background.
+    """
+    self.client = client
+
+
+  def __getattr__(self, name):
+    """ Returns a version of the named AppControllerClient method that runs in
+    the background.
+
+    Args:
+      name: A str containing the name of the method.
+    Returns:
+      A function that takes the same arguments as the method, and returns a
+      CallFuture for its result.
+    """
+    method = getattr(self.client, name)
+    if not callable(method):
+      return method
+
+    def submit_call(*args, **kwargs):
+      return self.submit(method, *args, **kwargs)
+    return submit_call
+
+
+  @classmethod
+  def submit(cls, function, *args, **kwargs):
+    """ Schedules a function to run on the worker pool.
+
+    Args:
+      function: The function to run.
+      *args: The arguments that will be passed to function.
+      **kwargs: The keyword arguments that will be passed to function.
+    Returns:
+      A CallFuture for the result of the function.
+    """
+    future = CallFuture()
+    with cls.lock:
+      cls.pending_calls.put((future, function, args, kwargs))
+      # Each call is handed to a worker of its own as it is submitted, so that
+      # a burst of calls doesn't queue up behind a single idle worker.
+      if cls.idle_workers > 0:
+        cls.idle_workers -= 1
+      elif len(cls.workers) < cls.MAX_WORKERS:
+        worker = threading.Thread(target=cls.run_worker)
+        worker.daemon = True
+        worker.start()
+        cls.workers.append(worker)
+      else:
+        cls.unclaimed_calls += 1
+    return future
+
+
+  @classmethod
+  def run_worker(cls):
+    """ Runs calls from pending_calls until the process exits. """
+    while True:
+      future, function, args, kwargs = cls.pending_calls.get()
+      try:
+        future.set_result(function(*args, **kwargs))
+      except Exception:
+        future.set_exception(sys.exc_info())
+
+      with cls.lock:
+        if cls.unclaimed_calls > 0:
+          cls.unclaimed_calls -= 1
+        else:
+          cls.idle_workers += 1
+
+
+  @classmethod
+  def wait_for_all(cls, futures, deadline=None):
+    """ Waits for several calls to finish, sharing one deadline between them.
+
+    Args:
+      futures: A dict that maps keys, such as hosts, to CallFutures.
+      deadline: The number of seconds to wait for all of the calls, or None to
+        wait until they finish.
+    Returns:
+      A tuple containing a dict that maps the key of each call that returned
+      to its result, and a dict that maps the key of each call that failed to
+      the exception that it raised. Calls that missed the deadline are given
+      a TimeoutException.
+    """
+    end_time = None
+    if deadline is not None:
+      end_time = time.time() + deadline
+
+    results = {}
+    errors = {}
+    for key, future in futures.iteritems():
+      timeout = None
+      if end_time is not None:
+        timeout = max(0, end_time - time.time())
+      try:
+        results[key] = future.result(timeout)
+      except Exception as exception:
+        errors[key] = exception
+    return results, errors
+
+
+  @classmethod
+  def call_all(cls, hosts, secret, method_name, *args, **kwargs):
+    """ Calls the same AppControllerClient method on several AppControllers
+    at once.
+
+    Args:
+      hosts: A list of strs naming the machines whose AppControllers should be
+        called.
+      secret: A str containing the secret key of the deployment.
+      method_name: A str containing the name of the AppControllerClient method
+        to call.
+      *args: The arguments that will be passed to the method.
+      deadline: A keyword argument with the number of seconds to wait for all
+        of the calls, or None to wait until they finish.
+    Returns:
+      A tuple containing a dict that maps each host whose call returned to its
+      result, and a dict that maps each host whose call failed to the
+      exception that it raised.
+    """
+    deadline = kwargs.pop('deadline', None)
+    futures = {}
+    for host in hosts:
+      if host not in futures:
+        client = cls(AppControllerClient(host, secret))
+        futures[host] = getattr(client, method_name)(*args, **kwargs)
+    return cls.wait_for_all(futures, deadline)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+""" A transport that calls AppController methods with JSON over HTTPS instead
+of SOAP, so that large answers like cluster stats don't need to be wrapped in,
+and parsed out of, XML envelopes. """
+
+
+# General-purpose Python library imports
+import httplib
+import json
+import os
+import socket
+import threading
+import zlib
+
+
+# AppScale-specific imports
+from custom_exceptions import AppControllerException
+from soap_transport import HTTPSConnectionPool
+
+
+class JSONProxy(object):
+  """ JSONProxy calls AppController methods the same way that SOAPpy's
+  SOAPProxy does, so that AppControllerClient can use either one.
+
+  The AppController lists the methods that it serves over JSON when asked for
+  JSON_PATH, and sends answers compressed with gzip if they are large. Answers
+  that are strs, like the JSON documents that most methods return, are sent as
+  plain text so that they are not encoded twice. Methods that the
+  AppController does not list, and AppControllers that do not answer, are
+  called over SOAP instead.
+
+  The AppController is only asked for its methods when the first call is
+  made, and is asked again by later calls if it could not be reached.
+
+  The JSON transport is only tried when the APPSCALE_CONTROLLER_TRANSPORT
+  environment variable is set to 'json'.
+  """
+
+
+  # The environment variable that selects which transport to try first.
+  TRANSPORT_ENV_VAR = 'APPSCALE_CONTROLLER_TRANSPORT'
+
+
+  # The value of TRANSPORT_ENV_VAR that selects the JSON transport.
+  JSON_TRANSPORT = 'json'
+
+
+  # The path that AppControllers serve JSON calls under.
+  JSON_PATH = '/json'
+
+
+  # The number of seconds to wait for an AppController to say which methods
+  # it serves over JSON.
+  NEGOTIATE_TIMEOUT = 5
+
+
+  # A dict that maps 'host:port' strs to the set of methods that the
+  # AppController there serves over JSON, or None if it serves none. Only
+  # AppControllers that answered are listed.
+  supported_methods = {}
+
+
+  # Guards supported_methods, since clients can be made from several threads.
+  lock = threading.Lock()
+
+
+  def __init__(self, host, fallback):
+    """ Creates a new JSONProxy.
+
+    Args:
+      host: A str containing the host and port of the AppController.
+      fallback: The SOAPpy.SOAPProxy to use for methods that are not served
+        over JSON.
+    """
+    self.host = host
+    self.fallback = fallback
+
+
+  def __getattr__(self, name):
+    """ Returns a function that calls the named AppController method.
+
+    Args:
+      name: A str containing the name of the method.
+    Returns:
+      A function that takes the method's arguments and returns its answer.
+    Raises:
+      AttributeError: If the name is private, since it can't be a method.
+    """
+    if name.startswith('_'):
+      raise AttributeError(name)
+
+    def call_method(*args):
+      methods = self.negotiate(self.host)
+      if not methods or name not in methods:
+        return getattr(self.fallback, name)(*args)
+      return self.call(name, *args)
+    return call_method
+
+
+  @classmethod
+  def is_enabled(cls):
+    """ Checks if AppControllers should be asked for the JSON transport.
+
+    Returns:
+      True if the JSON transport has been selected, and False otherwise.
+    """
+    return os.environ.get(cls.TRANSPORT_ENV_VAR) == cls.JSON_TRANSPORT
+
+
+  @classmethod
+  def negotiate(cls, host):
+    """ Asks an AppController which methods it serves over JSON, remembering
+    the answer for later clients.
+
+    Args:
+      host: A str containing the host and port of the AppController.
+    Returns:
+      A set containing the names of the methods that are served over JSON, or
+      None if the AppController does not serve any or could not be reached.
+    """
+    with cls.lock:
+      if host in cls.supported_methods:
+        return cls.supported_methods[host]
+
+    try:
+      response, body = HTTPSConnectionPool.request(
+        host, 'GET', cls.JSON_PATH, None, {'Accept-Encoding': 'gzip'},
+        cls.NEGOTIATE_TIMEOUT)
+    except (httplib.HTTPException, socket.error):
+      # The AppController may not be running yet, so the next call asks
+      # again instead of giving up on JSON for the rest of this process.
+      return None
+
+    methods = None
+    if response.status == 200:
+      try:
+        methods = set(cls.decode(response, body)['methods'])
+      except (ValueError, KeyError, TypeError, zlib.error):
+        # AppControllers that don't know about JSON are still reachable over
+        # SOAP, so this is not an error.
+        pass
+
+    with cls.lock:
+      cls.supported_methods[host] = methods
+    return methods
+
+
+  @classmethod
+  def decode(cls, response, body):
+    """ Decompresses and, if needed, parses the body of a response.
+
+    Args:
+      response: The httplib.HTTPResponse that the body came from.
+      body: A str containing the body of the response.
+    Returns:
+      The value that the body encodes, or the body itself if it is plain text.
+    Raises:
+      ValueError: If the body is not valid JSON.
+      zlib.error: If the body could not be decompressed.
+    """
+    if response.getheader('content-encoding', '') == 'gzip':
+      body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if response.getheader('content-type', '').startswith('text/plain'):
+      return body
+    return json.loads(body)
+
+
+  def call(self, name, *args):
+    """ Calls an AppController method over JSON.
+
+    Args:
+      name: A str containing the name of the method.
+      *args: The arguments to pass to the method, including the secret.
+    Returns:
+      The answer that the AppController gave, which is the same value that
+      the SOAP call would have returned.
+    Raises:
+      AppControllerException: If the AppController could not answer the call.
+    """
+    headers = {
+      'Accept-Encoding': 'gzip',
+      'Content-Type': 'application/json'
+    }
+    response, body = HTTPSConnectionPool.request(
+      self.host, 'POST', '{0}/{1}'.format(self.JSON_PATH, name),
+      json.dumps(args), headers)
+
+    if response.status == 404:
+      # The AppController may have been replaced with one that no longer
+      # serves this method over JSON.
+      with self.lock:
+        self.supported_methods[self.host] = None
+      return getattr(self.fallback, name)(*args)
+
+    if response.status != 200:
+      raise AppControllerException('{0} failed with HTTP status {1}: {2}'.
+                                   format(name, response.status,
+                                          response.reason))
+
+    try:
+      return self.decode(response, body)
+    except (ValueError, zlib.error) as decode_error:
+      raise AppControllerException('Could not read the answer to {0}: {1}'.
+                                   format(name, decode_error))
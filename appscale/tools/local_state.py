@@ -2,7 +2,8 @@
 
 
 # First-party Python imports
-import fnmatch
+import collections
+import datetime
 import getpass
 import glob
 import hashlib
@@ -19,6 +20,7 @@ import yaml
 
 
 # AppScale-specific imports
+from app_index import AppIndex
 from appcontroller_client import AppControllerClient
 from appscale_logger import AppScaleLogger
 from custom_exceptions import AppControllerException
@@ -26,6 +28,7 @@ from custom_exceptions import AppScaleException
 from custom_exceptions import AppScalefileException
 from custom_exceptions import BadConfigurationException
 from custom_exceptions import ShellException
+from retry_policy import RetryPolicy
 
 
 # The version of the AppScale Tools we're running on.
@@ -69,6 +72,22 @@ class LocalState(object):
   DEFAULT_PASSWORD = "aaaaaa"
 
 
+  # The number of trailing output lines that stream_shell keeps, to report
+  # why a command failed.
+  STREAM_TAIL_LINES = 100
+
+
+  # The prefix of the delimiters of here documents that hold secrets, such as
+  # private keys. Their contents are left out of logs and error messages.
+  SECRET_HEREDOC_PREFIX = 'APPSCALE-SECRET'
+
+
+  # Matches the contents of a secret here document, between the line that
+  # starts it and the delimiter that ends it.
+  SECRET_HEREDOC = re.compile(r"(<<'({0}[\w-]*)'[^\n]*\n).*?^(\2)".format(
+    SECRET_HEREDOC_PREFIX), re.DOTALL | re.MULTILINE)
+
+
   @classmethod
   def make_appscale_directory(cls):
     """Creates a ~/.appscale directory, if it doesn't already exist.
@@ -919,29 +938,48 @@ class LocalState(object):
         os.remove(file_to_remove)
 
 
+  @classmethod
+  def redact(cls, text):
+    """Removes the contents of secret here documents from a command or script,
+    so that it can be logged or put in an error message.
+
+    Args:
+      text: A str containing a command or script, or None.
+    Returns:
+      The str, with the contents of each here document whose delimiter starts
+      with SECRET_HEREDOC_PREFIX replaced.
+    """
+    if not text:
+      return text
+    return cls.SECRET_HEREDOC.sub(r'\1<redacted>\n\3', text)
+
+
   @classmethod
   def shell(cls, command, is_verbose, num_retries=DEFAULT_NUM_RETRIES,
     stdin=None):
-    """Executes a command on this machine, retrying it up to five times if it
-    initially fails.
+    """Executes a command on this machine, retrying it if it initially fails.
 
     Args:
       command: A str representing the command to execute.
       is_verbose: A bool that indicates if we should print the command we are
         executing to stdout.
       num_retries: The number of times we should try to execute the given
-        command before aborting.
+        command before aborting, or a RetryPolicy that decides which failures
+        to retry and how long to wait between attempts.
       stdin: A str that is passes as standard input to the process
     Returns:
       A str with both the standard output and standard error produced when the
       command executes.
     Raises:
-      ShellException: If, after five attempts, executing the named command
-      failed.
+      ShellException: If, after all allowed attempts, executing the named
+      command failed.
     """
-    tries_left = num_retries
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
     try:
-      while tries_left:
+      while True:
+        attempt += 1
         AppScaleLogger.verbose("shell> {0}".format(command), is_verbose)
         the_temp_file = tempfile.NamedTemporaryFile()
         if stdin is not None:
@@ -949,7 +987,7 @@ class LocalState(object):
           stdin_strio.write(stdin)
           stdin_strio.seek(0)
           AppScaleLogger.verbose("       stdin str: {0}"\
-            .format(stdin), is_verbose)
+            .format(cls.redact(stdin)), is_verbose)
           result = subprocess.Popen(command, shell=True, stdout=the_temp_file,
             stdin=stdin_strio, stderr=subprocess.STDOUT)
         else:
@@ -965,31 +1003,130 @@ class LocalState(object):
           output = the_temp_file.read()
           the_temp_file.close()
           return output
-        tries_left -= 1
-        if tries_left:
+
+        delay = retry_policy.get_delay(attempt, result.returncode, waited)
+        if delay is not None:
           the_temp_file.close()
-          AppScaleLogger.verbose("Command failed. Trying again momentarily." \
-            .format(command), is_verbose)
+          AppScaleLogger.verbose("Command failed with exit code {0}. Trying "
+            "again in {1:.1f} seconds.".format(result.returncode, delay),
+            is_verbose)
         else:
           the_temp_file.seek(0)
           output = the_temp_file.read()
           the_temp_file.close()
           if stdin:
             raise ShellException("Executing command '{0} {1}' failed:\n{2}"\
-                    .format(command, stdin, output))
+                    .format(command, cls.redact(stdin), output))
           else:
             raise ShellException("Executing command '{0}' failed:\n{1}"\
                     .format(command, output))
-        time.sleep(1)
+        time.sleep(delay)
+        waited += delay
     except OSError as os_error:
       if stdin:
         raise ShellException("Error executing command: '{0} {1}':{2}"\
-                .format(command, stdin, os_error))
+                .format(command, cls.redact(stdin), os_error))
       else:
         raise ShellException("Error executing command: '{0}':{1}"\
                 .format(command, os_error))
 
 
+  @classmethod
+  def stream_shell(cls, command, is_verbose, num_retries=1, stdin=None,
+    prefix=None, timestamps=False):
+    """Executes a command on this machine, yielding its output line by line as
+    it is produced.
+
+    Only the last few lines of output are kept, so memory use does not grow
+    with long-running commands. If the command is retried, the output of the
+    next attempt follows the output of the failed one.
+
+    Args:
+      command: A str representing the command to execute.
+      is_verbose: A bool that indicates if we should print the command we are
+        executing to stdout.
+      num_retries: The number of times we should try to execute the given
+        command before aborting, or a RetryPolicy.
+      stdin: A str that is passes as standard input to the process
+      prefix: A str that, if given, is put in front of each line, such as the
+        name of the host that produced it.
+      timestamps: A bool that indicates if each line should start with the
+        time at which it was read.
+    Yields:
+      strs, each containing one line of the standard output and standard error
+      produced by the command, without the trailing newline.
+    Raises:
+      ShellException: If, after all allowed attempts, executing the named
+      command failed.
+    """
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
+    while True:
+      attempt += 1
+      AppScaleLogger.verbose("shell> {0}".format(command), is_verbose)
+      stdin_file = None
+      if stdin is not None:
+        stdin_file = tempfile.TemporaryFile()
+        stdin_file.write(stdin)
+        stdin_file.seek(0)
+        AppScaleLogger.verbose("       stdin str: {0}".format(
+          cls.redact(stdin)), is_verbose)
+
+      try:
+        process = subprocess.Popen(command, shell=True,
+          stdout=subprocess.PIPE, stdin=stdin_file, stderr=subprocess.STDOUT)
+      except OSError as os_error:
+        if stdin_file is not None:
+          stdin_file.close()
+        if stdin:
+          raise ShellException("Error executing command: '{0} {1}':{2}"\
+                  .format(command, cls.redact(stdin), os_error))
+        else:
+          raise ShellException("Error executing command: '{0}':{1}"\
+                  .format(command, os_error))
+
+      tail = collections.deque(maxlen=cls.STREAM_TAIL_LINES)
+      try:
+        for line in iter(process.stdout.readline, ''):
+          line = line.rstrip('\n')
+          tail.append(line)
+          if prefix is not None:
+            line = '{0}: {1}'.format(prefix, line)
+          if timestamps:
+            line = '[{0}] {1}'.format(
+              datetime.datetime.now().strftime('%H:%M:%S'), line)
+          yield line
+        process.wait()
+      finally:
+        # Stop the command if the caller stopped reading its output.
+        if process.poll() is None:
+          process.kill()
+          process.wait()
+        process.stdout.close()
+        if stdin_file is not None:
+          stdin_file.close()
+
+      if process.returncode == 0:
+        return
+
+      delay = retry_policy.get_delay(attempt, process.returncode, waited)
+      if delay is None:
+        output = '\n'.join(tail)
+        if stdin:
+          raise ShellException("Executing command '{0} {1}' failed:\n{2}"\
+                  .format(command, cls.redact(stdin), output))
+        else:
+          raise ShellException("Executing command '{0}' failed:\n{1}"\
+                  .format(command, output))
+
+      AppScaleLogger.verbose("Command failed with exit code {0}. Trying "
+        "again in {1:.1f} seconds.".format(process.returncode, delay),
+        is_verbose)
+      time.sleep(delay)
+      waited += delay
+
+
   @classmethod
   def require_ssh_commands(cls, needs_expect, is_verbose):
     """Checks to make sure the commands needed to set up passwordless SSH
@@ -1043,79 +1180,6 @@ class LocalState(object):
     return public_key, private_key
 
 
-  @classmethod
-  def extract_tgz_app_to_dir(cls, tar_location, is_verbose):
-    """Extracts the given tar.gz file to a randomly generated location and
-    returns that location.
-
-    Args:
-      archive_location: The location on the local filesystem where the tar.gz
-        file to extract can be found.
-      is_verbose: A bool that indicates if we should print the command we
-        execute to stdout.
-    Returns:
-      The location on the local filesystem where the file was extracted
-        to.
-    """
-    return cls.extract_app_to_dir(tar_location, "tar zxvf", is_verbose)
-
-
-  @classmethod
-  def extract_zip_app_to_dir(cls, zip_location, is_verbose):
-    """Extracts the given zip file to a randomly generated location and
-    returns that location.
-
-    Args:
-      archive_location: The location on the local filesystem where the zip file
-        to extract can be found.
-      is_verbose: A bool that indicates if we should print the command we
-        execute to stdout.
-    Returns:
-      The location on the local filesystem where the file was extracted
-        to.
-    """
-    return cls.extract_app_to_dir(zip_location, "unzip", is_verbose)
-
-
-  @classmethod
-  def extract_app_to_dir(cls, archive_location, extract_command, is_verbose):
-    """Extracts the given file to a randomly generated location and returns that
-    location.
-
-    Args:
-      archive_location: The location on the local filesystem where the file
-        to extract can be found.
-      extract_command: The command and flags necessary to extract the archived
-        file.
-      is_verbose: A bool that indicates if we should print the command we
-        execute to stdout.
-    Returns:
-      The location on the local filesystem where the file was extracted
-        to.
-    """
-    extracted_location = "/tmp/appscale-app-{0}".format(str(uuid.uuid4()) \
-      .replace('-', '')[:8])
-
-    os.mkdir(extracted_location)
-    cls.shell("cd {0} && {1} '{2}'".format(extracted_location, extract_command,
-      os.path.abspath(archive_location)), is_verbose)
-
-    file_list = os.listdir(extracted_location)
-    if len(file_list) > 0:
-      # Users can upload an archive containing their application or a directory
-      # containing their application. To see which case this is, we count how
-      # many files are present in the archive. As some platforms will inject a
-      # dot file into every directory, we shouldn't consider those when trying
-      # to find out if this archive is just a directory or not (because the
-      # presence of the dot file will cause our count to be incorrect).
-      file_list[:] = [itm for itm in file_list if itm[0] != '.']
-      included_dir = extracted_location + os.sep + file_list[0]
-      if len(file_list) == 1 and os.path.isdir(included_dir):
-        extracted_location = included_dir
-
-    return extracted_location
-
-
   @classmethod
   def generate_crash_log(cls, exception, stacktrace):
     """Writes information to the local filesystem about an uncaught exception
@@ -1239,12 +1303,16 @@ class LocalState(object):
     return False
 
   @classmethod
-  def get_extra_go_dependencies(cls, app_base, test=False):
+  def get_extra_go_dependencies(cls, app_base, test=False, index=None,
+                                cache=None):
     """ Collects a list of additional source files to include in the Go app.
 
     Args:
       app_base: A string specifying the application directory.
       test: A boolean indicating that the user does not want to be prompted.
+      index: The AppIndex of the application, or None to walk its directory.
+      cache: The AppCache to reuse the dependencies found by go-app-builder
+        from, or None to always run it.
     Returns:
       A dictionary mapping file names to their location on the file system.
     """
@@ -1292,12 +1360,22 @@ class LocalState(object):
           raise AppScaleException('Your application was not deployed.')
       return {}
 
+    index = index or AppIndex(app_base)
+    go_sources = index.match_files('*.go')
     go_files = []
-    for root, _, filenames in os.walk(app_base):
-      relative_dir = os.path.relpath(root, app_base)
-      for filename in fnmatch.filter(filenames, '*.go'):
-        relative_path = os.path.join(relative_dir, filename)
-        go_files.append(relative_path)
+    for relative_path in go_sources:
+      relative_dir, filename = os.path.split(relative_path)
+      go_files.append(os.path.join(relative_dir or '.', filename))
+
+    if cache is not None:
+      fingerprint = cache.fingerprint_go_build(
+        app_base, dict((path, index.files[path]) for path in go_sources),
+        goroot, gopath, gab, index.stats)
+      extras = cache.get_go_extras(fingerprint)
+      if extras is not None:
+        AppScaleLogger.log('Using the cached Go dependencies of this '
+                           'application')
+        return extras
 
     gab_args = [gab,
                 '-app_base', app_base,
@@ -1329,4 +1407,6 @@ class LocalState(object):
       relative_path = os.path.join('gopath', 'src', relative_path)
       extras[relative_path] = absolute_path
 
+    if cache is not None:
+      cache.put_go_extras(fingerprint, extras)
     return extras
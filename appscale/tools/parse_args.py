@@ -21,6 +21,7 @@ from agents.base_agent import BaseAgent
 from agents.ec2_agent import EC2Agent
 from agents.gce_agent import GCEAgent
 from agents.factory import InfrastructureAgentFactory
+from app_packager import AppPackager
 from custom_exceptions import BadConfigurationException
 from local_state import APPSCALE_VERSION
 from local_state import LocalState
@@ -131,6 +132,11 @@ class ParseArgs(object):
   DEFAULT_MAX_MEMORY = 400
 
 
+  # The number of applications that are packaged, and copied, at once when
+  # several are deployed together.
+  DEFAULT_PARALLEL_DEPLOYS = 2
+
+
   def __init__(self, argv, function):
     """Creates a new ParseArgs for a set of acceptable flags.
 
@@ -332,8 +338,31 @@ class ParseArgs(object):
       self.parser.add_argument('--keyname', default=self.DEFAULT_KEYNAME,
         help="the keypair name to use")
     elif function == "appscale-upload-app":
-      self.parser.add_argument('--file',
+      files_group = self.parser.add_mutually_exclusive_group()
+      files_group.add_argument('--file',
         help="a directory containing the Google App Engine app to upload")
+      files_group.add_argument('--files', nargs='+',
+        help="directories or archives containing several Google App Engine " \
+          "apps to upload at once")
+      self.parser.add_argument('--parallel', type=int,
+        default=self.DEFAULT_PARALLEL_DEPLOYS,
+        help="the number of apps to package and copy at once when " \
+          "uploading several")
+      self.parser.add_argument('--compression', default=AppPackager.GZIP,
+        choices=AppPackager.CODECS,
+        help="the codec to compress uploads to the login node with")
+      self.parser.add_argument('--compression-level', type=int,
+        default=AppPackager.DEFAULT_LEVEL,
+        help="how hard to compress uploads, from 1 (fastest) to 9 (smallest)")
+      self.parser.add_argument('--no-cache', action='store_true',
+        default=False,
+        help="packages apps from scratch instead of reusing packaging work " \
+          "cached in ~/.appscale/cache")
+      self.parser.add_argument('--cache-hash-contents', action='store_true',
+        default=False,
+        help="hashes the contents of app files to decide if cached " \
+          "packaging work can be reused, instead of trusting their size " \
+          "and modification time")
       self.parser.add_argument('--keyname', '-k',
         default=self.DEFAULT_KEYNAME,
         help="the keypair name to use")
@@ -442,10 +471,19 @@ class ParseArgs(object):
     elif function == "appscale-add-keypair":
       self.validate_ips_flags()
     elif function == "appscale-upload-app":
-      if not self.args.file:
+      if self.args.files:
+        for app_file in self.args.files:
+          self.shell_check(app_file)
+      elif not self.args.file:
         raise SystemExit("Must specify --file.")
       else:
         self.shell_check(self.args.file)
+
+      if self.args.parallel < 1:
+        raise BadConfigurationException("--parallel must be at least 1.")
+      if not 1 <= self.args.compression_level <= 9:
+        raise BadConfigurationException("--compression-level must be " \
+          "between 1 and 9.")
     elif function == "appscale-gather-logs":
       if not self.args.location:
         self.args.location = "/tmp/{0}-logs/".format(self.args.keyname)
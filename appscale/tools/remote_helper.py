@@ -2,8 +2,13 @@
 
 
 # General-purpose Python library imports
+import atexit
+import base64
 import getpass
+import hashlib
+import json
 import os
+import Queue
 import re
 import socket
 import subprocess
@@ -15,9 +20,15 @@ import time
 import uuid
 import yaml
 
+from cStringIO import StringIO
+
 
 # AppScale-specific imports
 from agents.factory import InfrastructureAgentFactory
+from app_index import AppIndex
+from app_manifest import AppManifest
+from app_manifest import ChecksumWriter
+from app_packager import AppPackager
 from appcontroller_client import AppControllerClient
 from appengine_helper import AppEngineHelper
 from appscale_logger import AppScaleLogger
@@ -30,6 +41,9 @@ from agents.gce_agent import CredentialTypes
 from agents.gce_agent import GCEAgent
 from local_state import APPSCALE_VERSION
 from local_state import LocalState
+from retry_policy import RetryPolicy
+from ssh_transport import SSHTransportPool
+from waiter import Waiter
 
 
 class RemoteHelper(object):
@@ -54,6 +68,22 @@ class RemoteHelper(object):
     "-o StrictHostkeyChecking=no -o UserKnownHostsFile=/dev/null"
 
 
+  # The prefix of the lines that scripts started by run_script print to report
+  # the exit status and output of each of their steps.
+  SCRIPT_STEP_MARKER = 'APPSCALE-STEP'
+
+
+  # The line that ends the archive embedded in scripts started by push_bundle.
+  # It marks the archive as secret, so that it is never logged.
+  BUNDLE_END_MARKER = LocalState.SECRET_HEREDOC_PREFIX + '-BUNDLE-END'
+
+
+  # The number of seconds that a multiplexed SSH master connection should stay
+  # open once its last session has finished. Masters are also closed
+  # explicitly when the tools exit.
+  SSH_CONTROL_PERSIST = 600
+
+
   # The amount of time to wait when waiting for all API services to start on
   # a machine.
   WAIT_TIME = 10
@@ -63,6 +93,20 @@ class RemoteHelper(object):
   MAX_WAIT_TIME = 15 * 60
 
 
+  # The number of seconds that a single attempt to connect to a port may take.
+  PORT_PROBE_TIMEOUT = 5.0
+
+
+  # The number of seconds to wait before probing a closed port again. The wait
+  # doubles after each attempt, up to WAIT_TIME.
+  PORT_PROBE_MIN_DELAY = 1
+
+
+  # The maximum number of machines that fan_out operates on at once, by
+  # default.
+  MAX_FAN_OUT_WORKERS = 20
+
+
   # The message that is sent if we try to log into a VM as the root user but
   # root login isn't enabled yet.
   LOGIN_AS_UBUNTU_USER = 'Please login as the user "ubuntu" rather than ' + \
@@ -82,6 +126,20 @@ class RemoteHelper(object):
   REMOTE_APP_DIR = "{0}/apps".format(PERSISTENT_MOUNT_POINT)
 
 
+  # The directory on the login node that holds the contents of uploaded
+  # application files, named by their hashes.
+  REMOTE_CONTENT_DIR = "{0}/.contents".format(REMOTE_APP_DIR)
+
+
+  # The directory on the login node that holds the manifest of the last upload
+  # of each application.
+  REMOTE_MANIFEST_DIR = "{0}/.manifests".format(REMOTE_APP_DIR)
+
+
+  # The line that ends the scripts sent to rebuild an application's tarball.
+  REBUILD_END_MARKER = 'APPSCALE-REBUILD-END'
+
+
   # A regular expression that matches AppScale version numbers.
   VERSION_REGEX = "\A\d+\.\d+\.\d+\Z"
 
@@ -90,6 +148,16 @@ class RemoteHelper(object):
   CONFIG_DIR = '/etc/appscale'
 
 
+  # A dict that maps (host, user, keyname) tuples to the control socket used
+  # to share a single SSH connection to that machine.
+  ssh_control_paths = {}
+
+
+  # Guards the creation of control sockets, since remote operations can be
+  # issued from several threads at once.
+  ssh_control_lock = threading.Lock()
+
+
   @classmethod
   def start_all_nodes(cls, options, node_layout):
     """ Starts all nodes in the designated public cloud.
@@ -266,7 +334,7 @@ class RemoteHelper(object):
     AppScaleLogger.verbose(str(LocalState.obscure_dict(deployment_params)),
                            options.verbose)
 
-    acc = AppControllerClient(head_node, secret_key)
+    acc = AppControllerClient(head_node, secret_key, options.keyname)
     try:
       acc.set_parameters(node_layout.to_list(), deployment_params)
     except Exception as exception:
@@ -340,20 +408,61 @@ class RemoteHelper(object):
     Raises:
       TimeoutException if the port does not open in a certain amount of time.
     """
-    sleep_time = cls.MAX_WAIT_TIME
-    while sleep_time > 0:
-      if cls.is_port_open(host, port, is_verbose):
-        return
-      AppScaleLogger.verbose("Waiting {2} second(s) for {0}:{1} to open".\
-        format(host, port, cls.WAIT_TIME), is_verbose)
-      time.sleep(cls.WAIT_TIME)
-      sleep_time -= cls.WAIT_TIME
-    raise TimeoutException("Port {}:{} did not open in time. "
-                           "Aborting...".format(host, port))
+    if cls.wait_for_ports([(host, port)], is_verbose):
+      raise TimeoutException("Port {}:{} did not open in time. "
+                             "Aborting...".format(host, port))
 
 
   @classmethod
-  def is_port_open(cls, host, port, is_verbose):
+  def wait_for_ports(cls, targets, is_verbose, deadline=MAX_WAIT_TIME):
+    """Waits for each of the given ports to open, probing up to
+    MAX_FAN_OUT_WORKERS of them at once.
+
+    Ports that are closed are probed again with exponential backoff, so that
+    ports that open quickly are noticed quickly without flooding ports that
+    take a while.
+
+    Args:
+      targets: A list of (host, port) tuples naming the ports to wait for.
+      is_verbose: A bool that indicates if we should print failure messages to
+        stdout.
+      deadline: The number of seconds to wait for all of the ports to open.
+    Returns:
+      A list of the (host, port) tuples that were still not open when the
+      deadline passed, which is empty if every port opened.
+    """
+    end_time = time.time() + deadline
+
+    def wait_for_port(target):
+      host, port = target
+      delay = cls.PORT_PROBE_MIN_DELAY
+      while True:
+        # Never let a single probe run past the deadline.
+        timeout = max(0.1, min(cls.PORT_PROBE_TIMEOUT, end_time - time.time()))
+        if cls.is_port_open(host, port, is_verbose, timeout=timeout):
+          return True
+
+        remaining = end_time - time.time()
+        if remaining <= 0:
+          return False
+        delay = min(delay, remaining)
+        AppScaleLogger.verbose("Waiting {2:.0f} second(s) for {0}:{1} to "
+                               "open".format(host, port, delay), is_verbose)
+        time.sleep(delay)
+        delay = min(delay * 2, cls.WAIT_TIME)
+
+    # Targets beyond the first MAX_FAN_OUT_WORKERS wait for a free thread. A
+    # target that only gets one after the deadline is still probed once.
+    results, _ = cls.fan_out(targets, wait_for_port)
+    not_ready = []
+    for target in targets:
+      if not results.get(target) and target not in not_ready:
+        not_ready.append(target)
+    return not_ready
+
+
+  @classmethod
+  def is_port_open(cls, host, port, is_verbose, timeout=PORT_PROBE_TIMEOUT):
     """Queries the given host to see if the named port is open.
 
     Args:
@@ -362,16 +471,22 @@ class RemoteHelper(object):
       verbose: A bool that indicates if we should print failure messages to
         stdout (e.g., connection refused messages that can occur when we wait
         for services to come up).
+      timeout: The number of seconds to wait for the connection to be made.
     Returns:
       True if the port is open, False otherwise.
     """
+    sock = None
     try:
       sock = socket.socket()
+      sock.settimeout(timeout)
       sock.connect((host, port))
       return True
     except Exception as exception:
       AppScaleLogger.verbose(str(exception), is_verbose)
       return False
+    finally:
+      if sock is not None:
+        sock.close()
 
   @classmethod
   def merge_authorized_keys(cls, host, keyname, user, is_verbose):
@@ -389,24 +504,17 @@ class RemoteHelper(object):
                        'now.'.format(host))
 
     create_root_keys = 'sudo touch /root/.ssh/authorized_keys'
-    cls.ssh(host, keyname, create_root_keys, is_verbose, user=user)
-
     set_permissions = 'sudo chmod 600 /root/.ssh/authorized_keys'
-    cls.ssh(host, keyname, set_permissions, is_verbose, user=user)
-
-    temp_file = cls.ssh(host, keyname, 'mktemp', is_verbose, user=user)
-
+    create_tempfile = 'temp_file=$(mktemp)'
     merge_to_tempfile = 'sudo sort -u ~/.ssh/authorized_keys '\
-      '/root/.ssh/authorized_keys -o {}'.format(temp_file)
-    cls.ssh(host, keyname, merge_to_tempfile, is_verbose, user=user)
-
+      '/root/.ssh/authorized_keys -o "$temp_file"'
     overwrite_root_keys = "sudo sed -n '/.*Please login/d; "\
-      "w/root/.ssh/authorized_keys' {}".format(temp_file)
-    cls.ssh(host, keyname, overwrite_root_keys, is_verbose, user=user)
+      "w/root/.ssh/authorized_keys' \"$temp_file\""
+    remove_tempfile = 'rm -f "$temp_file"'
 
-    remove_tempfile = 'rm -f {0}'.format(temp_file)
-    cls.ssh(host, keyname, remove_tempfile, is_verbose, user=user)
-    return
+    cls.run_script(host, keyname, [create_root_keys, set_permissions,
+      create_tempfile, merge_to_tempfile, overwrite_root_keys,
+      remove_tempfile], is_verbose, user=user)
 
   @classmethod
   def enable_root_login(cls, host, keyname, infrastructure, is_verbose):
@@ -445,6 +553,70 @@ class RemoteHelper(object):
       AppScaleLogger.log("Root login already enabled for {}.".format(host))
 
 
+  @classmethod
+  def get_ssh_options(cls, host, keyname, user='root', control_master='auto'):
+    """Constructs the options that should be used when making ssh, scp, and
+    rsync calls to the named host.
+
+    Besides the usual options, these make every connection to the same host,
+    user, and keyname share a single master SSH connection, so that only the
+    first call pays for the TCP and key exchange handshakes.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      keyname: A str representing the name of the SSH keypair to log in with.
+      user: A str representing the user to log in as.
+      control_master: A str indicating if this call may become the master
+        connection ('auto'), or should only reuse an existing one ('no').
+        Calls whose output is read through a pipe should use 'no', since a
+        master started in the background would hold the pipe open.
+    Returns:
+      A str containing the options to pass to ssh, scp, or rsync's ssh.
+    """
+    with cls.ssh_control_lock:
+      connection = (host, user, keyname)
+      if connection not in cls.ssh_control_paths:
+        # Unix sockets have short path limits, so name the socket after a hash
+        # of the connection rather than after the connection itself. The
+        # process ID keeps other invocations from closing our connections.
+        digest = hashlib.sha1('{0}@{1}:{2}:{3}'.format(user, host, keyname,
+          os.getpid()))
+        cls.ssh_control_paths[connection] = os.path.join(
+          tempfile.gettempdir(), 'appscale-ssh-' + digest.hexdigest()[:12])
+      control_path = cls.ssh_control_paths[connection]
+
+    return "{0} -o ControlMaster={1} -o ControlPath={2} " \
+      "-o ControlPersist={3}".format(cls.SSH_OPTIONS, control_master,
+      control_path, cls.SSH_CONTROL_PERSIST)
+
+
+  @classmethod
+  def close_ssh_connections(cls, is_verbose=False):
+    """Closes all of the master SSH connections that were opened by this
+    invocation of the AppScale Tools.
+
+    Args:
+      is_verbose: A bool that indicates if we should print the commands we
+        execute to stdout.
+    """
+    with cls.ssh_control_lock:
+      connections = cls.ssh_control_paths.items()
+      cls.ssh_control_paths = {}
+
+    for (host, user, _), control_path in connections:
+      # Only machines we actually connected to have a master running.
+      if not os.path.exists(control_path):
+        continue
+
+      try:
+        LocalState.shell("ssh -F /dev/null {0} -o ControlPath={1} -O exit "
+          "{2}@{3}".format(cls.SSH_OPTIONS, control_path, user, host),
+          is_verbose, num_retries=1)
+      except ShellException as shell_exception:
+        AppScaleLogger.verbose("Unable to close SSH connection to {0}: {1}".
+          format(host, shell_exception), is_verbose)
+
+
   @classmethod
   def ssh(cls, host, keyname, command, is_verbose, user='root',
             num_retries=LocalState.DEFAULT_NUM_RETRIES):
@@ -457,16 +629,339 @@ class RemoteHelper(object):
       is_verbose: A bool indicating if we should print the ssh command to
         stdout.
       user: A str representing the user to log in as.
+      num_retries: The number of times we should try to execute the command,
+        or a RetryPolicy that decides which failures to retry.
     Returns:
       A str representing the standard output of the remote command and a str
         representing the standard error of the remote command.
     """
     ssh_key = LocalState.get_key_path_from_name(keyname)
+    if SSHTransportPool.is_enabled():
+      return SSHTransportPool.run(host, user, ssh_key, 'bash', is_verbose,
+                                  num_retries, stdin=command)
+
     return LocalState.shell("ssh -F /dev/null -i {0} {1} {2}@{3} bash".format(
-      ssh_key, cls.SSH_OPTIONS, user, host),
+      ssh_key, cls.get_ssh_options(host, keyname, user), user, host),
       is_verbose, num_retries, stdin=command)
 
 
+  @classmethod
+  def ssh_stream(cls, host, keyname, command, is_verbose, user='root',
+                 num_retries=1, prefix=None, timestamps=False):
+    """Logs into the named host and executes the given command, yielding its
+    output line by line as it is produced.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      keyname: A str representing the name of the SSH keypair to log in with.
+      command: A str representing what to execute on the remote host.
+      is_verbose: A bool indicating if we should print the ssh command to
+        stdout.
+      user: A str representing the user to log in as.
+      num_retries: The number of times we should try to execute the command,
+        or a RetryPolicy.
+      prefix: A str that, if given, is put in front of each line.
+      timestamps: A bool that indicates if each line should start with the
+        time at which it was read.
+    Yields:
+      strs, each containing one line of output from the remote command.
+    Raises:
+      ShellException: If, after all allowed attempts, the command failed.
+    """
+    ssh_key = LocalState.get_key_path_from_name(keyname)
+    ssh_options = cls.get_ssh_options(host, keyname, user,
+                                      control_master='no')
+    return LocalState.stream_shell(
+      "ssh -F /dev/null -i {0} {1} {2}@{3} bash".format(ssh_key, ssh_options,
+      user, host), is_verbose, num_retries, stdin=command, prefix=prefix,
+      timestamps=timestamps)
+
+
+  @classmethod
+  def fan_out(cls, hosts, function, max_workers=MAX_FAN_OUT_WORKERS,
+              deadline=None, fail_fast=False, description=None):
+    """Calls the given function once for each host, using a bounded number of
+    threads.
+
+    Args:
+      hosts: A list of strs representing the machines to operate on. Each
+        machine is only operated on once, even if it is listed several times.
+      function: A function that takes a host and performs the operation.
+      max_workers: An int indicating the most hosts to operate on at once.
+      deadline: The number of seconds to wait for all hosts to finish, or None
+        to wait indefinitely. Hosts that are still running when it passes are
+        given a TimeoutException.
+      fail_fast: A bool indicating if we should stop starting new hosts as
+        soon as one of them fails. Hosts that were never started appear in
+        neither the results nor the errors.
+      description: A str describing the operation. If given, progress is
+        reported as hosts finish.
+    Returns:
+      A tuple containing a dict that maps each host that succeeded to the value
+      that the function returned, and a dict that maps each host that failed
+      to the exception that it raised.
+    """
+    unique_hosts = []
+    for host in hosts:
+      if host not in unique_hosts:
+        unique_hosts.append(host)
+    hosts = unique_hosts
+
+    pending = Queue.Queue()
+    for host in hosts:
+      pending.put(host)
+    finished = Queue.Queue()
+    started = set()
+    stop = threading.Event()
+
+    def worker():
+      while not stop.is_set():
+        try:
+          host = pending.get_nowait()
+        except Queue.Empty:
+          return
+        started.add(host)
+        try:
+          finished.put((host, True, function(host)))
+        except Exception as exception:
+          if fail_fast:
+            stop.set()
+          finished.put((host, False, exception))
+
+    workers = []
+    for _ in range(min(max_workers, len(hosts))):
+      thread = threading.Thread(target=worker)
+      thread.daemon = True
+      thread.start()
+      workers.append(thread)
+
+    end_time = None
+    if deadline is not None:
+      end_time = time.time() + deadline
+
+    results = {}
+    errors = {}
+    progress_step = max(1, len(hosts) / 10)
+    while len(results) + len(errors) < len(hosts):
+      # Once a fail-fast run has stopped, wait only for the hosts in flight.
+      if stop.is_set() and finished.empty() and \
+          not any(thread.is_alive() for thread in workers):
+        break
+
+      # Waking up periodically lets Ctrl-C interrupt the wait.
+      wait_time = 1
+      if end_time is not None:
+        wait_time = min(wait_time, end_time - time.time())
+        if wait_time <= 0:
+          break
+
+      try:
+        host, succeeded, value = finished.get(timeout=wait_time)
+      except Queue.Empty:
+        continue
+
+      if succeeded:
+        results[host] = value
+      else:
+        errors[host] = value
+
+      done = len(results) + len(errors)
+      if description and (done % progress_step == 0 or done == len(hosts)):
+        AppScaleLogger.log("{0}: {1} of {2} machines done".format(
+          description, done, len(hosts)))
+
+    if end_time is not None and time.time() >= end_time:
+      # Hosts that are still running or waiting to run have missed the
+      # deadline, unless they were skipped because another host failed.
+      skipping = stop.is_set()
+      stop.set()
+      for host in hosts:
+        if host in results or host in errors:
+          continue
+        if skipping and host not in started:
+          continue
+        errors[host] = TimeoutException("{0} did not finish within {1} "
+          "seconds".format(host, deadline))
+
+    return results, errors
+
+
+  @classmethod
+  def run_script(cls, host, keyname, steps, is_verbose, user='root',
+                 num_retries=LocalState.DEFAULT_NUM_RETRIES):
+    """Logs into the named host once and executes the given commands in order,
+    stopping at the first one that fails.
+
+    The steps run in a single shell, so a variable set by one step can be used
+    by the steps after it. Each step's exit status and output are sent back in
+    an envelope of marker lines. Since the whole script is run again if a step
+    fails, every step should be safe to repeat.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      keyname: A str representing the name of the SSH keypair to log in with.
+      steps: A list of strs representing the commands to execute.
+      is_verbose: A bool indicating if we should print the ssh command to
+        stdout.
+      user: A str representing the user to log in as.
+      num_retries: The number of times we should try to run the script before
+        aborting, or a RetryPolicy.
+    Returns:
+      A list with a dict for each step, containing its 'command', 'exit_code'
+      and 'output'.
+    Raises:
+      ShellException: If, after all attempts, one of the steps failed.
+    """
+    script = ['__appscale_output=$(mktemp)']
+    for index, step in enumerate(steps):
+      # Steps read from /dev/null so that they can't consume the script.
+      script.extend([
+        '{',
+        step,
+        '} < /dev/null > "$__appscale_output" 2>&1',
+        '__appscale_status=$?',
+        'echo "{0} {1} $__appscale_status $(base64 < "$__appscale_output" | '
+          'tr -d \'\\n\')"'.format(cls.SCRIPT_STEP_MARKER, index),
+        'if [ $__appscale_status -ne 0 ]; then '
+          'rm -f "$__appscale_output"; exit 0; fi'
+      ])
+    script.append('rm -f "$__appscale_output"')
+    script = '\n'.join(script)
+
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
+    while True:
+      attempt += 1
+      output = cls.ssh(host, keyname, script, is_verbose, user=user,
+                       num_retries=num_retries)
+      results = cls.parse_script_output(steps, output)
+      if len(results) == len(steps) and results[-1]['exit_code'] == 0:
+        return results
+
+      exit_code = results[-1]['exit_code'] if results else None
+      delay = retry_policy.get_delay(attempt, exit_code, waited)
+      if delay is None:
+        break
+      AppScaleLogger.verbose("Script failed on {0}. Trying again in {1:.1f} "
+                             "seconds.".format(host, delay), is_verbose)
+      time.sleep(delay)
+      waited += delay
+
+    if results and results[-1]['exit_code'] != 0:
+      raise ShellException("Executing '{0}' on {1} failed with exit code "
+        "{2}:\n{3}".format(LocalState.redact(results[-1]['command']), host,
+        results[-1]['exit_code'], results[-1]['output']))
+    raise ShellException("Script on {0} did not report the status of all of "
+      "its steps:\n{1}".format(host, output))
+
+
+  @classmethod
+  def build_bundle(cls, entries):
+    """Packs local files into an uncompressed tar archive held in memory.
+
+    Args:
+      entries: A list of (local path, remote path, mode) tuples. Each file is
+        stored under its remote path, relative to /, with the given mode.
+    Returns:
+      A str containing the archive.
+    """
+    archive = StringIO()
+    bundle = tarfile.open(fileobj=archive, mode='w')
+    try:
+      for local_path, remote_path, mode in entries:
+        with open(local_path, 'rb') as local_file:
+          contents = local_file.read()
+        info = tarfile.TarInfo(remote_path.lstrip('/'))
+        info.size = len(contents)
+        info.mode = mode
+        info.mtime = time.time()
+        info.uname = info.gname = 'root'
+        bundle.addfile(info, StringIO(contents))
+    finally:
+      bundle.close()
+    return archive.getvalue()
+
+
+  @classmethod
+  def push_bundle(cls, host, keyname, entries, is_verbose, post_commands=None,
+                  user='root'):
+    """Copies a set of files to the named host in a single SSH session, and
+    then runs the given commands there.
+
+    The files are sent as one archive and unpacked into a staging directory.
+    They are only moved into place once the whole archive has arrived, and
+    each one replaces the old file with a rename, so a failed push never
+    leaves partially written files behind. The archive holds private keys, so
+    it is left out of verbose logs and error messages.
+
+    Args:
+      host: A str representing the machine that we should copy files to.
+      keyname: A str representing the name of the SSH keypair to log in with.
+      entries: A list of (local path, remote path, mode) tuples naming the
+        files to copy, where they should be copied to, and their permissions.
+      is_verbose: A bool indicating if we should print the ssh command to
+        stdout.
+      post_commands: A list of strs representing commands to run once the
+        files are in place.
+      user: A str representing the user to log in as.
+    Raises:
+      ShellException: If the files could not be copied, or if one of the
+        commands failed.
+    """
+    encoded_bundle = base64.encodestring(cls.build_bundle(entries))
+
+    install = []
+    for _, remote_path, _ in entries:
+      install.append('mkdir -p "{0}" && cp -p "$__appscale_bundle{1}" '
+        '"{1}.new" && mv -f "{1}.new" "{1}"'.format(
+        os.path.dirname(remote_path), remote_path))
+
+    steps = [
+      '__appscale_bundle=$(mktemp -d) && '
+        'trap \'rm -rf "$__appscale_bundle"\' EXIT',
+      "base64 -d <<'{0}' | tar -xpf - -C \"$__appscale_bundle\"\n{1}{0}".\
+        format(cls.BUNDLE_END_MARKER, encoded_bundle),
+      ' && '.join(install)
+    ]
+    steps.extend(post_commands or [])
+
+    AppScaleLogger.verbose("Copying {0} files to {1}".format(len(entries),
+      host), is_verbose)
+    cls.run_script(host, keyname, steps, is_verbose, user=user)
+
+
+  @classmethod
+  def parse_script_output(cls, steps, output):
+    """Extracts the status of each step from the output of a script started by
+    run_script.
+
+    Args:
+      steps: A list of strs representing the commands that the script ran.
+      output: A str containing the output of the script.
+    Returns:
+      A list with a dict for each step that reported its status, containing
+      its 'command', 'exit_code' and 'output'.
+    """
+    results = []
+    for line in (output or '').splitlines():
+      fields = line.split()
+      if len(fields) < 3 or fields[0] != cls.SCRIPT_STEP_MARKER:
+        continue
+
+      index = int(fields[1])
+      if index != len(results) or index >= len(steps):
+        continue
+
+      encoded_output = fields[3] if len(fields) > 3 else ''
+      results.append({
+        'command': steps[index],
+        'exit_code': int(fields[2]),
+        'output': base64.b64decode(encoded_output)
+      })
+    return results
+
+
   @classmethod
   def scp(cls, host, keyname, source, dest, is_verbose, user='root',
     num_retries=LocalState.DEFAULT_NUM_RETRIES):
@@ -487,8 +982,13 @@ class RemoteHelper(object):
         representing the standard error of the secure copy.
     """
     ssh_key = LocalState.get_key_path_from_name(keyname)
+    if SSHTransportPool.is_enabled():
+      return SSHTransportPool.put(host, user, ssh_key, source, dest,
+                                  is_verbose, num_retries)
+
     return LocalState.shell("scp -r -i {0} {1} {2} {3}@{4}:{5}".format(ssh_key,
-      cls.SSH_OPTIONS, source, user, host, dest), is_verbose, num_retries)
+      cls.get_ssh_options(host, keyname, user), source, user, host, dest),
+      is_verbose, num_retries)
 
 
   @classmethod
@@ -511,8 +1011,13 @@ class RemoteHelper(object):
         representing the standard error of the secure copy.
     """
     ssh_key = LocalState.get_key_path_from_name(keyname)
+    if SSHTransportPool.is_enabled():
+      return SSHTransportPool.get(host, user, ssh_key, source, dest,
+                                  is_verbose, LocalState.DEFAULT_NUM_RETRIES)
+
     return LocalState.shell("scp -r -i {0} {1} {2}@{3}:{4} {5}".format(ssh_key,
-      cls.SSH_OPTIONS, user, host, source, dest), is_verbose)
+      cls.get_ssh_options(host, keyname, user), user, host, source, dest),
+      is_verbose)
 
 
   @classmethod
@@ -529,10 +1034,11 @@ class RemoteHelper(object):
         needed to copy the SSH keys over to stdout.
     """
     ssh_key = LocalState.get_key_path_from_name(keyname)
-    cls.scp(host, keyname, ssh_key, '/root/.ssh/id_dsa', is_verbose)
-    cls.scp(host, keyname, ssh_key, '/root/.ssh/id_rsa', is_verbose)
-    cls.scp(host, keyname, ssh_key, '{}/{}.key'.format(cls.CONFIG_DIR, keyname),
-      is_verbose)
+    cls.push_bundle(host, keyname, [
+      (ssh_key, '/root/.ssh/id_rsa', 0600),
+      (ssh_key, '/root/.ssh/id_dsa', 0600),
+      (ssh_key, '{}/{}.key'.format(cls.CONFIG_DIR, keyname), 0600)
+    ], is_verbose)
 
   @classmethod
   def ensure_machine_is_compatible(cls, host, keyname, is_verbose):
@@ -586,7 +1092,8 @@ class RemoteHelper(object):
         False otherwise.
     """
     try:
-      cls.ssh(host, keyname, 'ls {0}'.format(location), is_verbose)
+      cls.ssh(host, keyname, 'ls {0}'.format(location), is_verbose,
+              num_retries=RetryPolicy.transport_errors_only())
       return True
     except ShellException:
       return False
@@ -612,7 +1119,8 @@ class RemoteHelper(object):
     remote_version_file = '{}/{}'.format(cls.CONFIG_DIR, 'VERSION')
     try:
       version_output = cls.ssh(
-        host, keyname, 'cat {}'.format(remote_version_file), is_verbose)
+        host, keyname, 'cat {}'.format(remote_version_file), is_verbose,
+        num_retries=RetryPolicy.transport_errors_only())
     except ShellException:
       return None
     version = version_output.split('AppScale version')[1].strip()
@@ -642,11 +1150,17 @@ class RemoteHelper(object):
     if not os.path.exists(local_path):
       raise BadConfigurationException("The location you specified to copy " \
         "from, {0}, doesn't exist.".format(local_path))
-    LocalState.shell("rsync -e 'ssh -i {0} {1}' -arv "
+    rsync = "rsync -e 'ssh -i {0} {1}' -arv " \
       "--exclude='AppDB/logs/*' " \
       "--exclude='AppDB/cassandra/cassandra/*' " \
-      "{2}/* root@{3}:/root/appscale/".format(ssh_key, cls.SSH_OPTIONS,
-      local_path, host), is_verbose)
+      "{2}/* root@{3}:/root/appscale/".format(ssh_key,
+      cls.get_ssh_options(host, keyname, control_master='no'), local_path,
+      host)
+
+    # Show each file as it is copied, rather than all of them at the end.
+    for line in LocalState.stream_shell(rsync, is_verbose,
+        LocalState.DEFAULT_NUM_RETRIES, prefix=host, timestamps=True):
+      AppScaleLogger.verbose(line, is_verbose)
 
   @classmethod
   def copy_deployment_credentials(cls, host, options):
@@ -659,30 +1173,19 @@ class RemoteHelper(object):
       options: A Namespace that indicates which SSH keypair to use, and whether
         or not we are running in a cloud infrastructure.
     """
-    local_secret_key = LocalState.get_secret_key_location(options.keyname)
-    cls.scp(host, options.keyname, local_secret_key,
-      '{}/secret.key'.format(cls.CONFIG_DIR), options.verbose)
-
-    local_ssh_key = LocalState.get_key_path_from_name(options.keyname)
-    cls.scp(host, options.keyname, local_ssh_key,
-      '{}/ssh.key'.format(cls.CONFIG_DIR), options.verbose)
-
     LocalState.generate_ssl_cert(options.keyname, options.verbose)
 
-    local_cert = LocalState.get_certificate_location(options.keyname)
-    cls.scp(host, options.keyname, local_cert,
-      '{}/certs/mycert.pem'.format(cls.CONFIG_DIR), options.verbose)
-
-    local_private_key = LocalState.get_private_key_location(options.keyname)
-    cls.scp(host, options.keyname, local_private_key,
-      '{}/certs/mykey.pem'.format(cls.CONFIG_DIR), options.verbose)
-
-    hash_id = subprocess.Popen(["openssl", "x509", "-hash", "-noout", "-in",
-      LocalState.get_certificate_location(options.keyname)],
-      stdout=subprocess.PIPE).communicate()[0]
-    symlink_cert = 'ln -fs {}/certs/mycert.pem /etc/ssl/certs/{}.0'.\
-      format(cls.CONFIG_DIR, hash_id.rstrip())
-    cls.ssh(host, options.keyname, symlink_cert, options.verbose)
+    remote_cert = '{}/certs/mycert.pem'.format(cls.CONFIG_DIR)
+    entries = [
+      (LocalState.get_secret_key_location(options.keyname),
+       '{}/secret.key'.format(cls.CONFIG_DIR), 0600),
+      (LocalState.get_key_path_from_name(options.keyname),
+       '{}/ssh.key'.format(cls.CONFIG_DIR), 0600),
+      (LocalState.get_certificate_location(options.keyname), remote_cert,
+       0644),
+      (LocalState.get_private_key_location(options.keyname),
+       '{}/certs/mykey.pem'.format(cls.CONFIG_DIR), 0600)
+    ]
 
     # In Google Compute Engine, we also need to copy over our client_secrets
     # file and the OAuth2 file that the user has approved for use with their
@@ -693,12 +1196,18 @@ class RemoteHelper(object):
       if not os.path.exists(secrets_location):
         raise AppScaleException('{} does not exist.'.format(secrets_location))
       secrets_type = GCEAgent.get_secrets_type(secrets_location)
-      cls.scp(host, options.keyname, secrets_location,
-        '{}/client_secrets.json'.format(cls.CONFIG_DIR), options.verbose)
+      entries.append((secrets_location,
+        '{}/client_secrets.json'.format(cls.CONFIG_DIR), 0600))
       if secrets_type == CredentialTypes.OAUTH:
         local_oauth = LocalState.get_oauth2_storage_location(options.keyname)
-        cls.scp(host, options.keyname, local_oauth,
-          '{}/oauth2.dat'.format(cls.CONFIG_DIR), options.verbose)
+        entries.append((local_oauth,
+          '{}/oauth2.dat'.format(cls.CONFIG_DIR), 0600))
+
+    # The certificate is hashed on the node, where openssl is known to exist.
+    symlink_cert = 'ln -fs {0} /etc/ssl/certs/$(openssl x509 -hash -noout ' \
+      '-in {0}).0'.format(remote_cert)
+    cls.push_bundle(host, options.keyname, entries, options.verbose,
+                    post_commands=[symlink_cert])
 
   @classmethod
   def run_user_commands(cls, host, commands, keyname, is_verbose):
@@ -734,17 +1243,19 @@ class RemoteHelper(object):
     """
     AppScaleLogger.log("Starting AppController at {0}".format(host))
 
-    # Remove any previous state. TODO: Don't do this with the tools.
-    cls.ssh(host, keyname,
-      'rm -rf {}/appcontroller-state.json'.format(cls.CONFIG_DIR), is_verbose)
+    cls.run_script(host, keyname, [
+      # Remove any previous state. TODO: Don't do this with the tools.
+      'rm -rf {}/appcontroller-state.json'.format(cls.CONFIG_DIR),
 
-    # Remove any monit configuration files from previous AppScale deployments.
-    cls.ssh(host, keyname, 'rm -rf /etc/monit/conf.d/appscale-*.cfg', is_verbose)
+      # Remove any monit configuration files from previous AppScale
+      # deployments.
+      'rm -rf /etc/monit/conf.d/appscale-*.cfg',
 
-    cls.ssh(host, keyname, 'service monit start', is_verbose)
+      'service monit start',
 
-    # Start the AppController.
-    cls.ssh(host, keyname, 'service appscale-controller start', is_verbose)
+      # Start the AppController.
+      'service appscale-controller start'
+    ], is_verbose)
 
     AppScaleLogger.log("Please wait for the AppController to finish " + \
       "pre-processing tasks.")
@@ -764,13 +1275,13 @@ class RemoteHelper(object):
       is_verbose: A bool that indicates if we should print the SCP commands we
         exec to stdout.
     """
-    # and copy the json file if the tools on that box wants to use it
-    cls.scp(host, keyname, LocalState.get_locations_json_location(keyname),
-      '{}/locations-{}.json'.format(cls.CONFIG_DIR, keyname), is_verbose)
-
-    # and copy the secret file if the tools on that box wants to use it
-    cls.scp(host, keyname, LocalState.get_secret_key_location(keyname),
-      cls.CONFIG_DIR, is_verbose)
+    # Copy the json and secret files if the tools on that box want to use them.
+    cls.push_bundle(host, keyname, [
+      (LocalState.get_locations_json_location(keyname),
+       '{}/locations-{}.json'.format(cls.CONFIG_DIR, keyname), 0644),
+      (LocalState.get_secret_key_location(keyname),
+       '{}/{}.secret'.format(cls.CONFIG_DIR, keyname), 0600)
+    ], is_verbose)
 
 
   @classmethod
@@ -829,11 +1340,7 @@ class RemoteHelper(object):
       keyname: The name of the SSH keypair used for this AppScale deployment.
     """
     acc = AppControllerClient(host, LocalState.get_secret_key(keyname))
-    while True:
-      if acc.is_initialized():
-        break
-      else:
-        time.sleep(cls.WAIT_TIME)
+    Waiter(max_delay=cls.WAIT_TIME).wait(acc.is_initialized)
 
 
   @classmethod
@@ -884,12 +1391,23 @@ class RemoteHelper(object):
     # If using persistent disks, unmount them and detach them before we blow
     # away the instances.
     nodes = LocalState.get_local_nodes_info(keyname)
-    for node in nodes:
-      if node.get('disk'):
-        AppScaleLogger.log("Unmounting persistent disk at {0}".
-                           format(node['public_ip']))
-        cls.unmount_persistent_disk(node['public_ip'], keyname, is_verbose)
-        agent.detach_disk(params, node['disk'], node['instance_id'])
+    nodes_with_disks = [node for node in nodes if node.get('disk')]
+
+    def unmount(host):
+      AppScaleLogger.log("Unmounting persistent disk at {0}".format(host))
+      cls.unmount_persistent_disk(host, keyname, is_verbose)
+
+    disk_hosts = [node['public_ip'] for node in nodes_with_disks]
+    _, errors = cls.fan_out(disk_hosts, unmount)
+    for host in disk_hosts:
+      if host in errors:
+        raise errors[host]
+
+    # The disks are detached one at a time, since connecting to some clouds
+    # can prompt the user to authorize AppScale and stores the credentials
+    # that they grant, which concurrent connections would race on.
+    for node in nodes_with_disks:
+      agent.detach_disk(params, node['disk'], node['instance_id'])
 
     # terminate all the machines
     AppScaleLogger.log("Terminating instances spawned with keyname {0}"
@@ -920,7 +1438,8 @@ class RemoteHelper(object):
     """
     try:
       remote_output = cls.ssh(host, keyname, 'umount {0}'.format(
-        cls.PERSISTENT_MOUNT_POINT), is_verbose)
+        cls.PERSISTENT_MOUNT_POINT), is_verbose,
+        num_retries=RetryPolicy.transport_errors_only())
       AppScaleLogger.verbose(remote_output, is_verbose)
     except ShellException:
       pass
@@ -949,39 +1468,50 @@ class RemoteHelper(object):
       # running.
       raise AppScaleException("Couldn't find AppScale secret key.")
 
-    acc = AppControllerClient(shadow_host, secret)
+    acc = AppControllerClient(shadow_host, secret, keyname)
     try:
-      machines = len(acc.get_all_public_ips()) - 1
+      progress = {
+        'machines': len(acc.get_all_public_ips()) - 1,
+        'terminated_successfully': True,
+        'log_dump': ""
+      }
       acc.run_terminate(clean)
-      terminated_successfully = True
-      log_dump = ""
-      while not acc.is_appscale_terminated():
+
+      def receive_node_statuses():
         # For terminate receive_server_message will return a JSON string that
         # is a list of dicts with keys: ip, status, output
         try:
           output_list = yaml.safe_load(acc.receive_server_message())
         except Exception as e:
-          log_dump += e.message
-          continue
+          progress['log_dump'] += e.message
+          raise
         for node in output_list:
           if node.get("status"):
-            machines -= 1
+            progress['machines'] -= 1
             AppScaleLogger.success("Node at {node_ip}: {status}".format(
               node_ip=node.get("ip"), status="Stopping AppScale finished"))
           else:
             AppScaleLogger.warn("Node at {node_ip}: {status}".format(
               node_ip=node.get("ip"), status="Stopping AppScale failed"))
-            terminated_successfully = False
-            log_dump += "Node at {node_ip}: {status}\nNode Output:"\
-                        "{output}".format(node_ip=node.get("ip"),
-                                          status="Stopping AppScale failed",
-                                          output=node.get("output"))
+            progress['terminated_successfully'] = False
+            progress['log_dump'] += "Node at {node_ip}: {status}\nNode " \
+              "Output:{output}".format(node_ip=node.get("ip"),
+                                       status="Stopping AppScale failed",
+                                       output=node.get("output"))
           AppScaleLogger.verbose("Output of node at {node_ip}:\n"
                                  "{output}".format(node_ip=node.get("ip"),
                                                    output=node.get("output")),
                                  is_verbose)
-      if not terminated_successfully or machines > 0:
-        LocalState.generate_crash_log(AppControllerException, log_dump)
+
+      # Node statuses are long-polled, so each one is reported as soon as the
+      # AppController has it.
+      Waiter().wait(acc.is_appscale_terminated,
+                    long_poll=receive_node_statuses, is_verbose=is_verbose)
+
+      machines = progress['machines']
+      if not progress['terminated_successfully'] or machines > 0:
+        LocalState.generate_crash_log(AppControllerException,
+                                      progress['log_dump'])
         raise AppScaleException("{0} node(s) failed stopping AppScale, "
                                 "head node is still running AppScale services."
                                 .format(machines))
@@ -1014,7 +1544,8 @@ class RemoteHelper(object):
 
 
   @classmethod
-  def copy_app_to_host(cls, app_location, keyname, is_verbose, extras=None):
+  def copy_app_to_host(cls, app_location, keyname, is_verbose, extras=None,
+                       packager=None, cache=None, index=None):
     """Copies the given application to a machine running the Login service
     within an AppScale deployment.
 
@@ -1026,48 +1557,287 @@ class RemoteHelper(object):
       is_verbose: A bool that indicates if we should print the commands we exec
         to copy the app to the remote host to stdout.
       extras: A dictionary containing a list of files to include in the upload.
+      packager: The AppPackager to compress the upload with, or None to use
+        gzip at the default level.
+      cache: The AppCache to reuse packaging work from, or None to package the
+        application from scratch.
+      index: The AppIndex of the application, or None to walk its directory.
 
     Returns:
       A str corresponding to the location on the remote filesystem where the
         application was copied to.
     """
-    app_id = AppEngineHelper.get_app_id_from_app_config(app_location)
+    index = index or AppIndex(app_location)
+    app_id = AppEngineHelper.get_app_id_from_app_config(app_location, index)
+    AppScaleLogger.log("Hashing application")
+    manifest = AppManifest.from_directory(app_location, extras, cache, index)
+    return cls.copy_manifest_to_host(manifest, app_id, keyname, is_verbose,
+                                     packager, cache)
 
-    AppScaleLogger.log("Tarring application")
-    rand = str(uuid.uuid4()).replace('-', '')[:8]
-    local_tarred_app = "{0}/appscale-app-{1}-{2}.tar.gz".\
-      format(tempfile.gettempdir(), app_id, rand)
-
-    # Collect list of files that should be included in the tarball.
-    app_files = {}
-    for root, _, filenames in os.walk(app_location, followlinks=True):
-      relative_dir = os.path.relpath(root, app_location)
-      for filename in filenames:
-        # Ignore compiled Python files.
-        if filename.endswith('.pyc'):
-          continue
-        relative_path = os.path.join(relative_dir, filename)
-        app_files[relative_path] = os.path.join(root, filename)
 
-    if extras is not None:
-      app_files.update(extras)
+  @classmethod
+  def copy_manifest_to_host(cls, manifest, app_id, keyname, is_verbose,
+                            packager=None, cache=None):
+    """Copies an application to a machine running the Login service, sending
+    only the files whose contents changed since it was last uploaded.
+
+    If only the changes can't be sent, the whole application is uploaded
+    instead.
+
+    Args:
+      manifest: An AppManifest describing the application's files.
+      app_id: A str containing the application's ID.
+      keyname: The name of the SSH keypair that uniquely identifies this
+        AppScale deployment.
+      is_verbose: A bool that indicates if we should print the commands we exec
+        to copy the app to the remote host to stdout.
+      packager: The AppPackager to compress the upload with, or None to use
+        gzip at the default level.
+      cache: The AppCache to keep the application's tarball in, or None to
+        always compress it.
 
-    with tarfile.open(local_tarred_app, 'w:gz') as app_tar:
-      for tarball_path in app_files:
-        local_path = app_files[tarball_path]
-        app_tar.add(local_path, tarball_path)
+    Returns:
+      A str corresponding to the location on the remote filesystem where the
+        application was copied to.
+    """
+    packager = packager or AppPackager()
+    login_host = LocalState.get_login_host(keyname)
+    try:
+      return cls.copy_app_changes(login_host, manifest, app_id, keyname,
+                                  is_verbose, packager)
+    except ShellException as shell_error:
+      AppScaleLogger.warn("Unable to upload only the changes to {0}, so "
+        "uploading all of it: {1}".format(app_id, shell_error))
 
     AppScaleLogger.log("Copying over application")
     remote_app_tar = "{0}/{1}.tar.gz".format(cls.REMOTE_APP_DIR, app_id)
-    cls.scp(LocalState.get_login_host(keyname), keyname, local_tarred_app,
-            remote_app_tar, is_verbose)
+    # The AdminServer only reads gzipped tarballs.
+    gzip_packager = AppPackager(AppPackager.GZIP, packager.level,
+                                packager.workers)
+    write_tarball = lambda fileobj: manifest.write_tarball(fileobj,
+                                                           gzip_packager)
+    if cache is not None:
+      write_tarball = cache.tarball_writer('{0}-{1}.tar.gz'.format(
+        manifest.fingerprint(), gzip_packager.level), write_tarball)
+    cls.stream_to_host(login_host, keyname, write_tarball, remote_app_tar,
+                       is_verbose)
+    return remote_app_tar
 
-    AppScaleLogger.verbose("Removing local copy of tarred application",
-                           is_verbose)
-    os.remove(local_tarred_app)
+
+  @classmethod
+  def copy_archive_to_host(cls, archived_app, app_id, keyname, is_verbose,
+                           packager=None, cache=None):
+    """Copies an archived application to a machine running the Login service,
+    streaming it straight from the archive.
+
+    Args:
+      archived_app: The ArchivedApp that reads the application's archive.
+      app_id: A str containing the application's ID.
+      keyname: The name of the SSH keypair that uniquely identifies this
+        AppScale deployment.
+      is_verbose: A bool that indicates if we should print the commands we exec
+        to copy the app to the remote host to stdout.
+      packager: The AppPackager whose compression level and workers are used
+        if the archive has to be repacked, or None to use the defaults.
+      cache: The AppCache to keep repacked archives in, or None to always
+        repack them.
+
+    Returns:
+      A str corresponding to the location on the remote filesystem where the
+        application was copied to.
+    """
+    packager = packager or AppPackager()
+    login_host = LocalState.get_login_host(keyname)
+    if archived_app.passthrough:
+      AppScaleLogger.log("Copying over application archive")
+    else:
+      AppScaleLogger.log("Repacking and copying over application archive")
+
+    remote_app_tar = "{0}/{1}.tar.gz".format(cls.REMOTE_APP_DIR, app_id)
+    # The AdminServer only reads gzipped tarballs.
+    gzip_packager = AppPackager(AppPackager.GZIP, packager.level,
+                                packager.workers)
+    write_tarball = lambda fileobj: archived_app.write_tarball(fileobj,
+                                                               gzip_packager)
+    if cache is not None and not archived_app.passthrough:
+      write_tarball = cache.tarball_writer('{0}-{1}.tar.gz'.format(
+        cache.fingerprint_archive(archived_app.archive_location),
+        gzip_packager.level), write_tarball)
+    cls.stream_to_host(login_host, keyname, write_tarball, remote_app_tar,
+                       is_verbose)
+    return remote_app_tar
+
+
+  @classmethod
+  def copy_app_changes(cls, host, manifest, app_id, keyname, is_verbose,
+                       packager=None):
+    """Sends the contents that the login node is missing for an application,
+    and has it rebuild the application's tarball.
+
+    The login node keeps the manifest of the last upload of each application,
+    and the contents that it refers to. If there is no manifest, every file's
+    contents are sent.
+
+    Args:
+      host: A str representing the machine running the Login service.
+      manifest: An AppManifest describing the application's files.
+      app_id: A str containing the application's ID.
+      keyname: The name of the SSH keypair that uniquely identifies this
+        AppScale deployment.
+      is_verbose: A bool that indicates if we should print the commands we exec
+        to copy the app to the remote host to stdout.
+      packager: The AppPackager to compress the upload with, or None to use
+        gzip at the default level.
+
+    Returns:
+      A str corresponding to the location on the remote filesystem where the
+        application's tarball was written to.
+    Raises:
+      ShellException: If the contents could not be sent, or if the tarball
+        could not be rebuilt.
+    """
+    remote_manifest = "{0}/{1}.json".format(cls.REMOTE_MANIFEST_DIR, app_id)
+    remote_app_tar = "{0}/{1}.tar.gz".format(cls.REMOTE_APP_DIR, app_id)
+
+    stored_entries_command = "python - {manifest} {contents} <<'{marker}'\n"\
+      "{script}\n{marker}".format(manifest=remote_manifest,
+      contents=cls.REMOTE_CONTENT_DIR, marker=cls.REBUILD_END_MARKER,
+      script=AppManifest.STORED_ENTRIES_SCRIPT)
+    results = cls.run_script(host, keyname, [stored_entries_command],
+                             is_verbose)
+    try:
+      stored_entries = json.loads(results[0]['output'])
+    except ValueError:
+      AppScaleLogger.log("No previous upload of {0} found, so uploading all "
+                         "of it".format(app_id))
+      stored_entries = None
+
+    missing = manifest.missing_from(stored_entries)
+    rand = str(uuid.uuid4()).replace('-', '')[:8]
+    remote_upload = "{0}/.upload-{1}-{2}.tar.gz".format(cls.REMOTE_APP_DIR,
+                                                        app_id, rand)
+    sent_bytes = manifest.content_size(missing)
+    total_bytes = manifest.total_size()
+    AppScaleLogger.log("Copying {0} of {1} files ({2:.1f} of {3:.1f} MB, "
+      "{4:.1f} MB saved)".format(len(missing), len(manifest.entries),
+      sent_bytes / 1048576.0, total_bytes / 1048576.0,
+      (total_bytes - sent_bytes) / 1048576.0))
+    cls.stream_to_host(host, keyname,
+      lambda fileobj: manifest.write_upload(fileobj, missing, packager),
+      remote_upload, is_verbose)
+
+    script = AppManifest.REBUILD_SCRIPT.format(
+      manifest_member=AppManifest.MANIFEST_MEMBER,
+      block_size=AppManifest.HASH_BLOCK_SIZE,
+      missing_contents=AppManifest.MISSING_CONTENTS,
+      prune_age=AppManifest.PRUNE_AGE)
+    rebuild = "python - {upload} {contents} {manifest} {output} <<'{marker}'\n"\
+      "{script}\n{marker}".format(upload=remote_upload,
+      contents=cls.REMOTE_CONTENT_DIR, manifest=remote_manifest,
+      output=remote_app_tar, marker=cls.REBUILD_END_MARKER, script=script)
+    # The upload is consumed by the first attempt, so don't repeat it.
+    cls.run_script(host, keyname, [rebuild], is_verbose, num_retries=1)
     return remote_app_tar
 
 
+  @classmethod
+  def stream_to_host(cls, host, keyname, write_function, remote_path,
+                     is_verbose, user='root',
+                     num_retries=LocalState.DEFAULT_NUM_RETRIES):
+    """Writes a file on the named host as its contents are produced, over a
+    single SSH session, without storing them on the local filesystem.
+
+    The file is written next to remote_path and only renamed into place once
+    its SHA-1 hash on the remote host matches the hash of what was sent.
+
+    Args:
+      host: A str representing the machine that we should copy the file to.
+      keyname: A str representing the name of the SSH keypair to log in with.
+      write_function: A function that takes a file-like object and writes the
+        file's contents to it. It is called again for each attempt.
+      remote_path: A str representing the path on the remote machine where
+        the file should be written.
+      is_verbose: A bool that indicates if we should print the ssh command to
+        stdout.
+      user: A str representing the user to log in as.
+      num_retries: The number of times we should try to copy the file, or a
+        RetryPolicy.
+    Returns:
+      The number of bytes that were sent.
+    Raises:
+      ShellException: If, after all allowed attempts, the file could not be
+        written or arrived with a different hash.
+    """
+    ssh_key = LocalState.get_key_path_from_name(keyname)
+    ssh_options = cls.get_ssh_options(host, keyname, user,
+                                      control_master='no').split()
+    partial_path = "{0}.{1}.part".format(
+      remote_path, str(uuid.uuid4()).replace('-', '')[:8])
+    receive = "mkdir -p {0} && cat > {1} && sha1sum {1}".format(
+      os.path.dirname(remote_path), partial_path)
+    command = ['ssh', '-F', '/dev/null', '-i', ssh_key] + ssh_options + \
+      ['{0}@{1}'.format(user, host), receive]
+
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
+    while True:
+      attempt += 1
+      AppScaleLogger.verbose("stream> {0}".format(' '.join(command)),
+                             is_verbose)
+      start_time = time.time()
+      process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
+      writer = ChecksumWriter(process.stdin)
+      try:
+        write_function(writer)
+      except IOError:
+        # ssh exited early, and its output says why.
+        pass
+      except Exception:
+        process.kill()
+        process.wait()
+        raise
+      finally:
+        try:
+          process.stdin.close()
+        except IOError:
+          pass
+      output = process.stdout.read()
+      process.wait()
+      elapsed = max(time.time() - start_time, 0.001)
+
+      remote_digest = (output.split() or [''])[0]
+      if process.returncode == 0 and remote_digest == writer.hexdigest():
+        cls.ssh(host, keyname, 'mv -f {0} {1}'.format(partial_path,
+                remote_path), is_verbose, user)
+        AppScaleLogger.log("Copied {0:.1f} MB to {1} in {2:.1f} seconds "
+          "({3:.1f} MB/s)".format(writer.bytes_written / 1048576.0, host,
+          elapsed, writer.bytes_written / 1048576.0 / elapsed))
+        return writer.bytes_written
+
+      if process.returncode == 0:
+        error = "Checksum mismatch for {0}: sent {1}, received {2}".format(
+          remote_path, writer.hexdigest(), remote_digest)
+      else:
+        error = "Copying to {0}:{1} failed:\n{2}".format(host, remote_path,
+                                                         output)
+      try:
+        cls.ssh(host, keyname, 'rm -f {0}'.format(partial_path), is_verbose,
+                user, num_retries=1)
+      except ShellException:
+        pass
+
+      delay = retry_policy.get_delay(attempt, process.returncode or 1, waited)
+      if delay is None:
+        raise ShellException(error)
+      AppScaleLogger.verbose("{0}. Trying again in {1:.1f} seconds.".format(
+        error, delay), is_verbose)
+      time.sleep(delay)
+      waited += delay
+
+
   @classmethod
   def collect_appcontroller_crashlog(cls, host, keyname, is_verbose):
     """ Reads the crashlog that the AppController writes on its own machine
@@ -1112,5 +1882,14 @@ class RemoteHelper(object):
     """
     user_login = user + '@' + host
     key_path = LocalState.get_key_path_from_name(keyname)
-    return subprocess.Popen(['ssh', '-i', key_path, user_login, command], shell, stdout=subprocess.PIPE)
+    if SSHTransportPool.is_enabled():
+      return SSHTransportPool.popen(host, user, key_path, command)
+
+    ssh_options = cls.get_ssh_options(host, keyname, user).split()
+    return subprocess.Popen(['ssh', '-i', key_path] + ssh_options +
+                            [user_login, command], shell,
+                            stdout=subprocess.PIPE)
+
 
+# Tear down any multiplexed SSH connections when the tools exit.
+atexit.register(RemoteHelper.close_ssh_connections)
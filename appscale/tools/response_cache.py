@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+""" A cache for answers to read-only AppController queries, so that the same
+question is not sent to the head node over and over again. """
+
+
+# General-purpose Python library imports
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ResponseCache(object):
+  """ ResponseCache keeps answers in memory for the client that owns it and,
+  if enabled, on disk so that back-to-back invocations of the tools can share
+  them.
+
+  The disk tier is only used when the APPSCALE_RESPONSE_CACHE environment
+  variable is set to 'disk' and the deployment's keyname is known. Each
+  deployment gets its own file under ~/.appscale.
+  """
+
+
+  # The environment variable that enables the on-disk tier.
+  DISK_CACHE_ENV_VAR = 'APPSCALE_RESPONSE_CACHE'
+
+
+  # The value of DISK_CACHE_ENV_VAR that enables the on-disk tier.
+  DISK_CACHE = 'disk'
+
+
+  # The directory where the on-disk tier is kept. This mirrors
+  # LocalState.LOCAL_APPSCALE_PATH, which can't be imported here without
+  # creating an import cycle.
+  CACHE_DIR = os.path.expanduser("~") + os.sep + ".appscale" + os.sep
+
+
+  # The number of times that answers were found in, or missing from, any
+  # cache in this process.
+  stats = {'hits': 0, 'misses': 0}
+
+
+  # Guards stats and the on-disk tier, since clients can be used from several
+  # threads at once.
+  lock = threading.Lock()
+
+
+  def __init__(self, keyname=None):
+    """ Creates a new, empty ResponseCache.
+
+    Args:
+      keyname: A str naming the deployment that the answers come from, or None
+        if the on-disk tier should not be used.
+    """
+    self.keyname = keyname
+    self.entries = {}
+
+
+  @classmethod
+  def is_disk_enabled(cls):
+    """ Checks if answers should also be kept on disk.
+
+    Returns:
+      True if the on-disk tier has been enabled, and False otherwise.
+    """
+    return os.environ.get(cls.DISK_CACHE_ENV_VAR) == cls.DISK_CACHE
+
+
+  def get_disk_location(self):
+    """ Returns the file that holds the on-disk tier for this deployment.
+
+    Returns:
+      A str with the location of the file, or None if the on-disk tier is not
+      used.
+    """
+    if self.keyname is None or not self.is_disk_enabled():
+      return None
+    return '{0}responses-{1}.json'.format(self.CACHE_DIR, self.keyname)
+
+
+  def get(self, key):
+    """ Looks up an answer that has not expired yet.
+
+    Args:
+      key: A str identifying the query.
+    Returns:
+      A tuple containing a bool that indicates if the answer was found, and
+      the answer itself.
+    """
+    now = time.time()
+    entry = self.entries.get(key)
+    if entry is None or entry[0] <= now:
+      entry = self.read_disk().get(key)
+
+    with self.lock:
+      if entry is None or entry[0] <= now:
+        self.stats['misses'] += 1
+        return False, None
+      self.stats['hits'] += 1
+
+    self.entries[key] = entry
+    return True, entry[1]
+
+
+  def put(self, key, value, ttl):
+    """ Stores an answer.
+
+    Args:
+      key: A str identifying the query.
+      value: The answer, which must be serializable as JSON.
+      ttl: The number of seconds that the answer can be reused for.
+    """
+    entry = (time.time() + ttl, value)
+    self.entries[key] = entry
+
+    location = self.get_disk_location()
+    if location is None:
+      return
+
+    with self.lock:
+      entries = self.read_disk()
+      entries[key] = entry
+      self.write_disk(entries)
+
+
+  def invalidate(self):
+    """ Forgets every answer for this deployment, since a call may have
+    changed it. """
+    self.entries = {}
+    location = self.get_disk_location()
+    if location is None:
+      return
+
+    with self.lock:
+      try:
+        os.remove(location)
+      except OSError:
+        pass
+
+
+  def read_disk(self):
+    """ Reads the on-disk tier.
+
+    Returns:
+      A dict that maps keys to (expiration time, answer) tuples. It is empty
+      if the on-disk tier is not used, or could not be read.
+    """
+    location = self.get_disk_location()
+    if location is None or not os.path.exists(location):
+      return {}
+
+    try:
+      with open(location) as cache_file:
+        return json.load(cache_file)
+    except (IOError, ValueError):
+      return {}
+
+
+  def write_disk(self, entries):
+    """ Replaces the on-disk tier with the given unexpired answers.
+
+    The file is replaced with a rename, so readers never see a partially
+    written cache.
+
+    Args:
+      entries: A dict that maps keys to (expiration time, answer) tuples.
+    """
+    location = self.get_disk_location()
+    now = time.time()
+    entries = {key: entry for key, entry in entries.iteritems()
+               if entry[0] > now}
+
+    try:
+      descriptor, temp_location = tempfile.mkstemp(dir=self.CACHE_DIR)
+      with os.fdopen(descriptor, 'w') as cache_file:
+        json.dump(entries, cache_file)
+      os.rename(temp_location, location)
+    except (IOError, OSError):
+      # The cache is only an optimization, so the tools work without it.
+      pass
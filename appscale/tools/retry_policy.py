@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+""" Policies that decide whether and when failed shell commands are retried. """
+
+
+# General-purpose Python library imports
+import random
+
+
+class RetryPolicy(object):
+  """ RetryPolicy classifies the failures of a command by exit status and
+  spaces out the attempts that are allowed, either with exponential backoff or
+  with a fixed delay.
+
+  A policy holds no state, so the same one can be shared between commands.
+  Each invocation of a command gets its own retry budget.
+  """
+
+
+  # The exit status that ssh and scp use to report that they could not reach
+  # or authenticate with the remote machine, as opposed to the remote command
+  # failing.
+  SSH_TRANSPORT_ERROR = 255
+
+
+  # The number of times to execute a command before aborting, by default.
+  DEFAULT_MAX_ATTEMPTS = 5
+
+
+  # The number of seconds to wait before the first retry, by default.
+  DEFAULT_BASE_DELAY = 1
+
+
+  # The most seconds to wait between two attempts, by default.
+  DEFAULT_MAX_DELAY = 10
+
+
+  # The number of seconds that commands given a number of retries instead of
+  # a policy wait between attempts.
+  FIXED_DELAY = 1
+
+
+  def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS,
+               retryable_exit_codes=None, base_delay=DEFAULT_BASE_DELAY,
+               max_delay=DEFAULT_MAX_DELAY, jitter=0.5, budget=None):
+    """ Creates a new RetryPolicy.
+
+    Args:
+      max_attempts: An int indicating the most times a command should be run.
+      retryable_exit_codes: A list of ints containing the exit statuses that
+        should be retried, or None if every failure should be retried.
+      base_delay: A number indicating the seconds to wait before the first
+        retry. The wait doubles after each attempt.
+      max_delay: A number indicating the most seconds to wait between two
+        attempts.
+      jitter: A float between 0 and 1 indicating how much of each wait may be
+        randomly removed, so that many machines retrying at once spread out.
+      budget: A number indicating the most seconds that a single invocation
+        may spend waiting between attempts, or None for no limit.
+    """
+    self.max_attempts = max_attempts
+    self.retryable_exit_codes = retryable_exit_codes
+    self.base_delay = base_delay
+    self.max_delay = max_delay
+    self.jitter = jitter
+    self.budget = budget
+
+
+  @classmethod
+  def from_retries(cls, num_retries):
+    """ Converts the retry argument that shell commands accept into a policy.
+
+    Args:
+      num_retries: An int indicating the number of times to run a command, or
+        a RetryPolicy.
+    Returns:
+      A RetryPolicy. An int is treated as a command that can be run that many
+      times, waiting FIXED_DELAY seconds between attempts as shell commands
+      always have. Backoff is only used by policies that ask for it.
+    """
+    if isinstance(num_retries, RetryPolicy):
+      return num_retries
+    return cls.fixed_delay(num_retries)
+
+
+  @classmethod
+  def fixed_delay(cls, max_attempts=DEFAULT_MAX_ATTEMPTS, delay=FIXED_DELAY):
+    """ Returns a policy that retries every failure after the same wait.
+
+    Args:
+      max_attempts: An int indicating the most times a command should be run.
+      delay: A number indicating the seconds to wait between attempts.
+    Returns:
+      A RetryPolicy that retries every failure without backoff or jitter.
+    """
+    return cls(max_attempts=max_attempts, base_delay=delay, max_delay=delay,
+               jitter=0)
+
+
+  @classmethod
+  def idempotent(cls, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """ Returns a policy for commands that are safe to run again no matter how
+    they failed.
+
+    Args:
+      max_attempts: An int indicating the most times a command should be run.
+    Returns:
+      A RetryPolicy that retries every failure with exponential backoff.
+    """
+    return cls(max_attempts=max_attempts)
+
+
+  @classmethod
+  def transport_errors_only(cls, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """ Returns a policy for remote commands whose failures are meaningful,
+    such as probes, so that only connection errors are retried.
+
+    Args:
+      max_attempts: An int indicating the most times a command should be run.
+    Returns:
+      A RetryPolicy that only retries ssh and scp transport errors.
+    """
+    return cls(max_attempts=max_attempts,
+               retryable_exit_codes=[cls.SSH_TRANSPORT_ERROR])
+
+
+  @classmethod
+  def non_retryable(cls):
+    """ Returns a policy for commands that must not be run more than once.
+
+    Returns:
+      A RetryPolicy that never retries.
+    """
+    return cls(max_attempts=1)
+
+
+  def is_retryable(self, exit_code):
+    """ Classifies a failure by the exit status of the command.
+
+    Args:
+      exit_code: An int containing the exit status of the failed attempt.
+    Returns:
+      True if the failure may be transient, and False otherwise.
+    """
+    if self.retryable_exit_codes is None:
+      return True
+    return exit_code in self.retryable_exit_codes
+
+
+  def get_delay(self, attempt, exit_code, waited=0):
+    """ Decides whether a failed attempt should be retried.
+
+    Args:
+      attempt: An int indicating how many attempts have been made so far.
+      exit_code: An int containing the exit status of the failed attempt.
+      waited: A number indicating the seconds that this invocation has already
+        spent waiting between attempts.
+    Returns:
+      The number of seconds to wait before the next attempt, or None if the
+      command should not be retried.
+    """
+    if attempt >= self.max_attempts or not self.is_retryable(exit_code):
+      return None
+
+    delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+    delay -= delay * self.jitter * random.random()
+    if self.budget is not None and waited + delay > self.budget:
+      return None
+    return delay
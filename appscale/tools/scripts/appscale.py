@@ -70,10 +70,31 @@ def main():
         cprint("Usage: appscale deploy <path to your app>", 'red')
         sys.exit(1)
 
-      if len(sys.argv) == 3:
-        appscale.deploy(sys.argv[2])
+      usage = "Usage: appscale deploy <app> [<app>...] [--email EMAIL] " \
+        "[--parallel N]"
+      args = sys.argv[2:]
+      flags = {}
+      for flag in ['--email', '--parallel']:
+        if flag in args:
+          index = args.index(flag)
+          if index + 1 >= len(args):
+            cprint(usage, 'red')
+            sys.exit(1)
+          flags[flag] = args[index + 1]
+          del args[index:index + 2]
+
+      email = flags.get('--email')
+      parallel = flags.get('--parallel')
+      if not args or (parallel is not None and not parallel.isdigit()):
+        cprint(usage, 'red')
+        sys.exit(1)
+
+      if len(args) == 1 and parallel is None:
+        appscale.deploy(args[0], email)
       else:
-        appscale.deploy(sys.argv[2], sys.argv[3])
+        if parallel is not None:
+          parallel = int(parallel)
+        appscale.deploy_apps(args, email, parallel)
     except Exception as exception:
       LocalState.generate_crash_log(exception, traceback.format_exc())
       sys.exit(1)
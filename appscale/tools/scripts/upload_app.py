@@ -17,7 +17,10 @@ def main():
   """ Excecute appscale-upload-app script. """
   options = ParseArgs(sys.argv[1:], "appscale-upload-app").args
   try:
-    AppScaleTools.upload_app(options)
+    if options.files:
+      AppScaleTools.upload_apps(options)
+    else:
+      AppScaleTools.upload_app(options)
     sys.exit(0)
   except Exception, e:
     LocalState.generate_crash_log(e, traceback.format_exc())
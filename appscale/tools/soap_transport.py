@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+""" A SOAP transport that keeps HTTPS connections to each AppController open
+between calls, so that polling loops don't pay for a new TLS handshake every
+time they ask the AppController something. """
+
+
+# General-purpose Python library imports
+import atexit
+import httplib
+import socket
+import ssl
+import threading
+
+
+# Third-party imports
+from SOAPpy.Client import HTTPError
+from SOAPpy.Client import HTTPTransport
+from SOAPpy.Client import SOAPAddress
+from SOAPpy.Client import SOAPUserAgent
+from SOAPpy.Config import Config
+
+
+class HTTPSConnectionPool(object):
+  """ HTTPSConnectionPool keeps idle keep-alive connections to each host, and
+  is shared by every AppControllerClient in this process.
+  """
+
+
+  # The maximum number of idle connections to keep open to a single host.
+  MAX_IDLE_CONNECTIONS = 4
+
+
+  # The status lines that httplib reports when the server closed the
+  # connection without sending anything, which vary between Python versions.
+  EMPTY_STATUS_LINES = ('', "''", 'No status line received - the server has '
+                        'closed the connection')
+
+
+  # A dict that maps 'host:port' strs to a list of idle
+  # httplib.HTTPSConnections to that host.
+  idle_connections = {}
+
+
+  # Guards idle_connections, since AppControllers can be called from several
+  # threads at once.
+  lock = threading.Lock()
+
+
+  # The SSL context that every connection is made with. AppControllers use
+  # self-signed certificates, so they are not verified.
+  ssl_context = None
+  if hasattr(ssl, '_create_unverified_context'):
+    ssl_context = ssl._create_unverified_context()
+
+
+  @classmethod
+  def acquire(cls, host, timeout=None):
+    """ Returns a connection to the given host, reusing an idle one if one is
+    available.
+
+    Args:
+      host: A str containing the host and port to connect to.
+      timeout: The number of seconds that socket operations may take, or None
+        to wait indefinitely.
+    Returns:
+      A tuple containing an httplib.HTTPSConnection and a bool that indicates
+      if the connection was used before.
+    """
+    with cls.lock:
+      idle = cls.idle_connections.get(host, [])
+      if idle:
+        connection = idle.pop()
+        if connection.sock is not None:
+          connection.sock.settimeout(timeout)
+        return connection, True
+
+    if cls.ssl_context is not None:
+      connection = httplib.HTTPSConnection(host, timeout=timeout,
+                                           context=cls.ssl_context)
+    else:
+      connection = httplib.HTTPSConnection(host, timeout=timeout)
+    return connection, False
+
+
+  @classmethod
+  def release(cls, host, connection):
+    """ Returns a connection to the pool so that later calls can use it.
+
+    Args:
+      host: A str containing the host and port that the connection is to.
+      connection: The httplib.HTTPSConnection to return to the pool.
+    """
+    with cls.lock:
+      idle = cls.idle_connections.setdefault(host, [])
+      if len(idle) < cls.MAX_IDLE_CONNECTIONS:
+        idle.append(connection)
+        return
+
+    connection.close()
+
+
+  @classmethod
+  def request(cls, host, method, path, body, headers, timeout=None):
+    """ Sends an HTTP request over a pooled connection and reads the response.
+
+    Args:
+      host: A str containing the host and port to send the request to.
+      method: A str containing the HTTP method to use.
+      path: A str containing the path to request.
+      body: A str containing the body of the request, or None.
+      headers: A dict containing the headers of the request.
+      timeout: The number of seconds that socket operations may take, or None
+        to wait indefinitely.
+    Returns:
+      A tuple containing the httplib.HTTPResponse and its body.
+    Raises:
+      httplib.HTTPException: If the response could not be read.
+      socket.error: If the host could not be reached, or if the connection
+        failed after the request was sent.
+    """
+    while True:
+      connection, reused = cls.acquire(host, timeout)
+      try:
+        connection.request(method, path, body, headers)
+      except (httplib.HTTPException, socket.error):
+        connection.close()
+        # The server may have closed an idle connection that we kept, in which
+        # case the request never reached it and can be sent on a new one.
+        if not reused:
+          raise
+        continue
+
+      try:
+        response = connection.getresponse()
+        response_body = response.read()
+        break
+      except httplib.BadStatusLine as error:
+        connection.close()
+        # A kept connection that the server closed before reading the request
+        # ends without a status line. Any other failure may come after the
+        # server acted on the request, so it isn't sent again.
+        if not reused or error.line not in cls.EMPTY_STATUS_LINES:
+          raise
+      except (httplib.HTTPException, socket.error):
+        connection.close()
+        raise
+
+    if response.will_close:
+      connection.close()
+    else:
+      cls.release(host, connection)
+    return response, response_body
+
+
+  @classmethod
+  def close_all(cls):
+    """ Closes every idle connection in the pool. """
+    with cls.lock:
+      connections = [connection for idle in cls.idle_connections.values()
+                     for connection in idle]
+      cls.idle_connections = {}
+
+    for connection in connections:
+      connection.close()
+
+
+class PooledHTTPTransport(HTTPTransport):
+  """ PooledHTTPTransport sends SOAP requests over connections from
+  HTTPSConnectionPool instead of opening a new connection for each one.
+
+  It can be used in place of SOAPpy's HTTPTransport for https addresses.
+  """
+
+
+  def call(self, addr, data, namespace, soapaction=None, encoding=None,
+           http_proxy=None, config=Config, timeout=None):
+    """ Sends a SOAP request and reads the response.
+
+    Args:
+      addr: A str or SOAPpy.Client.SOAPAddress naming where to send the request.
+      data: A str containing the SOAP envelope.
+      namespace: The namespace of the method that is being called.
+      soapaction: A str containing the SOAPAction header, if any.
+      encoding: A str containing the encoding of the envelope, if any.
+      http_proxy: Not supported, since AppControllers are contacted directly.
+      config: The SOAPpy configuration in use.
+      timeout: The number of seconds that socket operations may take, or None
+        to wait indefinitely.
+    Returns:
+      A tuple containing the body of the response and its namespace.
+    Raises:
+      SOAPpy.Client.HTTPError: If the server returned an HTTP error.
+    """
+    if not isinstance(addr, SOAPAddress):
+      addr = SOAPAddress(addr, config)
+
+    content_type = 'text/xml'
+    if encoding is not None:
+      content_type += '; charset={0}'.format(encoding)
+    headers = {
+      'Content-type': content_type,
+      'User-agent': SOAPUserAgent(),
+      'SOAPAction': '"{0}"'.format(soapaction) if soapaction else ''
+    }
+
+    response, body = HTTPSConnectionPool.request(addr.host, 'POST', addr.path,
+                                                 data, headers, timeout)
+
+    response_type = response.getheader('content-type', 'text/xml')
+    if response.status == 500 and not \
+        (response_type.startswith('text/xml') and body):
+      raise HTTPError(response.status, response.reason)
+    if response.status not in (200, 500):
+      raise HTTPError(response.status, response.reason)
+
+    if namespace is None:
+      return body, None
+    return body, self.getNS(namespace, body)
+
+
+atexit.register(HTTPSConnectionPool.close_all)
@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+""" An in-process SSH transport that keeps a pool of authenticated connections
+to each machine, so that remote commands and file copies don't need to fork a
+new ssh or scp process each time. """
+
+
+# General-purpose Python library imports
+import atexit
+import fnmatch
+import os
+import socket
+import stat
+import threading
+import time
+from StringIO import StringIO
+
+
+# Third-party imports
+try:
+  import paramiko
+except ImportError:
+  paramiko = None
+
+
+# AppScale-specific imports
+from appscale_logger import AppScaleLogger
+from custom_exceptions import ShellException
+from local_state import LocalState
+from retry_policy import RetryPolicy
+
+
+class RemoteProcess(object):
+  """ Holds the result of a command executed over an in-process SSH channel,
+  exposing the parts of the subprocess.Popen interface that callers use. """
+
+  def __init__(self, output, returncode):
+    """ Creates a new RemoteProcess.
+
+    Args:
+      output: A str containing the output of the command.
+      returncode: An int containing the exit status of the command.
+    """
+    self.stdout = StringIO(output)
+    self.stderr = None
+    self.returncode = returncode
+
+  def wait(self):
+    """ Returns the exit status of the command, which has already finished. """
+    return self.returncode
+
+  def poll(self):
+    """ Returns the exit status of the command, which has already finished. """
+    return self.returncode
+
+  def communicate(self, input=None):
+    """ Returns the output of the command, mirroring Popen.communicate. """
+    return self.stdout.read(), None
+
+
+class SSHTransportPool(object):
+  """ SSHTransportPool keeps authenticated SSH connections open for each
+  (host, user, key) combination and opens a new channel per command.
+
+  The pool is only used when paramiko is installed and the
+  APPSCALE_SSH_TRANSPORT environment variable is set to 'pool'. Otherwise,
+  RemoteHelper keeps shelling out to ssh and scp.
+  """
+
+
+  # The environment variable that selects which SSH transport to use.
+  TRANSPORT_ENV_VAR = 'APPSCALE_SSH_TRANSPORT'
+
+
+  # The value of TRANSPORT_ENV_VAR that selects the in-process pool.
+  POOL_TRANSPORT = 'pool'
+
+
+  # The maximum number of idle connections to keep open to a single machine.
+  MAX_IDLE_CONNECTIONS = 4
+
+
+  # The number of seconds to wait when establishing a new connection.
+  CONNECT_TIMEOUT = 10
+
+
+  # The number of bytes to read from a channel at a time.
+  READ_SIZE = 32768
+
+
+  # A dict that maps (host, user, key_path) tuples to a list of idle
+  # paramiko.SSHClients that are connected to that machine.
+  idle_connections = {}
+
+
+  # Guards idle_connections, since remote operations can be issued from
+  # several threads at once.
+  lock = threading.Lock()
+
+
+  @classmethod
+  def is_enabled(cls):
+    """ Checks if remote operations should go through the connection pool.
+
+    Returns:
+      True if paramiko is available and the pool has been selected, and False
+      otherwise.
+    """
+    return paramiko is not None and \
+      os.environ.get(cls.TRANSPORT_ENV_VAR) == cls.POOL_TRANSPORT
+
+
+  @classmethod
+  def acquire(cls, host, user, key_path):
+    """ Returns a connected SSH client for the given machine, reusing an idle
+    connection if one is available.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+    Returns:
+      A paramiko.SSHClient that is connected to the machine.
+    """
+    connection = (host, user, key_path)
+    with cls.lock:
+      idle = cls.idle_connections.get(connection, [])
+      while idle:
+        client = idle.pop()
+        transport = client.get_transport()
+        if transport is not None and transport.is_active():
+          return client
+        client.close()
+
+    client = paramiko.SSHClient()
+    # Mirror the StrictHostkeyChecking=no and UserKnownHostsFile=/dev/null
+    # options that the subprocess transport uses.
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect(host, username=user, key_filename=key_path,
+                   timeout=cls.CONNECT_TIMEOUT, allow_agent=False,
+                   look_for_keys=False)
+    return client
+
+
+  @classmethod
+  def release(cls, host, user, key_path, client):
+    """ Returns a connection to the pool so that later operations can use it.
+
+    Args:
+      host: A str representing the machine that the client is connected to.
+      user: A str representing the user that the client is logged in as.
+      key_path: A str containing the location of the private key used.
+      client: The paramiko.SSHClient to return to the pool.
+    """
+    connection = (host, user, key_path)
+    with cls.lock:
+      idle = cls.idle_connections.setdefault(connection, [])
+      if len(idle) < cls.MAX_IDLE_CONNECTIONS:
+        idle.append(client)
+        return
+
+    client.close()
+
+
+  @classmethod
+  def discard(cls, client):
+    """ Closes a connection that should not be reused.
+
+    Args:
+      client: The paramiko.SSHClient to close.
+    """
+    try:
+      client.close()
+    except Exception:
+      pass
+
+
+  @classmethod
+  def close_all(cls):
+    """ Closes every idle connection in the pool. """
+    with cls.lock:
+      clients = [client for idle in cls.idle_connections.values()
+                 for client in idle]
+      cls.idle_connections = {}
+
+    for client in clients:
+      cls.discard(client)
+
+
+  @classmethod
+  def execute(cls, host, user, key_path, command, stdin=None):
+    """ Runs a command on the given machine over a new channel.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      command: A str containing the command to execute.
+      stdin: A str that is passed as standard input to the command.
+    Returns:
+      A tuple containing the exit status of the command and a str with both
+      the standard output and standard error that it produced.
+    """
+    client = cls.acquire(host, user, key_path)
+    try:
+      channel = client.get_transport().open_session()
+      try:
+        channel.set_combine_stderr(True)
+        channel.exec_command(command)
+        if stdin is not None:
+          channel.sendall(stdin)
+        channel.shutdown_write()
+
+        chunks = []
+        while True:
+          chunk = channel.recv(cls.READ_SIZE)
+          if not chunk:
+            break
+          chunks.append(chunk)
+        returncode = channel.recv_exit_status()
+      finally:
+        channel.close()
+    except (paramiko.SSHException, socket.error):
+      cls.discard(client)
+      raise
+
+    cls.release(host, user, key_path, client)
+    return returncode, ''.join(chunks)
+
+
+  @classmethod
+  def run(cls, host, user, key_path, command, is_verbose, num_retries,
+          stdin=None):
+    """ Runs a command on the given machine, retrying it if it fails, in the
+    same manner as LocalState.shell.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      command: A str containing the command to execute.
+      is_verbose: A bool that indicates if we should print the command we are
+        executing to stdout.
+      num_retries: The number of times we should try to execute the given
+        command before aborting, or a RetryPolicy.
+      stdin: A str that is passed as standard input to the command.
+    Returns:
+      A str with both the standard output and standard error produced when the
+      command executes.
+    Raises:
+      ShellException: If, after all attempts, executing the command failed.
+    """
+    description = '{0}@{1}: {2}'.format(user, host, command)
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
+    while True:
+      attempt += 1
+      AppScaleLogger.verbose('ssh> {0}'.format(description), is_verbose)
+      if stdin is not None:
+        AppScaleLogger.verbose('       stdin str: {0}'.format(
+          LocalState.redact(stdin)), is_verbose)
+      try:
+        returncode, output = cls.execute(host, user, key_path, command,
+                                         stdin=stdin)
+      except (paramiko.SSHException, socket.error) as error:
+        # Report connection errors the same way that ssh does.
+        returncode, output = RetryPolicy.SSH_TRANSPORT_ERROR, str(error)
+
+      if returncode == 0:
+        return output
+
+      delay = retry_policy.get_delay(attempt, returncode, waited)
+      if delay is None:
+        if stdin:
+          raise ShellException("Executing command '{0} {1}' failed:\n{2}".
+                               format(description, LocalState.redact(stdin),
+                                      output))
+        else:
+          raise ShellException("Executing command '{0}' failed:\n{1}".
+                               format(description, output))
+
+      AppScaleLogger.verbose('Command failed with exit code {0}. Trying '
+                             'again in {1:.1f} seconds.'.format(returncode,
+                                                                delay),
+                             is_verbose)
+      time.sleep(delay)
+      waited += delay
+
+
+  @classmethod
+  def popen(cls, host, user, key_path, command):
+    """ Runs a command on the given machine once, returning an object that
+    can be used in place of the subprocess.Popen that ssh would produce.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      command: A str containing the command to execute.
+    Returns:
+      A RemoteProcess holding the output and exit status of the command.
+    """
+    returncode, output = cls.execute(host, user, key_path, command)
+    return RemoteProcess(output, returncode)
+
+
+  @classmethod
+  def put(cls, host, user, key_path, source, dest, is_verbose, num_retries):
+    """ Copies a local file or directory to the given machine, with the same
+    semantics as 'scp -r'.
+
+    Args:
+      host: A str representing the machine that we should copy to.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      source: A str containing the local file or directory to copy.
+      dest: A str containing the remote location to copy to.
+      is_verbose: A bool that indicates if we should print the copy we are
+        performing to stdout.
+      num_retries: The number of times we should try to copy the files
+        before aborting, or a RetryPolicy.
+    Raises:
+      ShellException: If, after all attempts, the copy failed.
+    """
+    def copy(sftp):
+      target = dest
+      if cls._is_remote_dir(sftp, dest):
+        target = '/'.join([dest.rstrip('/'), os.path.basename(source)])
+      cls._put_path(sftp, source, target)
+
+    cls._transfer(host, user, key_path, '{0} -> {1}@{2}:{3}'.format(
+      source, user, host, dest), copy, is_verbose, num_retries)
+
+
+  @classmethod
+  def get(cls, host, user, key_path, source, dest, is_verbose, num_retries):
+    """ Copies files or directories from the given machine to this one, with
+    the same semantics as 'scp -r'. The source may contain shell wildcards in
+    its final component.
+
+    Args:
+      host: A str representing the machine that we should copy from.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      source: A str containing the remote files or directory to copy.
+      dest: A str containing the local location to copy to.
+      is_verbose: A bool that indicates if we should print the copy we are
+        performing to stdout.
+      num_retries: The number of times we should try to copy the files
+        before aborting, or a RetryPolicy.
+    Raises:
+      ShellException: If, after all attempts, the copy failed.
+    """
+    def copy(sftp):
+      remote_dir, pattern = os.path.split(source)
+      if any(char in pattern for char in '*?['):
+        matches = ['/'.join([remote_dir, name])
+                   for name in sorted(sftp.listdir(remote_dir or '.'))
+                   if fnmatch.fnmatch(name, pattern)]
+        if not matches:
+          raise IOError('No such file or directory: {0}'.format(source))
+      else:
+        matches = [source]
+
+      for match in matches:
+        target = dest
+        if os.path.isdir(dest):
+          target = os.path.join(dest, os.path.basename(match))
+        cls._get_path(sftp, match, target)
+
+    cls._transfer(host, user, key_path, '{0}@{1}:{2} -> {3}'.format(
+      user, host, source, dest), copy, is_verbose, num_retries)
+
+
+  @classmethod
+  def _transfer(cls, host, user, key_path, description, copy, is_verbose,
+                num_retries):
+    """ Runs a file copy over an SFTP session, retrying it if it fails.
+
+    Args:
+      host: A str representing the machine that we should log into.
+      user: A str representing the user to log in as.
+      key_path: A str containing the location of the private key to use.
+      description: A str describing the copy, for logging.
+      copy: A function that takes a paramiko.SFTPClient and performs the copy.
+      is_verbose: A bool that indicates if we should print the copy we are
+        performing to stdout.
+      num_retries: The number of times we should try to copy the files
+        before aborting, or a RetryPolicy.
+    Raises:
+      ShellException: If, after all attempts, the copy failed.
+    """
+    retry_policy = RetryPolicy.from_retries(num_retries)
+    attempt = 0
+    waited = 0
+    while True:
+      attempt += 1
+      AppScaleLogger.verbose('sftp> {0}'.format(description), is_verbose)
+      client = None
+      try:
+        client = cls.acquire(host, user, key_path)
+        sftp = client.open_sftp()
+        try:
+          copy(sftp)
+        finally:
+          sftp.close()
+        cls.release(host, user, key_path, client)
+        return
+      except (paramiko.SSHException, socket.error, IOError, OSError) as error:
+        if client is not None:
+          cls.discard(client)
+        # Report failures with the exit status that scp would have used.
+        if isinstance(error, (paramiko.SSHException, socket.error)):
+          returncode = RetryPolicy.SSH_TRANSPORT_ERROR
+        else:
+          returncode = 1
+
+      delay = retry_policy.get_delay(attempt, returncode, waited)
+      if delay is None:
+        raise ShellException("Copying '{0}' failed:\n{1}".format(
+          description, error))
+
+      AppScaleLogger.verbose('Copy failed with exit code {0}. Trying again '
+                             'in {1:.1f} seconds.'.format(returncode, delay),
+                             is_verbose)
+      time.sleep(delay)
+      waited += delay
+
+
+  @classmethod
+  def _is_remote_dir(cls, sftp, path):
+    """ Checks if the given remote path is a directory.
+
+    Args:
+      sftp: A paramiko.SFTPClient connected to the remote machine.
+      path: A str containing the remote path to check.
+    Returns:
+      True if the path exists and is a directory, and False otherwise.
+    """
+    try:
+      return stat.S_ISDIR(sftp.stat(path).st_mode)
+    except IOError:
+      return False
+
+
+  @classmethod
+  def _put_path(cls, sftp, source, target):
+    """ Recursively copies a local file or directory to a remote path.
+
+    Args:
+      sftp: A paramiko.SFTPClient connected to the remote machine.
+      source: A str containing the local file or directory to copy.
+      target: A str containing the remote path to create.
+    """
+    if not os.path.isdir(source):
+      sftp.put(source, target)
+      sftp.chmod(target, stat.S_IMODE(os.stat(source).st_mode))
+      return
+
+    if not cls._is_remote_dir(sftp, target):
+      sftp.mkdir(target)
+    for name in os.listdir(source):
+      cls._put_path(sftp, os.path.join(source, name), '/'.join([target, name]))
+
+
+  @classmethod
+  def _get_path(cls, sftp, source, target):
+    """ Recursively copies a remote file or directory to a local path.
+
+    Args:
+      sftp: A paramiko.SFTPClient connected to the remote machine.
+      source: A str containing the remote file or directory to copy.
+      target: A str containing the local path to create.
+    """
+    if not cls._is_remote_dir(sftp, source):
+      sftp.get(source, target)
+      return
+
+    if not os.path.isdir(target):
+      os.mkdir(target)
+    for name in sftp.listdir(source):
+      cls._get_path(sftp, '/'.join([source, name]), os.path.join(target, name))
+
+
+# Close any pooled connections when the tools exit.
+atexit.register(SSHTransportPool.close_all)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+""" Waits for a condition on a remote machine to become true, polling often
+while it is likely to change soon and less often during long waits. """
+
+
+# General-purpose Python library imports
+import time
+
+
+# AppScale-specific imports
+from appscale_logger import AppScaleLogger
+from custom_exceptions import TimeoutException
+
+
+class Waiter(object):
+  """ Waiter repeatedly checks a condition, waiting longer after each check
+  that fails.
+
+  A waiter holds no state between waits, so the same one can be reused.
+  """
+
+
+  # The number of seconds to wait after the first failed check, by default.
+  DEFAULT_MIN_DELAY = 0.5
+
+
+  # The most seconds to wait between two checks, by default.
+  DEFAULT_MAX_DELAY = 5
+
+
+  # How much longer to wait after each failed check.
+  BACKOFF_FACTOR = 1.5
+
+
+  # The number of seconds between progress messages.
+  PROGRESS_INTERVAL = 15
+
+
+  def __init__(self, min_delay=DEFAULT_MIN_DELAY, max_delay=DEFAULT_MAX_DELAY,
+               deadline=None, description=None):
+    """ Creates a new Waiter.
+
+    Args:
+      min_delay: A number indicating the seconds to wait after the first
+        failed check.
+      max_delay: A number indicating the most seconds to wait between two
+        checks.
+      deadline: A number indicating the most seconds to wait in total, or None
+        to wait indefinitely.
+      description: A str describing what is being waited for. If given,
+        progress messages are logged while waiting.
+    """
+    self.min_delay = min_delay
+    self.max_delay = max_delay
+    self.deadline = deadline
+    self.description = description
+
+
+  def wait(self, check, long_poll=None, is_verbose=False):
+    """ Calls the given function until it returns a true value.
+
+    Args:
+      check: A function that takes no arguments and returns a true value once
+        the condition holds.
+      long_poll: A function that blocks until the condition may have changed,
+        or until its own timeout passes, such as a call that receives messages
+        from the AppController. If given, it is called between checks instead
+        of sleeping. If it raises an exception, the waiter sleeps instead for
+        that round.
+      is_verbose: A bool that indicates if we should print failed long polls
+        to stdout.
+    Returns:
+      The value that check returned.
+    Raises:
+      TimeoutException: If the condition does not hold before the deadline.
+    """
+    end_time = None
+    if self.deadline is not None:
+      end_time = time.time() + self.deadline
+
+    delay = self.min_delay
+    last_report = None
+    while True:
+      result = check()
+      if result:
+        return result
+
+      now = time.time()
+      if end_time is not None and now >= end_time:
+        raise TimeoutException("Timed out waiting for {0}".format(
+          self.description or 'condition'))
+
+      if self.description is not None and (last_report is None or
+          now - last_report >= self.PROGRESS_INTERVAL):
+        AppScaleLogger.log("Waiting for {0}...".format(self.description))
+        last_report = now
+
+      if long_poll is not None:
+        try:
+          long_poll()
+          continue
+        except Exception as poll_error:
+          AppScaleLogger.verbose("Long poll failed: {0}".format(poll_error),
+                                 is_verbose)
+
+      sleep_time = delay
+      if end_time is not None:
+        sleep_time = min(delay, end_time - now)
+      time.sleep(sleep_time)
+      delay = min(delay * self.BACKOFF_FACTOR, self.max_delay)
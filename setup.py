@@ -55,13 +55,19 @@ setup(
     'msrestazure',
     'oauth2client==4.0.0',
     'PyYAML',
-    'requests[security]>=2.7.0,<2.15',
+    'requests[security]>=2.10.0,<2.15',
     'setuptools>=11.3,<34',
     'SOAPpy',
     'termcolor',
     'wstools==0.4.3',
     'tabulate==0.7.7'
   ],
+  extras_require={
+    # Allows remote commands to share pooled, in-process SSH connections.
+    'ssh-pool': ['paramiko<3'],
+    # Speeds up scanning application directories on Python 2.
+    'fast-scan': ['scandir']
+  },
   classifiers=[
     'Development Status :: 5 - Production/Stable',
     'Environment :: Console',
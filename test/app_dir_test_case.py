@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+""" A base for tests that need an application's files on disk. """
+
+
+# General-purpose Python library imports
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class AppDirTestCase(unittest.TestCase):
+  """ AppDirTestCase gives each test an empty application directory, app_dir,
+  inside a temporary working directory, workdir, that is removed afterwards.
+  """
+
+
+  def setUp(self):
+    self.workdir = tempfile.mkdtemp()
+    self.app_dir = os.path.join(self.workdir, 'app')
+    os.makedirs(self.app_dir)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.workdir)
+
+
+  def write_file(self, path, contents):
+    """ Writes a file in the application's directory, creating the
+    directories that hold it.
+
+    Args:
+      path: A str containing the file's path from the app's directory.
+      contents: A str containing the file's contents.
+    Returns:
+      A str containing the file's location on the local filesystem.
+    """
+    local_path = os.path.join(self.app_dir, path)
+    if not os.path.isdir(os.path.dirname(local_path)):
+      os.makedirs(os.path.dirname(local_path))
+    with open(local_path, 'wb') as app_file:
+      app_file.write(contents)
+    return local_path
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+""" Compares how long it takes to package synthetic application trees with
+tarfile's gzip compression and with AppPackager.
+
+Usage: python test/benchmarks/benchmark_app_packaging.py [workers]
+"""
+
+
+# General-purpose Python library imports
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+
+# Third party libraries
+from tabulate import tabulate
+
+
+# AppScale import, the library that we're benchmarking here
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from appscale.tools.app_manifest import AppManifest
+from appscale.tools.app_packager import AppPackager
+
+
+# Words that synthetic source files are made of.
+WORDS = ['def', 'class', 'return', 'self', 'import', 'for', 'in', 'if',
+         'else', 'request', 'response', 'entity', 'key', 'value', 'None',
+         'True', 'False', 'datastore', 'query', 'template', 'render']
+
+
+class CountingSink(object):
+  """ A file-like object that only counts what is written to it, so that the
+  benchmark measures compression rather than disk speed. """
+
+  def __init__(self):
+    self.bytes_written = 0
+
+  def write(self, data):
+    self.bytes_written += len(data)
+
+  def tell(self):
+    return self.bytes_written
+
+
+def write_source_file(path, size, rng):
+  """ Writes a file that compresses like source code.
+
+  Args:
+    path: A str containing where to write the file.
+    size: An int indicating roughly how many bytes to write.
+    rng: A random.Random to pick words with.
+  """
+  lines = []
+  written = 0
+  while written < size:
+    line = '  ' * rng.randint(0, 4) + ' '.join(
+      rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+    lines.append(line)
+    written += len(line) + 1
+  with open(path, 'w') as source_file:
+    source_file.write('\n'.join(lines))
+
+
+def write_binary_file(path, size, compressible):
+  """ Writes a binary file.
+
+  Args:
+    path: A str containing where to write the file.
+    size: An int indicating how many bytes to write.
+    compressible: A bool indicating if the contents repeat, like a native
+      library's, or are random, like a jar's.
+  """
+  with open(path, 'wb') as binary_file:
+    if compressible:
+      pattern = os.urandom(4096)
+      for _ in range(size / (len(pattern) * 2)):
+        binary_file.write(pattern)
+        binary_file.write(os.urandom(len(pattern)))
+    else:
+      binary_file.write(os.urandom(size))
+
+
+def make_tree(root, small_files, binaries, rng):
+  """ Makes a synthetic application tree.
+
+  Args:
+    root: A str containing the directory to create the tree in.
+    small_files: An int indicating how many source files to write.
+    binaries: A list of (name, size in MB, compressible) tuples.
+    rng: A random.Random to make the source files with.
+  """
+  for index in range(small_files):
+    directory = os.path.join(root, 'pkg{0}'.format(index / 100))
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    write_source_file(os.path.join(directory, 'module{0}.py'.format(index)),
+                      rng.randint(1024, 16 * 1024), rng)
+
+  lib_dir = os.path.join(root, 'lib')
+  if binaries and not os.path.isdir(lib_dir):
+    os.makedirs(lib_dir)
+  for name, size, compressible in binaries:
+    write_binary_file(os.path.join(lib_dir, name), size * 1024 * 1024,
+                      compressible)
+
+
+def package_with_tarfile(files):
+  """ Packages files the way that the tools used to, with tarfile.
+
+  Args:
+    files: A dict that maps paths in the archive to local files.
+  Returns:
+    The number of bytes in the archive.
+  """
+  sink = CountingSink()
+  with tarfile.open(fileobj=sink, mode='w:gz') as tar:
+    for tarball_path in sorted(files):
+      tar.add(files[tarball_path], tarball_path)
+  return sink.bytes_written
+
+
+def package_with_packager(files, packager):
+  """ Packages files with an AppPackager.
+
+  Args:
+    files: A dict that maps paths in the archive to local files.
+    packager: The AppPackager to use.
+  Returns:
+    The number of bytes in the archive.
+  """
+  sink = CountingSink()
+  packager.write_files(sink, files)
+  return sink.bytes_written
+
+
+def main():
+  """ Runs the benchmark and prints a table of the results. """
+  workers = multiprocessing.cpu_count()
+  if len(sys.argv) > 1:
+    workers = int(sys.argv[1])
+
+  trees = [
+    ('many small files', 3000, []),
+    ('large binaries', 0, [('guava.jar', 16, False), ('app.jar', 16, False),
+                           ('libnative.so', 16, True),
+                           ('libcodec.so', 16, True)]),
+    ('mixed', 1500, [('guava.jar', 8, False), ('libnative.so', 8, True)])
+  ]
+  methods = [
+    ('tarfile w:gz', package_with_tarfile),
+    ('gzip, 1 worker', lambda files: package_with_packager(
+      files, AppPackager(workers=1))),
+    ('gzip, {0} workers'.format(workers), lambda files: package_with_packager(
+      files, AppPackager(workers=workers))),
+    ('gzip -1, {0} workers'.format(workers),
+     lambda files: package_with_packager(
+       files, AppPackager(level=1, workers=workers))),
+    ('bzip2', lambda files: package_with_packager(
+      files, AppPackager(AppPackager.BZIP2)))
+  ]
+
+  rows = []
+  rng = random.Random(0)
+  for tree_name, small_files, binaries in trees:
+    root = tempfile.mkdtemp()
+    try:
+      make_tree(root, small_files, binaries, rng)
+      files = AppManifest.collect_files(root)
+      input_bytes = sum(os.path.getsize(path) for path in files.itervalues())
+      baseline = None
+      for method_name, package in methods:
+        start = time.time()
+        cpu_start = sum(os.times()[:2])
+        output_bytes = package(files)
+        seconds = time.time() - start
+        cpu_seconds = sum(os.times()[:2]) - cpu_start
+        baseline = baseline or seconds
+        rows.append([tree_name, method_name, input_bytes / 1048576.0,
+                     output_bytes / 1048576.0, seconds, cpu_seconds,
+                     baseline / seconds])
+    finally:
+      shutil.rmtree(root)
+
+  print tabulate(rows, headers=['Tree', 'Method', 'Input MB', 'Output MB',
+                                'Seconds', 'CPU seconds', 'Speedup'],
+                 floatfmt='.2f')
+
+
+if __name__ == '__main__':
+  main()
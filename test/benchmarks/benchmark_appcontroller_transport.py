@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+""" Compares how long AppControllerClient takes to fetch cluster stats over
+SOAP and over JSON, using a local stand-in for the AppController.
+
+Usage: python test/benchmarks/benchmark_appcontroller_transport.py [calls]
+"""
+
+
+# General-purpose Python library imports
+import BaseHTTPServer
+import gzip
+import json
+import multiprocessing
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+
+
+# Third party libraries
+import SOAPpy
+from tabulate import tabulate
+
+
+# AppScale import, the library that we're benchmarking here
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from appscale.tools.appcontroller_client import AppControllerClient
+from appscale.tools.json_transport import JSONProxy
+from appscale.tools.soap_transport import HTTPSConnectionPool
+
+
+# The number of nodes in each synthetic deployment.
+NODE_COUNTS = [100, 1000]
+
+
+# The number of times each transport fetches the stats, by default.
+DEFAULT_CALLS = 20
+
+
+def make_cluster_stats(node_count):
+  """ Makes cluster stats like those that an AppController reports.
+
+  Args:
+    node_count: An int indicating how many nodes the deployment has.
+  Returns:
+    A str containing the stats as JSON.
+  """
+  nodes = []
+  for index in range(node_count):
+    nodes.append({
+      'private_ip': '10.0.{0}.{1}'.format(index / 256, index % 256),
+      'public_ip': '172.16.{0}.{1}'.format(index / 256, index % 256),
+      'state': 'Done starting up AppScale, now in heartbeat mode',
+      'is_initialized': True,
+      'is_loaded': True,
+      'roles': ['appengine', 'memcache', 'taskqueue_slave', 'db_slave'],
+      'cpu': {'idle': 81.5, 'system': 4.25, 'user': 14.25, 'count': 4},
+      'memory': {'total': 16825933824, 'available': 9913245696,
+                 'used': 6912688128},
+      'swap': {'free': 0, 'used': 0},
+      'disk': [{'/': {'total': 105553100800, 'free': 70259716096,
+                      'used': 35293384704}},
+               {'/opt/appscale': {'total': 211106201600,
+                                  'free': 190259716096,
+                                  'used': 20846485504}}],
+      'loadavg': {'last_1_min': 0.62, 'last_5_min': 0.58,
+                  'last_15_min': 0.51, 'runnable_entities': 2,
+                  'scheduling_entities': 1042},
+      'apps': {'guestbook_default_v1': {
+        'language': 'python27', 'appservers': 3, 'pending_appservers': 0,
+        'http': 8080, 'https': 4380, 'reqs_enqueued': 0,
+        'total_reqs': 123456}}
+    })
+  return json.dumps(nodes)
+
+
+def encode_stats(stats):
+  """ Encodes the stats the way that each transport sends them.
+
+  Args:
+    stats: A str containing the stats as JSON.
+  Returns:
+    A tuple containing the SOAP envelope and the gzipped JSON body.
+  """
+  soap_body = SOAPpy.buildSOAP(
+    kw={'return': stats}, method='get_cluster_stats_jsonResponse',
+    encoding='UTF-8')
+  compressed = StringIO()
+  with gzip.GzipFile(fileobj=compressed, mode='wb') as gzip_file:
+    gzip_file.write(stats)
+  return soap_body, compressed.getvalue()
+
+
+class StandInServer(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """ A server that answers get_cluster_stats_json like an AppController that
+  serves both SOAP and JSON. """
+
+  daemon_threads = True
+
+  def __init__(self, certificate, stats):
+    """ Starts listening on a free local port.
+
+    Args:
+      certificate: A str with the location of a PEM file that holds the key
+        and certificate to serve with.
+      stats: A str containing the stats to serve, as JSON.
+    """
+    BaseHTTPServer.HTTPServer.__init__(self, ('localhost', 0),
+                                       StandInHandler)
+    self.socket = ssl.wrap_socket(self.socket, certfile=certificate,
+                                  server_side=True)
+    self.soap_body, self.json_body = encode_stats(stats)
+
+  def handle_error(self, request, client_address):
+    """ Ignores clients that hang up without closing TLS cleanly. """
+    pass
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """ Answers requests for StandInServer. """
+
+  protocol_version = 'HTTP/1.1'
+
+  # Buffer each response so that its headers and body are sent together,
+  # instead of waiting on delayed acknowledgements between them.
+  wbufsize = -1
+
+  def log_message(self, *args):
+    """ Keeps requests from being logged to stderr. """
+    pass
+
+  def send_body(self, body, content_type, encoding=None):
+    """ Sends a response with the given body.
+
+    Args:
+      body: A str containing the body of the response.
+      content_type: A str containing the type of the body.
+      encoding: A str naming how the body is encoded, or None.
+    """
+    self.send_response(200)
+    self.send_header('Content-Type', content_type)
+    self.send_header('Content-Length', str(len(body)))
+    if encoding is not None:
+      self.send_header('Content-Encoding', encoding)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    """ Says which methods are served over JSON. """
+    self.send_body(json.dumps({'methods': ['get_cluster_stats_json']}),
+                   'application/json')
+
+  def do_POST(self):
+    """ Answers a SOAP or JSON call for get_cluster_stats_json. """
+    self.rfile.read(int(self.headers.getheader('content-length', 0)))
+    if self.path == JSONProxy.JSON_PATH + '/get_cluster_stats_json':
+      self.send_body(self.server.json_body, 'text/plain; charset=utf-8',
+                     'gzip')
+    else:
+      self.send_body(self.server.soap_body, 'text/xml; charset="utf-8"')
+
+
+def serve(certificate, stats, ports):
+  """ Runs a StandInServer until the process is terminated.
+
+  Args:
+    certificate: A str with the location of a PEM file that holds the key
+      and certificate to serve with.
+    stats: A str containing the stats to serve, as JSON.
+    ports: A multiprocessing.Queue to put the server's port on once it is
+      listening.
+  """
+  server = StandInServer(certificate, stats)
+  ports.put(server.server_address[1])
+  server.serve_forever()
+
+
+def make_certificate(directory):
+  """ Makes a self-signed certificate for the stand-in server.
+
+  Args:
+    directory: A str naming the directory to write the certificate to.
+  Returns:
+    A str with the location of a PEM file that holds the key and certificate.
+  """
+  location = os.path.join(directory, 'standin.pem')
+  with open(os.devnull, 'w') as devnull:
+    subprocess.check_call(
+      ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days',
+       '1', '-subj', '/CN=localhost', '-keyout', location, '-out', location],
+      stdout=devnull, stderr=devnull)
+  return location
+
+
+def time_calls(use_json, calls):
+  """ Fetches the stats repeatedly with the given transport.
+
+  Args:
+    use_json: A bool indicating if the JSON transport should be selected.
+    calls: An int indicating how many times to fetch the stats.
+  Returns:
+    The average number of seconds per call.
+  """
+  JSONProxy.supported_methods = {}
+  if use_json:
+    os.environ[JSONProxy.TRANSPORT_ENV_VAR] = JSONProxy.JSON_TRANSPORT
+  else:
+    os.environ.pop(JSONProxy.TRANSPORT_ENV_VAR, None)
+
+  client = AppControllerClient('localhost', 'secret')
+  # Warm up the connection so that each transport gets a kept-alive one.
+  client.get_cluster_stats()
+
+  start = time.time()
+  for _ in range(calls):
+    client.cache.invalidate()
+    client.get_cluster_stats()
+  return (time.time() - start) / calls
+
+
+def main():
+  """ Runs the benchmark and prints a table of the results. """
+  calls = DEFAULT_CALLS
+  if len(sys.argv) > 1:
+    calls = int(sys.argv[1])
+
+  rows = []
+  directory = tempfile.mkdtemp()
+  try:
+    certificate = make_certificate(directory)
+    for node_count in NODE_COUNTS:
+      stats = make_cluster_stats(node_count)
+      soap_body, json_body = encode_stats(stats)
+
+      # The server runs in its own process so that it doesn't compete with
+      # the client for the interpreter lock.
+      ports = multiprocessing.Queue()
+      server = multiprocessing.Process(target=serve,
+                                       args=(certificate, stats, ports))
+      server.start()
+      try:
+        AppControllerClient.PORT = ports.get(timeout=10)
+        soap_time = time_calls(False, calls)
+        json_time = time_calls(True, calls)
+      finally:
+        HTTPSConnectionPool.close_all()
+        server.terminate()
+        server.join()
+
+      rows.append([node_count, len(stats), len(soap_body), len(json_body),
+                   soap_time * 1000, json_time * 1000, soap_time / json_time])
+  finally:
+    shutil.rmtree(directory)
+
+  print tabulate(rows, headers=['Nodes', 'Stats bytes', 'SOAP wire bytes',
+                                'JSON wire bytes', 'SOAP ms/call',
+                                'JSON ms/call', 'Speedup'],
+                 floatfmt='.1f')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import time
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+import requests
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.admin_client import AdminClient
+from appscale.tools.custom_exceptions import TimeoutException
+
+
+class TestAdminClient(unittest.TestCase):
+
+
+  def setUp(self):
+    flexmock(time).should_receive('sleep').and_return()
+
+
+  def fake_response(self, body):
+    response = flexmock(name='response', status_code=200)
+    response.should_receive('json').and_return(body)
+    response.should_receive('raise_for_status')
+    return response
+
+
+  def test_clients_share_a_session(self):
+    first = AdminClient('public1', 'secret')
+    second = AdminClient('public2', 'secret')
+    self.assertTrue(first.session is second.session)
+    self.assertFalse(first.session.verify)
+
+
+  def test_wait_for_operations(self):
+    prefix = 'https://public1:17441/v1/apps'
+    flexmock(requests.Session).should_receive('get')\
+      .with_args(prefix + '/app1/operations/op1', headers=dict)\
+      .and_return(self.fake_response({'done': False}))\
+      .and_return(self.fake_response({'done': True, 'response': {}}))\
+      .times(2)
+    flexmock(requests.Session).should_receive('get')\
+      .with_args(prefix + '/app2/operations/op2', headers=dict)\
+      .and_return(self.fake_response({'done': True})).once()
+
+    # each operation should only be polled until it finishes, and be
+    # reported as soon as it does
+    finished = []
+    client = AdminClient('public1', 'secret')
+    operations = client.wait_for_operations(
+      [('app1', 'op1'), ('app2', 'op2')], 10,
+      lambda key, operation: finished.append(key))
+    self.assertEquals({('app1', 'op1'): {'done': True, 'response': {}},
+                       ('app2', 'op2'): {'done': True}}, operations)
+    self.assertEquals([('app2', 'op2'), ('app1', 'op1')], finished)
+
+
+  def test_wait_for_operation_deadline(self):
+    flexmock(requests.Session).should_receive('get')\
+      .and_return(self.fake_response({'done': False}))
+    client = AdminClient('public1', 'secret')
+    self.assertRaises(TimeoutException, client.wait_for_operation, 'app1',
+                      'op1', 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
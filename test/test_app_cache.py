@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import subprocess
+import unittest
+from StringIO import StringIO
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_cache import AppCache
+from appscale.tools.app_manifest import AppManifest
+from appscale.tools.app_packager import AppPackager
+from appscale.tools.local_state import LocalState
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppCache(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppCache, self).setUp()
+    self.write_file('app.yaml', 'runtime: python27\n')
+    self.write_file('main.py', 'print "hello"\n')
+    self.cache = AppCache(os.path.join(self.workdir, 'cache'))
+
+
+  def package(self, manifest, packager):
+    fileobj = StringIO()
+    manifest.write_tarball(fileobj, packager)
+    return fileobj.getvalue()
+
+
+  def test_manifests_are_reused_for_unchanged_trees(self):
+    first = AppManifest.from_directory(self.app_dir, cache=self.cache)
+
+    # an unchanged tree shouldn't be hashed again
+    flexmock(AppManifest).should_receive('hash_file').never()
+    second = AppManifest.from_directory(self.app_dir, cache=self.cache)
+    self.assertEquals(first.entries, second.entries)
+
+
+  def test_changed_trees_are_hashed_again(self):
+    first = AppManifest.from_directory(self.app_dir, cache=self.cache)
+    self.write_file('main.py', 'print "goodbye"\n')
+    second = AppManifest.from_directory(self.app_dir, cache=self.cache)
+    self.assertNotEquals(first.entries['./main.py']['hash'],
+                         second.entries['./main.py']['hash'])
+
+
+  def test_tarballs_are_packaged_once(self):
+    manifest = AppManifest.from_directory(self.app_dir)
+    packager = AppPackager(workers=1)
+    write_tarball = lambda fileobj: manifest.write_tarball(fileobj, packager)
+
+    first = StringIO()
+    self.cache.tarball_writer(manifest.fingerprint(), write_tarball)(first)
+
+    # identical trees should produce byte-identical tarballs, which should
+    # be copied from the cache instead of being packaged again
+    self.assertEquals(first.getvalue(), self.package(manifest, packager))
+    second = StringIO()
+    self.cache.tarball_writer(manifest.fingerprint(), None)(second)
+    self.assertEquals(first.getvalue(), second.getvalue())
+
+
+  def test_go_extras_are_reused_until_dependencies_change(self):
+    goroot = os.path.join(self.workdir, 'goroot')
+    gopath = os.path.join(self.workdir, 'gopath')
+    os.makedirs(os.path.join(goroot, 'bin'))
+    os.makedirs(os.path.join(gopath, 'src', 'util'))
+    with open(os.path.join(goroot, 'bin', 'go-app-builder'), 'w') as gab:
+      gab.write('builder')
+    dependency = os.path.join(gopath, 'src', 'util', 'util.go')
+    with open(dependency, 'w') as dependency_file:
+      dependency_file.write('package util\n')
+    self.write_file('main.go', 'package main\n')
+
+    flexmock(os).should_receive('getenv').with_args('GOROOT', None).\
+      and_return(goroot)
+    flexmock(os).should_receive('getenv').with_args('GOPATH', None).\
+      and_return(gopath)
+    builder = flexmock(subprocess).should_receive('check_output').\
+      and_return('util/util.go|{0}\n'.format(dependency)).once()
+    expected = {'gopath/src/util/util.go': dependency}
+    self.assertEquals(expected, LocalState.get_extra_go_dependencies(
+      self.app_dir, True, cache=self.cache))
+
+    # unchanged sources and dependencies shouldn't need the builder
+    self.assertEquals(expected, LocalState.get_extra_go_dependencies(
+      self.app_dir, True, cache=self.cache))
+
+    # a new file in a dependency's package should be noticed
+    with open(os.path.join(gopath, 'src', 'util', 'more.go'), 'w') as more:
+      more.write('package util\n')
+    os.utime(os.path.dirname(dependency), (0, 0))
+    builder.twice()
+    LocalState.get_extra_go_dependencies(self.app_dir, True, cache=self.cache)
+
+
+  def test_least_recently_used_artifacts_are_evicted(self):
+    self.cache.max_size = 25
+    for index, name in enumerate(['a', 'b', 'c']):
+      self.cache.tarball_writer(name, lambda fileobj: fileobj.write('x' * 10))(
+        StringIO())
+      os.utime(self.cache.path(AppCache.TARBALLS, name), (index, index))
+
+    # the oldest tarball should have been evicted to make room for the
+    # third, and using the next oldest should keep it around
+    self.assertEquals(None, self.cache.lookup(AppCache.TARBALLS, 'a'))
+    self.assertNotEquals(None, self.cache.lookup(AppCache.TARBALLS, 'b'))
+    self.cache.tarball_writer('d', lambda fileobj: fileobj.write('x' * 10))(
+      StringIO())
+    self.assertEquals(None, self.cache.lookup(AppCache.TARBALLS, 'c'))
+    self.assertEquals(['b', 'd'], sorted(os.listdir(
+      os.path.join(self.cache.directory, AppCache.TARBALLS))))
+
+
+if __name__ == "__main__":
+  unittest.main()
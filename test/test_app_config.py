@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import sys
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_config import AppConfig
+from appscale.tools.appengine_helper import AppEngineHelper
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppConfig(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppConfig, self).setUp()
+    self.app_yaml = self.write_file('app.yaml',
+      'application: guestbook\nruntime: python27\nthreadsafe: true\n'
+      'skip_files:\n- ^tests/.*$\n'
+      'handlers:\n- url: /.*\n  script: main.app\n')
+
+
+  def test_app_yaml(self):
+    config = AppConfig.load(self.app_yaml)
+    self.assertEquals('guestbook', config.app_id)
+    self.assertEquals('python27', config.runtime)
+    self.assertEquals(True, config.threadsafe)
+    self.assertEquals(['^tests/.*$'], config.skip_files)
+    self.assertEquals([{'url': '/.*', 'script': 'main.app'}], config.handlers)
+
+
+  def test_appengine_web_xml(self):
+    appengine_web_xml = self.write_file('appengine-web.xml',
+      '<appengine-web-app>\n<application>guestbook</application>\n'
+      '<threadsafe>false</threadsafe>\n</appengine-web-app>\n')
+    config = AppConfig.load(appengine_web_xml)
+    self.assertEquals('guestbook', config.app_id)
+    self.assertEquals('java', config.runtime)
+    self.assertEquals('false', config.threadsafe)
+    self.assertEquals(None, config.skip_files)
+
+
+  def test_config_is_read_once(self):
+    self.assertEquals('guestbook',
+                      AppEngineHelper.get_app_id_from_app_config(self.app_dir))
+
+    # the helpers should share the settings that were already read
+    builtins = flexmock(sys.modules['__builtin__'])
+    builtins.should_call('open')
+    builtins.should_receive('open').with_args(self.app_yaml, 'r').never()
+    self.assertEquals('python27',
+      AppEngineHelper.get_app_runtime_from_app_config(self.app_dir))
+    self.assertEquals(True, AppEngineHelper.is_threadsafe(self.app_dir))
+
+
+  def test_changed_config_is_read_again(self):
+    first = AppConfig.load(self.app_yaml)
+    self.write_file('app.yaml', 'application: guestbook2\n'
+                    'runtime: go\n')
+    os.utime(self.app_yaml, (0, 0))
+    second = AppConfig.load(self.app_yaml)
+    self.assertEquals('guestbook', first.app_id)
+    self.assertEquals('guestbook2', second.app_id)
+    self.assertEquals(None, second.threadsafe)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_index import AppIndex
+from appscale.tools.app_manifest import AppManifest
+from appscale.tools.app_scanner import AppScanner
+from appscale.tools.appengine_helper import AppEngineHelper
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppIndex(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppIndex, self).setUp()
+    self.write_file('war/WEB-INF/appengine-web.xml',
+                    '<application>guestbook</application>\n'
+                    '<threadsafe>true</threadsafe>\n')
+    self.write_file('war/WEB-INF/lib/appengine-api-1.0-sdk-{0}.jar'.format(
+      AppEngineHelper.SUPPORTED_SDK_VERSION), '')
+    self.write_file('src/main.go', '')
+    self.write_file('src/lib/util.go', '')
+    self.write_file('.git/lib/hooks.go', '')
+
+
+  def test_lookups(self):
+    index = AppIndex(self.app_dir)
+    self.assertEquals(
+      os.path.join(self.app_dir, 'war/WEB-INF/appengine-web.xml'),
+      index.find_file(AppEngineHelper.APPENGINE_WEB_XML))
+    self.assertEquals(None, index.find_file('app.yaml'))
+    self.assertEquals([os.path.join(self.app_dir, 'src/lib'),
+                       os.path.join(self.app_dir, 'war/WEB-INF/lib')],
+                      index.find_directories('lib'))
+    self.assertEquals(['src/lib/util.go', 'src/main.go'],
+                      index.match_files('*.go'))
+
+
+  def test_helpers_share_one_walk(self):
+    index = AppIndex(self.app_dir)
+
+    # once the index is built, the helpers and the manifest shouldn't list
+    # any directories again
+    flexmock(AppScanner).should_receive('list_directory').never()
+    self.assertEquals('guestbook', AppEngineHelper.get_app_id_from_app_config(
+      self.app_dir, index))
+    self.assertEquals('java', AppEngineHelper.get_app_runtime_from_app_config(
+      self.app_dir, index))
+    self.assertEquals(True, AppEngineHelper.is_threadsafe(self.app_dir, index))
+    self.assertEquals(False, AppEngineHelper.is_sdk_mismatch(self.app_dir,
+                                                             index))
+    manifest = AppManifest.from_directory(self.app_dir, index=index)
+    self.assertEquals(sorted(['src/main.go', 'src/lib/util.go',
+                              'war/WEB-INF/appengine-web.xml',
+                              'war/WEB-INF/lib/appengine-api-1.0-sdk-{0}.jar'
+                              .format(AppEngineHelper.SUPPORTED_SDK_VERSION)]),
+                      sorted(manifest.files))
+
+
+if __name__ == "__main__":
+  unittest.main()
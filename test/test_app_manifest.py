@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import unittest
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_manifest import AppManifest
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppManifest(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppManifest, self).setUp()
+    self.login_dir = os.path.join(self.workdir, 'login')
+    self.write_file('app.yaml', 'runtime: python27\n')
+    self.write_file('main.py', 'print "hello"\n')
+    self.write_file('static/copy.py', 'print "hello"\n')
+    self.write_file('main.pyc', 'compiled')
+
+
+  def run_script(self, script, *args):
+    process = subprocess.Popen([sys.executable, '-'] + list(args),
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output = process.communicate(script)[0]
+    return process.returncode, output
+
+
+  def upload(self, manifest):
+    """ Does what RemoteHelper.copy_app_changes does, with the login node's
+    directories on the local filesystem. """
+    store = os.path.join(self.login_dir, 'contents')
+    stored_manifest = os.path.join(self.login_dir, 'manifests', 'app.json')
+    app_tar = os.path.join(self.login_dir, 'app.tar.gz')
+
+    _, output = self.run_script(AppManifest.STORED_ENTRIES_SCRIPT,
+                                stored_manifest, store)
+    stored_entries = json.loads(output) if output else None
+    missing = manifest.missing_from(stored_entries)
+
+    upload_path = os.path.join(self.workdir, 'upload.tar.gz')
+    with open(upload_path, 'wb') as upload:
+      manifest.write_upload(upload, missing)
+    script = AppManifest.REBUILD_SCRIPT.format(
+      manifest_member=AppManifest.MANIFEST_MEMBER,
+      block_size=AppManifest.HASH_BLOCK_SIZE,
+      missing_contents=AppManifest.MISSING_CONTENTS,
+      prune_age=AppManifest.PRUNE_AGE)
+    status, _ = self.run_script(script, upload_path, store, stored_manifest,
+                                app_tar)
+    return status, missing, app_tar
+
+
+  def test_collect_files_skips_compiled_python(self):
+    files = AppManifest.collect_files(self.app_dir, {'extra.py': '/tmp/x.py'})
+    self.assertEquals(['./app.yaml', './main.py', 'extra.py',
+                       'static/copy.py'], sorted(files))
+
+
+  def test_write_tarball(self):
+    manifest = AppManifest.from_directory(self.app_dir)
+    app_tar = os.path.join(self.workdir, 'app.tar.gz')
+    with open(app_tar, 'wb') as fileobj:
+      manifest.write_tarball(fileobj)
+
+    with tarfile.open(app_tar) as tar:
+      self.assertEquals(['./app.yaml', './main.py', 'static/copy.py'],
+                        tar.getnames())
+
+
+  def test_missing_from(self):
+    manifest = AppManifest.from_directory(self.app_dir)
+    self.assertEquals(2, len(manifest.missing_from(None)))
+
+    # files with the same contents only need to be sent once
+    stored_entries = {'./app.yaml': manifest.entries['./app.yaml']}
+    missing = manifest.missing_from(stored_entries)
+    self.assertEquals([manifest.entries['./main.py']['hash']], missing.keys())
+
+
+  def test_rebuild_from_changes(self):
+    status, missing, app_tar = self.upload(
+      AppManifest.from_directory(self.app_dir))
+    self.assertEquals(0, status)
+    self.assertEquals(2, len(missing))
+
+    # a redeploy should only send the contents that changed
+    self.write_file('main.py', 'print "goodbye"\n')
+    manifest = AppManifest.from_directory(self.app_dir)
+    status, missing, app_tar = self.upload(manifest)
+    self.assertEquals(0, status)
+    self.assertEquals([manifest.entries['./main.py']['hash']], missing.keys())
+
+    with tarfile.open(app_tar) as tar:
+      self.assertEquals(['./app.yaml', './main.py', 'static/copy.py'],
+                        tar.getnames())
+      self.assertEquals('print "goodbye"\n',
+                        tar.extractfile('./main.py').read())
+      self.assertEquals('print "hello"\n',
+                        tar.extractfile('static/copy.py').read())
+
+    # and leave no temporary files behind
+    for directory, _, filenames in os.walk(self.login_dir):
+      self.assertEquals([], [name for name in filenames
+                             if name.endswith('.new')])
+
+
+  def test_rebuild_with_missing_contents(self):
+    manifest = AppManifest.from_directory(self.app_dir)
+    self.upload(manifest)
+
+    # contents that disappeared from the store should be sent again
+    store = os.path.join(self.login_dir, 'contents')
+    os.remove(os.path.join(store, manifest.entries['./main.py']['hash']))
+    status, missing, _ = self.upload(manifest)
+    self.assertEquals(0, status)
+    self.assertEquals([manifest.entries['./main.py']['hash']], missing.keys())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import gzip
+import os
+import tarfile
+import unittest
+from StringIO import StringIO
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_packager import AppPackager
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppPackager(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppPackager, self).setUp()
+    self.files = {}
+    for index in range(20):
+      path = 'module{0}.py'.format(index)
+      self.files[path] = self.write_file(
+        path, 'print "hello {0}"\n'.format(index) * 5000)
+    self.files['lib/library.jar'] = self.write_file(
+      'lib/library.jar', os.urandom(300 * 1024))
+
+
+  def package(self, packager):
+    archive = StringIO()
+    packager.write_files(archive, self.files)
+    return archive.getvalue()
+
+
+  def assert_archive_has_files(self, archive, mode):
+    with tarfile.open(fileobj=StringIO(archive), mode=mode) as tar:
+      self.assertEquals(sorted(self.files), tar.getnames())
+      for path, local_path in self.files.iteritems():
+        with open(local_path, 'rb') as local_file:
+          self.assertEquals(local_file.read(), tar.extractfile(path).read())
+
+
+  def test_parallel_gzip_is_gzip_compatible(self):
+    archive = self.package(AppPackager(workers=4))
+    self.assert_archive_has_files(archive, 'r:gz')
+
+    # the stream should also pass gzip's length and checksum verification
+    uncompressed = gzip.GzipFile(fileobj=StringIO(archive)).read()
+    self.assertEquals(0, len(uncompressed) % tarfile.RECORDSIZE)
+
+
+  def test_single_worker_matches_parallel_output(self):
+    # blocks are compressed independently, so the thread count shouldn't
+    # change the result
+    single = self.package(AppPackager(workers=1))
+    parallel = self.package(AppPackager(workers=4))
+    self.assertEquals(single, parallel)
+
+
+  def test_compressed_files_are_stored(self):
+    # the jar's random contents can't shrink, so storing it should cost
+    # only a few bytes per block of overhead
+    self.files = {'lib/library.jar': self.files['lib/library.jar']}
+    archive = self.package(AppPackager(level=9))
+    self.assertTrue(len(archive) < 300 * 1024 + 2048)
+    self.assertTrue(AppPackager.is_compressed('images/LOGO.PNG'))
+    self.assertFalse(AppPackager.is_compressed('main.py'))
+
+
+  def test_bzip2(self):
+    archive = self.package(AppPackager(AppPackager.BZIP2, level=1))
+    self.assert_archive_has_files(archive, 'r:bz2')
+
+
+  def test_bad_settings(self):
+    self.assertRaises(ValueError, AppPackager, 'lzma')
+    self.assertRaises(ValueError, AppPackager, AppPackager.GZIP, 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_scanner import AppScanner
+from appscale.tools.custom_exceptions import AppEngineConfigException
+
+
+# Helpers shared by the tests
+from app_dir_test_case import AppDirTestCase
+
+
+class TestAppScanner(AppDirTestCase):
+
+
+  def setUp(self):
+    super(TestAppScanner, self).setUp()
+    self.write_file('app.yaml', 'runtime: python27\n')
+    self.write_file('main.py', '')
+    self.write_file('main.pyc', '')
+    self.write_file('.git/config', '')
+    self.write_file('node_modules/left-pad/index.js', '')
+    self.write_file('static/logo.png', '')
+    self.write_file('static/build/bundle.js', '')
+    self.write_file('docs/notes.txt', '')
+
+
+  def scan(self):
+    return [relative_path for relative_path, _ in
+            AppScanner(self.app_dir).iter_files()]
+
+
+  def test_default_ignores(self):
+    self.assertEquals(['app.yaml', 'main.py', 'docs/notes.txt',
+                       'static/logo.png', 'static/build/bundle.js'],
+                      self.scan())
+
+
+  def test_ignore_file(self):
+    self.write_file(AppScanner.IGNORE_FILE,
+                    '# generated files\n/static/build/\n*.txt\n!notes.txt\n'
+                    'static/*.png\n')
+    self.assertEquals(['app.yaml', 'main.py', 'docs/notes.txt'], self.scan())
+
+
+  def test_wildcards_stay_in_one_directory(self):
+    self.write_file('static/build/sprite.png', '')
+    self.write_file('docs/api/index.txt', '')
+
+    # like in .gitignore, '*' doesn't match a '/', and '**' matches any
+    # number of directories
+    self.write_file(AppScanner.IGNORE_FILE, 'static/*.png\ndocs/**/*.txt\n')
+    self.assertEquals(['app.yaml', 'main.py', 'static/build/bundle.js',
+                       'static/build/sprite.png'], self.scan())
+
+
+  def test_skip_files(self):
+    self.write_file('app.yaml',
+                    'runtime: python27\nskip_files: ^docs/.*$\n')
+    self.assertNotIn('docs/notes.txt', self.scan())
+
+    self.write_file('app.yaml', 'runtime: python27\nskip_files:\n'
+                    '- ^static/build$\n- .*\\.png\n')
+    self.assertEquals(['app.yaml', 'main.py', 'docs/notes.txt'], self.scan())
+
+    self.write_file('app.yaml', 'runtime: python27\nskip_files: ^(docs\n')
+    self.assertRaises(AppEngineConfigException, AppScanner, self.app_dir)
+
+
+  def test_ignored_directories_are_not_listed(self):
+    listed = []
+    list_directory = AppScanner.list_directory
+    def record(directory):
+      listed.append(os.path.relpath(directory, self.app_dir))
+      return list_directory(directory)
+
+    flexmock(AppScanner).should_receive('list_directory').replace_with(record)
+    self.scan()
+    self.assertEquals(['.', 'docs', 'static', 'static/build'], listed)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 
+import socket
+import ssl
+import threading
+import time
 import unittest
 
 from appscale.tools.appcontroller_client import AppControllerClient
+from appscale.tools.custom_exceptions import AppControllerException
 from flexmock import flexmock
 
 
@@ -36,3 +41,71 @@ class TestAppControllerClient(unittest.TestCase):
       .and_return()
     acc = AppControllerClient(host, secret)
     acc.get_deployment_id()
+
+  def test_run_with_timeout_from_threads(self):
+    acc = AppControllerClient('boo', 'baz')
+    release = threading.Event()
+
+    # Calls that miss their deadline should give the default, even when made
+    # from threads other than the main one.
+    results = []
+    def call():
+      results.append(acc.run_with_timeout(0.1, 'default', 0, release.wait))
+    callers = [threading.Thread(target=call) for _ in range(3)]
+    for caller in callers:
+      caller.start()
+    for caller in callers:
+      caller.join()
+    release.set()
+    self.assertEqual(['default'] * 3, results)
+
+  def test_run_with_timeout_retries(self):
+    flexmock(time).should_receive('sleep').and_return()
+    acc = AppControllerClient('boo', 'baz')
+
+    # Socket errors should be retried up to the given number of times.
+    fake_function = flexmock(name='function')
+    fake_function.should_receive('call').and_raise(socket.error)\
+      .and_return('ok')
+    self.assertEqual('ok', acc.run_with_timeout(1, 'default', 1,
+      fake_function.call))
+
+    fake_function.should_receive('call').and_raise(socket.error).times(2)
+    self.assertRaises(AppControllerException, acc.run_with_timeout, 1,
+      'default', 1, fake_function.call)
+
+    # SSL errors should be retried, but not forever.
+    fake_function.should_receive('call').and_raise(ssl.SSLError)\
+      .times(AppControllerClient.MAX_SSL_RETRIES + 1)
+    self.assertRaises(AppControllerException, acc.run_with_timeout, 1,
+      'default', 0, fake_function.call)
+
+  def test_read_only_calls_are_cached(self):
+    fake_server = flexmock(name='fake_server')
+    fake_server.should_receive('get_role_info').with_args('baz')\
+      .and_return('[]').once()
+    fake_server.should_receive('get_property').with_args('.*', 'baz')\
+      .and_return('{"a": "b"}').twice()
+    fake_server.should_receive('set_property').with_args('a', 'c', 'baz')\
+      .and_return('OK').once()
+    acc = AppControllerClient('boo', 'baz')
+    acc.server = fake_server
+
+    self.assertEqual([], acc.get_role_info())
+    self.assertEqual([], acc.get_role_info())
+
+    # changing a property should make the next query go to the AppController
+    self.assertEqual({'a': 'b'}, acc.get_property('.*'))
+    self.assertEqual({'a': 'b'}, acc.get_property('.*'))
+    acc.set_property('a', 'c')
+    self.assertEqual({'a': 'b'}, acc.get_property('.*'))
+
+  def test_defaults_are_not_cached(self):
+    fake_server = flexmock(name='fake_server')
+    fake_server.should_receive('get_all_public_ips').and_return('')\
+      .and_return('["public1"]').twice()
+    acc = AppControllerClient('boo', 'baz')
+    acc.server = fake_server
+
+    self.assertEqual([], acc.get_all_public_ips())
+    self.assertEqual(['public1'], acc.get_all_public_ips())
@@ -504,6 +504,31 @@ class TestAppScale(unittest.TestCase):
     self.assertEquals(fake_port, port)
 
 
+  def testDeployAppsWithCloudAppScalefile(self):
+    # calling 'appscale deploy app1 app2' should upload both apps with
+    # a single 'appscale-upload-app' command
+    appscale = AppScale()
+    contents = {
+      'infrastructure' : 'ec2',
+      'keyname' : 'bookey',
+      'min' : 1,
+      'max' : 1
+    }
+    self.addMockForAppScalefile(appscale, yaml.dump(contents))
+
+    apps = ['/bar/app1', '/bar/app2']
+    def upload_apps(options):
+      self.assertEquals(apps, options.files)
+      self.assertEquals(4, options.parallel)
+      self.assertEquals('bookey', options.keyname)
+      return {app: ('fake_host', 8080) for app in apps}
+    flexmock(AppScaleTools).should_receive('upload_apps').\
+      replace_with(upload_apps).once()
+    self.assertEquals({'/bar/app1': ('fake_host', 8080),
+                       '/bar/app2': ('fake_host', 8080)},
+                      appscale.deploy_apps(apps, parallel=4))
+
+
   def testUndeployWithNoAppScalefile(self):
     # calling 'appscale undeploy' with no AppScalefile in the local
     # directory should throw up and die
@@ -91,6 +91,8 @@ appengine:  public3
   def test_appscale_with_ips_layout_flag_and_success(self):
     # assume that ssh is running on each machine
     fake_socket = flexmock(name='socket')
+    fake_socket.should_receive('settimeout').with_args(float)
+    fake_socket.should_receive('close')
     fake_socket.should_receive('connect').with_args(('1.2.3.4', 22)) \
       .and_return(None)
     fake_socket.should_receive('connect').with_args(('1.2.3.5', 22)) \
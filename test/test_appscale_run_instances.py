@@ -31,9 +31,17 @@ from appscale.tools.local_state import APPSCALE_VERSION
 from appscale.tools.local_state import LocalState
 from appscale.tools.parse_args import ParseArgs
 from appscale.tools.remote_helper import RemoteHelper
+from appscale.tools.retry_policy import RetryPolicy
 from appscale.tools.custom_exceptions import BadConfigurationException
 
 
+def script_output(num_steps):
+  """Returns the output that a script started by RemoteHelper.run_script
+  produces when all of its steps succeed."""
+  return '\n'.join('{0} {1} 0'.format(RemoteHelper.SCRIPT_STEP_MARKER, index)
+                   for index in range(num_steps))
+
+
 class TestAppScaleRunInstances(unittest.TestCase):
 
 
@@ -193,7 +201,9 @@ group: {1}
   def setup_appscale_compatibility_mocks(self):
     # Assume the config directory exists.
     self.local_state.should_receive('shell').with_args(re.compile('ssh'),
-      False, 5, stdin=re.compile(RemoteHelper.CONFIG_DIR)).and_return()
+      False, RetryPolicy, stdin=re.compile('^ls {}'.format(
+        RemoteHelper.CONFIG_DIR))
+    ).and_return()
 
     flexmock(RemoteHelper)
     RemoteHelper.should_receive('get_host_appscale_version').\
@@ -203,7 +213,7 @@ group: {1}
     db_file = '{}/{}/{}'.\
       format(RemoteHelper.CONFIG_DIR, APPSCALE_VERSION, 'cassandra')
     self.local_state.should_receive('shell').with_args(re.compile('ssh'),
-      False, 5, stdin=re.compile(db_file))
+      False, RetryPolicy, stdin=re.compile(db_file))
 
 
   def setup_appcontroller_mocks(self, public_ip, private_ip):
@@ -245,6 +255,8 @@ group: {1}
   def setup_socket_mocks(self, host):
     # assume that ssh comes up on the third attempt
     fake_socket = flexmock(name='fake_socket')
+    fake_socket.should_receive('settimeout').with_args(float)
+    fake_socket.should_receive('close')
     fake_socket.should_receive('connect').with_args((host,
       RemoteHelper.SSH_PORT)).and_raise(Exception).and_raise(Exception) \
       .and_return(None)
@@ -321,8 +333,11 @@ group: {1}
     flexmock(LocalState).should_receive('update_local_metadata')
 
     # mock out copying over the keys
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^scp .*.key'),False,5)
+    flexmock(RemoteHelper).should_receive('build_bundle').and_return('bundle')
+    self.local_state.should_receive('shell').with_args(
+      re.compile('ssh'), False, 5,
+      stdin=re.compile('mv -f "/root/.ssh/id_rsa.new" "/root/.ssh/id_rsa"')
+    ).and_return(script_output(3))
 
     self.setup_appscale_compatibility_mocks()
 
@@ -331,18 +346,12 @@ group: {1}
       .with_args(re.compile('^openssl'),False,stdin=None)\
       .and_return()
 
-    # mock out removing the old json file
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^ssh'),False,5,stdin=re.compile('rm -rf'))\
-      .and_return()
-
-    # assume that we started monit fine
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^ssh'),False,5,stdin=re.compile('monit'))\
-      .and_return()
-
+    # assume that we removed the old state and started monit and the
+    # AppController fine
     self.local_state.should_receive('shell').with_args(
-      re.compile('^ssh'), False, 5, stdin='service appscale-controller start')
+      re.compile('^ssh'), False, 5,
+      stdin=re.compile('(?s)rm -rf.*monit.*service appscale-controller start')
+    ).and_return(script_output(4))
 
     self.local_state.should_receive('shell').\
       with_args('ssh -i /root/.appscale/boobazblargfoo.key -o LogLevel=quiet '
@@ -362,28 +371,10 @@ group: {1}
         "jobs": ["shadow", "login"]
       }])))
 
-    # Assume the locations files were copied successfully.
-    locations_file = '{}/locations-bookey.yaml'.\
-      format(RemoteHelper.CONFIG_DIR)
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^scp .*{}'.format(locations_file)), False, 5)\
-      .and_return()
-
-    locations_json = '{}/locations-bookey.json'.\
-      format(RemoteHelper.CONFIG_DIR)
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^scp .*{}'.format(locations_json)), False, 5)\
-      .and_return()
-
-    user_locations = '/root/.appscale/locations-bookey.json'
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^scp .*{}'.format(user_locations)), False, 5)\
-      .and_return()
-
-    # Assume the secret key was copied successfully.
-    self.local_state.should_receive('shell')\
-      .with_args(re.compile('^scp .*.secret'), False, 5)\
-      .and_return()
+    # copying over the locations json file and the secret key should be fine
+    self.local_state.should_receive('shell').with_args(re.compile('ssh'),
+      False, 5, stdin=re.compile('locations-{0}.json.new'.format(self.keyname))
+    ).and_return(script_output(3))
 
     flexmock(AppControllerClient)
     AppControllerClient.should_receive('does_user_exist').and_return(True)
@@ -464,40 +455,15 @@ appengine:  1.2.3.4
     # assume that we can enable root login
     self.local_state.should_receive('shell').with_args(
       re.compile('ssh'), False, 5,
-      stdin='sudo touch /root/.ssh/authorized_keys').and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5,
-      stdin='sudo chmod 600 /root/.ssh/authorized_keys').and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5, stdin='mktemp').and_return()
+      stdin=re.compile('sudo touch /root/.ssh/authorized_keys')
+    ).and_return(script_output(6))
 
+    # and assume that we can copy over our ssh keys fine
+    flexmock(RemoteHelper).should_receive('build_bundle').and_return('bundle')
     self.local_state.should_receive('shell').with_args(
       re.compile('ssh'), False, 5,
-      stdin=re.compile(
-        'sudo sort -u ~/.ssh/authorized_keys /root/.ssh/authorized_keys -o '
-      )
-    ).and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5,
-      stdin=re.compile(
-        'sudo sed -n '
-        '\'\/\.\*Please login\/d; w\/root\/\.ssh\/authorized_keys\' '
-      )
-    ).and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5, stdin=re.compile('rm -f ')
-    ).and_return()
-
-    # and assume that we can copy over our ssh keys fine
-    self.local_state.should_receive('shell').\
-      with_args(re.compile('scp .*[r|d]sa'), False, 5).and_return()
-    self.local_state.should_receive('shell').\
-      with_args(re.compile('scp .*{0}'.format(self.keyname)), False, 5).\
-      and_return()
+      stdin=re.compile('mv -f "/root/.ssh/id_rsa.new" "/root/.ssh/id_rsa"')
+    ).and_return(script_output(3))
 
     self.local_state.should_receive('shell').\
       with_args('ssh -i /root/.appscale/bookey.key -o LogLevel=quiet -o '
@@ -530,12 +496,12 @@ appengine:  1.2.3.4
     self.local_state.should_receive('shell').with_args(re.compile('openssl'),
       False, stdin=None)
 
-    # assume that we started monit fine
-    self.local_state.should_receive('shell').with_args(re.compile('ssh'),
-      False, 5, stdin=re.compile('monit'))
-
+    # assume that we removed the old state and started monit and the
+    # AppController fine
     self.local_state.should_receive('shell').with_args(
-      re.compile('^ssh'), False, 5, stdin='service appscale-controller start')
+      re.compile('^ssh'), False, 5,
+      stdin=re.compile('(?s)rm -rf.*monit.*service appscale-controller start')
+    ).and_return(script_output(4))
 
     self.setup_socket_mocks('elastic-ip')
     self.setup_appcontroller_mocks('elastic-ip', 'private1')
@@ -548,13 +514,10 @@ appengine:  1.2.3.4
         "jobs": ["shadow", "login"]
       }])))
 
-    # copying over the locations yaml and json files should be fine
-    self.local_state.should_receive('shell').with_args(re.compile('scp'),
-      False, 5, stdin=re.compile('locations-{0}'.format(self.keyname)))
-
-    # same for the secret key
-    self.local_state.should_receive('shell').with_args(re.compile('scp'),
-      False, 5, stdin=re.compile('{0}.secret'.format(self.keyname)))
+    # copying over the locations json file and the secret key should be fine
+    self.local_state.should_receive('shell').with_args(re.compile('ssh'),
+      False, 5, stdin=re.compile('locations-{0}.json.new'.format(self.keyname))
+    ).and_return(script_output(3))
 
     flexmock(RemoteHelper).should_receive('copy_deployment_credentials')
     flexmock(AppControllerClient)
@@ -647,39 +610,15 @@ appengine:  1.2.3.4
     # assume that we can enable root login
     self.local_state.should_receive('shell').with_args(
       re.compile('ssh'), False, 5,
-      stdin='sudo touch /root/.ssh/authorized_keys').and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5,
-      stdin='sudo chmod 600 /root/.ssh/authorized_keys').and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5, stdin='mktemp').and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5,
-      stdin=re.compile(
-        'sudo sort -u ~/.ssh/authorized_keys /root/.ssh/authorized_keys -o '
-      )
-    ).and_return()
+      stdin=re.compile('sudo touch /root/.ssh/authorized_keys')
+    ).and_return(script_output(6))
 
+    # and assume that we can copy over our ssh keys fine
+    flexmock(RemoteHelper).should_receive('build_bundle').and_return('bundle')
     self.local_state.should_receive('shell').with_args(
       re.compile('ssh'), False, 5,
-      stdin=re.compile(
-        'sudo sed -n '
-        '\'\/\.\*Please login\/d; w\/root\/\.ssh\/authorized_keys\' '
-      )
-    ).and_return()
-
-    self.local_state.should_receive('shell').with_args(
-      re.compile('ssh'), False, 5, stdin=re.compile('rm -f ')
-    ).and_return()
-
-    # and assume that we can copy over our ssh keys fine
-    self.local_state.should_receive('shell').with_args(re.compile('scp .*[r|d]sa'),
-      False, 5).and_return()
-    self.local_state.should_receive('shell').with_args(re.compile('scp .*{0}'
-      .format(self.keyname)), False, 5).and_return()
+      stdin=re.compile('mv -f "/root/.ssh/id_rsa.new" "/root/.ssh/id_rsa"')
+    ).and_return(script_output(3))
 
     self.setup_appscale_compatibility_mocks()
 
@@ -687,12 +626,12 @@ appengine:  1.2.3.4
     self.local_state.should_receive('shell').with_args(re.compile('openssl'),
       False, stdin=None)
 
-    # assume that we started monit fine
-    self.local_state.should_receive('shell').with_args(re.compile('ssh'),
-      False, 5, stdin=re.compile('monit'))
-
+    # assume that we removed the old state and started monit and the
+    # AppController fine
     self.local_state.should_receive('shell').with_args(
-      re.compile('^ssh'), False, 5, stdin='service appscale-controller start')
+      re.compile('^ssh'), False, 5,
+      stdin=re.compile('(?s)rm -rf.*monit.*service appscale-controller start')
+    ).and_return(script_output(4))
 
     self.setup_socket_mocks('public1')
     self.setup_appcontroller_mocks('public1', 'private1')
@@ -705,13 +644,10 @@ appengine:  1.2.3.4
         "jobs" : ["shadow", "login"]
       }])))
 
-    # copying over the locations json file should be fine
-    self.local_state.should_receive('shell').with_args(re.compile('scp'),
-      False, 5, stdin=re.compile('locations-{0}'.format(self.keyname)))
-
-    # same for the secret key
-    self.local_state.should_receive('shell').with_args(re.compile('scp'),
-      False, 5, stdin=re.compile('{0}.secret'.format(self.keyname)))
+    # copying over the locations json file and the secret key should be fine
+    self.local_state.should_receive('shell').with_args(re.compile('ssh'),
+      False, 5, stdin=re.compile('locations-{0}.json.new'.format(self.keyname))
+    ).and_return(script_output(3))
 
     self.local_state.should_receive('shell').with_args('ssh -i /root/.appscale/boobazbargfoo.key -o LogLevel=quiet -o NumberOfPasswordPrompts=0 -o StrictHostkeyChecking=no -o UserKnownHostsFile=/dev/null root@public1 ', False, 5, stdin='cp /root/appscale/AppController/scripts/appcontroller /etc/init.d/').and_return()
 
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import re
+import time
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.appscale_logger import AppScaleLogger
+from appscale.tools.appscale_tools import AppScaleTools
+from appscale.tools.custom_exceptions import ShellException
+from appscale.tools.local_state import LocalState
+
+
+class TestAppScaleUpgrade(unittest.TestCase):
+
+
+  def setUp(self):
+    self.keyname = "boobazblargfoo"
+    self.options = flexmock(keyname=self.keyname, verbose=False)
+
+    # mock out any writing to stdout
+    flexmock(AppScaleLogger)
+    AppScaleLogger.should_receive('log').and_return()
+    AppScaleLogger.should_receive('success').and_return()
+    AppScaleLogger.should_receive('warn').and_return()
+    AppScaleLogger.should_receive('verbose').and_return()
+
+    # mock out all sleeping
+    flexmock(time)
+    time.should_receive('sleep').and_return()
+
+
+  def test_run_bootstrap_logs_in_as_root_with_retries(self):
+    # The bootstrap script should be run as root, and retried as often as
+    # other remote commands are.
+    flexmock(LocalState)
+    LocalState.should_receive('stream_shell').with_args(
+      re.compile(r'^ssh .* root@1\.2\.3\.4 bash$'), False,
+      LocalState.DEFAULT_NUM_RETRIES, stdin=AppScaleTools.BOOTSTRAP_CMD,
+      prefix='1.2.3.4', timestamps=True).and_return(iter(['done'])).once()
+
+    error_ips = []
+    AppScaleTools.run_bootstrap('1.2.3.4', self.options, error_ips)
+    self.assertEqual([], error_ips)
+
+
+  def test_run_bootstrap_records_failures(self):
+    flexmock(LocalState)
+    LocalState.should_receive('stream_shell').and_raise(ShellException)
+
+    error_ips = []
+    AppScaleTools.run_bootstrap('1.2.3.4', self.options, error_ips)
+    self.assertEqual(['1.2.3.4'], error_ips)
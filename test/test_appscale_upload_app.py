@@ -3,13 +3,16 @@
 
 # General-purpose Python library imports
 import os
+import re
 import shutil
 import sys
+import tarfile
 import tempfile
 import time
 import unittest
 import uuid
 import yaml
+from StringIO import StringIO
 
 
 # Third party libraries
@@ -19,10 +22,14 @@ from flexmock import flexmock
 # AppScale import, the library that we're testing here
 from appscale.tools.admin_client import AdminClient
 from appscale.tools.admin_client import AdminError
+from appscale.tools.app_cache import AppCache
+from appscale.tools.app_packager import AppPackager
 from appscale.tools.appengine_helper import AppEngineHelper
 from appscale.tools.appscale_logger import AppScaleLogger
 from appscale.tools.appscale_tools import AppScaleTools
+from appscale.tools.archived_app import ArchivedApp
 from appscale.tools.custom_exceptions import AppEngineConfigException
+from appscale.tools.custom_exceptions import AppScaleException
 from appscale.tools.local_state import LocalState
 from appscale.tools.parse_args import ParseArgs
 from appscale.tools.remote_helper import RemoteHelper
@@ -82,6 +89,16 @@ class TestAppScaleUploadApp(unittest.TestCase):
     self.assertRaises(SystemExit, ParseArgs, argv, self.function)
 
 
+  def test_upload_app_with_file_and_files_flags(self):
+    # --file and --files can't both say which apps to upload
+    argv = [
+      "--keyname", self.keyname,
+      "--file", "guestbook",
+      "--files", "guestbook", "blog"
+    ]
+    self.assertRaises(SystemExit, ParseArgs, argv, self.function)
+
+
   def test_upload_app_with_no_app_yaml_or_appengine_web_xml(self):
     # all app engine apps must have a config file - abort if we can't find one
 
@@ -283,19 +300,24 @@ class TestAppScaleUploadApp(unittest.TestCase):
 
   def test_upload_app(self):
     app_id = 'guestbook'
-    source_path = '{}.tar.gz'.format(app_id)
-    extracted_dir = '/tmp/{}'.format(app_id)
+    archive_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, archive_dir)
+    source_path = os.path.join(archive_dir, '{}.tar.gz'.format(app_id))
+    app_yaml = 'application: {}\nruntime: python27\n'.format(app_id)
+    with tarfile.open(source_path, 'w:gz') as tar:
+      info = tarfile.TarInfo('app.yaml')
+      info.size = len(app_yaml)
+      tar.addfile(info, StringIO(app_yaml))
     login_host = '192.168.33.10'
     secret = 'secret-key'
     operation_id = 'operation-1'
     port = 8080
     version_url = 'http://{}:{}'.format(login_host, port)
 
-    argv = ['--keyname', self.keyname, '--file', source_path, '--test']
+    argv = ['--keyname', self.keyname, '--file', source_path, '--test',
+            '--no-cache']
     options = ParseArgs(argv, self.function).args
 
-    flexmock(LocalState).should_receive('extract_tgz_app_to_dir').\
-      and_return('/tmp/{}'.format(app_id))
     flexmock(AppEngineHelper).should_receive('get_app_id_from_app_config').\
       and_return(app_id)
     flexmock(AppEngineHelper).\
@@ -305,14 +327,13 @@ class TestAppScaleUploadApp(unittest.TestCase):
     flexmock(LocalState).should_receive('get_login_host').\
       and_return(login_host)
     flexmock(LocalState).should_receive('get_secret_key').and_return(secret)
-    flexmock(RemoteHelper).should_receive('copy_app_to_host').\
-      with_args(extracted_dir, self.keyname, False, {}).\
+    flexmock(RemoteHelper).should_receive('copy_archive_to_host').\
+      with_args(ArchivedApp, app_id, self.keyname, False, AppPackager, None).\
       and_return(source_path)
     flexmock(AdminClient).should_receive('create_version').\
       and_return(operation_id)
     flexmock(AdminClient).should_receive('get_operation').\
       and_return({'done': True, 'response': {'versionUrl': version_url}})
-    flexmock(shutil).should_receive('rmtree').with_args(extracted_dir)
 
     given_host, given_port = AppScaleTools.upload_app(options)
     self.assertEquals(given_host, login_host)
@@ -331,8 +352,78 @@ class TestAppScaleUploadApp(unittest.TestCase):
     given_host, given_port = AppScaleTools.upload_app(options)
     self.assertEquals(given_host, login_host)
     self.assertEquals(given_port, port)
+
+
+  def test_upload_apps(self):
+    login_host = '192.168.33.10'
+    argv = ['--keyname', self.keyname, '--files', 'guestbook.tar.gz',
+            'broken.tar.gz', 'failing.tar.gz', '--parallel', '1', '--test']
+    options = ParseArgs(argv, self.function).args
+    self.assertEquals(1, options.parallel)
+
+    flexmock(LocalState).should_receive('get_login_host').\
+      and_return(login_host)
+    flexmock(LocalState).should_receive('get_secret_key').and_return('secret')
+    for app_id in ['guestbook', 'broken', 'failing']:
+      archive = flexmock(name='{}-archive'.format(app_id))
+      flexmock(AppScaleTools).should_receive('prepare_app').\
+        with_args('{}.tar.gz'.format(app_id), options, AppCache).\
+        and_return({'location': '{}.tar.gz'.format(app_id),
+                    'archive': archive, 'app_id': app_id,
+                    'language': 'python27', 'threadsafe': True,
+                    'extras': {}, 'index': None})
+      flexmock(RemoteHelper).should_receive('copy_archive_to_host').\
+        with_args(archive, app_id, self.keyname, False, AppPackager,
+                  AppCache).\
+        and_return('/opt/appscale/apps/{}.tar.gz'.format(app_id))
+
+    # one app deploys successfully, and the others are rejected by the
+    # AdminServer or fail to start without stopping the first one
+    flexmock(AdminClient).should_receive('create_version').\
+      with_args('guestbook', LocalState.DEFAULT_USER,
+                '/opt/appscale/apps/guestbook.tar.gz', 'python27', True).\
+      and_return('operation-1')
+    flexmock(AdminClient).should_receive('create_version').\
+      with_args('broken', LocalState.DEFAULT_USER,
+                '/opt/appscale/apps/broken.tar.gz', 'python27', True).\
+      and_raise(AdminError('Invalid app.yaml'))
+    flexmock(AdminClient).should_receive('create_version').\
+      with_args('failing', LocalState.DEFAULT_USER,
+                '/opt/appscale/apps/failing.tar.gz', 'python27', True).\
+      and_return('operation-3')
+    flexmock(AdminClient).should_receive('get_operation').\
+      with_args('guestbook', 'operation-1').\
+      and_return({'done': True,
+                  'response': {'versionUrl': 'http://{}:8080'.format(login_host)}})
+    flexmock(AdminClient).should_receive('get_operation').\
+      with_args('failing', 'operation-3').\
+      and_return({'done': True, 'error': {'message': 'Instances crashed'}})
+
+    # the operations in flight should be polled together
+    flexmock(AdminClient).should_call('wait_for_operations').once()
+    flexmock(AdminClient).should_receive('wait_for_operation').never()
+
+    # the summary table should report on every app
+    AppScaleLogger.should_receive('log').with_args(re.compile(
+      'guestbook +deployed.*http://192.168.33.10:8080\n'
+      'broken +failed.*Invalid app.yaml\n'
+      'failing +failed.*Instances crashed')).once()
+    self.assertRaises(AppScaleException, AppScaleTools.upload_apps, options)
  
  
+  def test_get_app_cache(self):
+    argv = ['--keyname', self.keyname, '--file', 'guestbook.tar.gz']
+    cache = AppScaleTools.get_app_cache(ParseArgs(argv, self.function).args)
+    self.assertFalse(cache.hash_contents)
+
+    # users who can't trust modification times can have contents hashed
+    options = ParseArgs(argv + ['--cache-hash-contents'], self.function).args
+    self.assertTrue(AppScaleTools.get_app_cache(options).hash_contents)
+
+    options = ParseArgs(argv + ['--no-cache'], self.function).args
+    self.assertEquals(None, AppScaleTools.get_app_cache(options))
+
+
   def test_java_bad_sdk_version(self):
     bad_jars = ['test.jar', 'appengine-api-1.0-sdk-1.7.3.jar']
     flexmock(os)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from StringIO import StringIO
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.app_packager import AppPackager
+from appscale.tools.appengine_helper import AppEngineHelper
+from appscale.tools.archived_app import ArchivedApp
+from appscale.tools.custom_exceptions import AppEngineConfigException
+
+
+class TestArchivedApp(unittest.TestCase):
+
+
+  def setUp(self):
+    self.workdir = tempfile.mkdtemp()
+    self.files = {
+      'app.yaml': 'application: guestbook\nruntime: python27\n'
+                  'threadsafe: true\n',
+      'main.py': 'print "hello"\n',
+      'static/logo.png': os.urandom(1024)
+    }
+
+
+  def tearDown(self):
+    shutil.rmtree(self.workdir)
+
+
+  def make_tar(self, name, prefix=''):
+    location = os.path.join(self.workdir, name)
+    with tarfile.open(location, 'w:gz') as tar:
+      for path in sorted(self.files):
+        info = tarfile.TarInfo(prefix + path)
+        info.size = len(self.files[path])
+        tar.addfile(info, StringIO(self.files[path]))
+    return location
+
+
+  def make_zip(self, name, prefix=''):
+    location = os.path.join(self.workdir, name)
+    with zipfile.ZipFile(location, 'w') as archive:
+      if prefix:
+        archive.writestr(prefix, '')
+      for path in sorted(self.files):
+        archive.writestr(prefix + path, self.files[path])
+    return location
+
+
+  def write_tarball(self, archived_app):
+    fileobj = StringIO()
+    archived_app.write_tarball(fileobj, AppPackager(workers=1))
+    return fileobj.getvalue()
+
+
+  def assert_tarball_has_files(self, tarball):
+    with tarfile.open(fileobj=StringIO(tarball), mode='r:gz') as tar:
+      self.assertEquals(sorted(self.files), sorted(
+        member.name for member in tar if member.isfile()))
+      for path, contents in self.files.iteritems():
+        self.assertEquals(contents, tar.extractfile(path).read())
+
+
+  def test_tar_gz_is_passed_through(self):
+    location = self.make_tar('guestbook.tar.gz')
+    archived_app = ArchivedApp(location)
+    self.assertEquals('guestbook', archived_app.app_config.app_id)
+    self.assertEquals('python27', archived_app.app_config.runtime)
+    self.assertTrue(archived_app.passthrough)
+
+    with open(location, 'rb') as archive_file:
+      self.assertEquals(archive_file.read(), self.write_tarball(archived_app))
+
+
+  def test_tar_gz_with_directory_is_repacked(self):
+    # the app's directory should become the root of the tarball, as it did
+    # when the archive was extracted
+    archived_app = ArchivedApp(self.make_tar('guestbook.tar.gz',
+                                             './guestbook/'))
+    self.assertEquals('guestbook/', archived_app.root)
+    self.assertFalse(archived_app.passthrough)
+    self.assert_tarball_has_files(self.write_tarball(archived_app))
+
+
+  def test_zip_is_repacked(self):
+    archived_app = ArchivedApp(self.make_zip('guestbook.zip', 'guestbook/'))
+    self.assertEquals('guestbook', archived_app.app_config.app_id)
+    self.assertFalse(archived_app.passthrough)
+    self.assert_tarball_has_files(self.write_tarball(archived_app))
+
+
+  def test_zip_symlinks_are_kept(self):
+    location = self.make_zip('guestbook.zip', 'guestbook/')
+    with zipfile.ZipFile(location, 'a') as archive:
+      link = zipfile.ZipInfo('guestbook/current.py')
+      link.create_system = ArchivedApp.ZIP_UNIX_SYSTEM
+      link.external_attr = (stat.S_IFLNK | 0777) << 16
+      archive.writestr(link, 'main.py')
+
+    tarball = self.write_tarball(ArchivedApp(location))
+    with tarfile.open(fileobj=StringIO(tarball), mode='r:gz') as tar:
+      member = tar.getmember('current.py')
+      self.assertTrue(member.issym())
+      self.assertEquals('main.py', member.linkname)
+
+
+  def test_dot_files_next_to_the_app_are_ignored(self):
+    location = self.make_zip('guestbook.zip', 'guestbook/')
+    with zipfile.ZipFile(location, 'a') as archive:
+      archive.writestr('.DS_Store', '')
+    self.assertEquals('guestbook/', ArchivedApp(location).root)
+
+
+  def test_java_zip(self):
+    del self.files['app.yaml']
+    self.files['war/WEB-INF/appengine-web.xml'] = \
+      '<application>guestbook</application>\n<threadsafe>true</threadsafe>\n'
+    archived_app = ArchivedApp(self.make_zip('guestbook.zip'))
+    self.assertEquals('java', archived_app.app_config.runtime)
+    self.assertTrue(archived_app.is_sdk_mismatch())
+
+    self.files['war/WEB-INF/lib/appengine-api-1.0-sdk-{0}.jar'.format(
+      AppEngineHelper.SUPPORTED_SDK_VERSION)] = ''
+    archived_app = ArchivedApp(self.make_zip('guestbook.zip'))
+    self.assertFalse(archived_app.is_sdk_mismatch())
+
+
+  def test_bad_archives(self):
+    del self.files['app.yaml']
+    self.assertRaises(AppEngineConfigException, ArchivedApp,
+                      self.make_tar('guestbook.tar.gz'))
+
+    location = os.path.join(self.workdir, 'broken.tar.gz')
+    with open(location, 'w') as archive_file:
+      archive_file.write('not an archive')
+    self.assertRaises(AppEngineConfigException, ArchivedApp, location)
+
+
+if __name__ == "__main__":
+  unittest.main()
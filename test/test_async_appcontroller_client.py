@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import Queue
+import threading
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools import async_appcontroller_client
+from appscale.tools.async_appcontroller_client import AsyncAppControllerClient
+from appscale.tools.custom_exceptions import AppControllerException
+from appscale.tools.custom_exceptions import TimeoutException
+
+
+class TestAsyncAppControllerClient(unittest.TestCase):
+
+
+  def setUp(self):
+    # give each test a pool of its own, since workers left by other tests
+    # wait on the old queue forever
+    AsyncAppControllerClient.pending_calls = Queue.Queue()
+    AsyncAppControllerClient.workers = []
+    AsyncAppControllerClient.idle_workers = 0
+    AsyncAppControllerClient.unclaimed_calls = 0
+
+
+  def test_calls_run_concurrently(self):
+    # each call waits for the other one to start, so they can only finish if
+    # they run at the same time
+    barrier = [threading.Event(), threading.Event()]
+    def get_all_private_ips():
+      barrier[0].set()
+      barrier[1].wait(5)
+      return ['private1']
+    def get_cluster_stats():
+      barrier[1].set()
+      barrier[0].wait(5)
+      return [{'private_ip': 'private1'}]
+
+    client = flexmock(name='client', get_all_private_ips=get_all_private_ips,
+      get_cluster_stats=get_cluster_stats)
+    async_client = AsyncAppControllerClient(client)
+    ips_future = async_client.get_all_private_ips()
+    stats_future = async_client.get_cluster_stats()
+    self.assertEquals(['private1'], ips_future.result(5))
+    self.assertEquals([{'private_ip': 'private1'}], stats_future.result(5))
+    self.assertTrue(ips_future.done())
+
+
+  def test_bursts_after_the_pool_is_idle_run_concurrently(self):
+    # each call waits for every other call in its burst to start, so a burst
+    # can only finish if its calls run at the same time
+    def run_burst(size):
+      started = [0]
+      lock = threading.Lock()
+      all_started = threading.Event()
+      def wait_for_burst():
+        with lock:
+          started[0] += 1
+          if started[0] == size:
+            all_started.set()
+        return all_started.wait(5)
+
+      futures = [AsyncAppControllerClient.submit(wait_for_burst)
+                 for _ in range(size)]
+      return [future.result(5) for future in futures]
+
+    self.assertEquals([True] * 2, run_burst(2))
+
+    # the workers from the first burst are idle now, and a larger burst should
+    # still get a worker for each call instead of queueing behind them
+    self.assertEquals([True] * 5, run_burst(5))
+
+
+  def test_exceptions_are_raised_by_result(self):
+    client = flexmock(name='client')
+    client.should_receive('get_role_info').and_raise(AppControllerException)
+    future = AsyncAppControllerClient(client).get_role_info()
+    self.assertRaises(AppControllerException, future.result, 5)
+
+
+  def test_call_all(self):
+    # public2 never answers, so it should miss the shared deadline
+    release = threading.Event()
+    public1 = flexmock(name='public1')
+    public1.should_receive('is_initialized').and_return(True).once()
+    public2 = flexmock(name='public2')
+    public2.should_receive('is_initialized').replace_with(release.wait)
+    flexmock(async_appcontroller_client)
+    async_appcontroller_client.should_receive('AppControllerClient')\
+      .with_args('public1', 'secret').and_return(public1)
+    async_appcontroller_client.should_receive('AppControllerClient')\
+      .with_args('public2', 'secret').and_return(public2)
+
+    try:
+      results, errors = AsyncAppControllerClient.call_all(
+        ['public1', 'public2', 'public1'], 'secret', 'is_initialized',
+        deadline=0.2)
+    finally:
+      release.set()
+
+    self.assertEquals({'public1': True}, results)
+    self.assertEquals(['public2'], errors.keys())
+    self.assertTrue(isinstance(errors['public2'], TimeoutException))
+
+
+if __name__ == "__main__":
+  unittest.main()
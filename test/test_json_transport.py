@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import gzip
+import json
+import os
+import socket
+import unittest
+from StringIO import StringIO
+
+
+# Third party libraries
+from flexmock import flexmock
+import SOAPpy
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.appcontroller_client import AppControllerClient
+from appscale.tools.json_transport import JSONProxy
+from appscale.tools.soap_transport import HTTPSConnectionPool
+
+
+class TestJSONTransport(unittest.TestCase):
+
+
+  def setUp(self):
+    JSONProxy.supported_methods = {}
+    os.environ[JSONProxy.TRANSPORT_ENV_VAR] = JSONProxy.JSON_TRANSPORT
+
+
+  def tearDown(self):
+    JSONProxy.supported_methods = {}
+    del os.environ[JSONProxy.TRANSPORT_ENV_VAR]
+
+
+  def fake_response(self, status, value, compress=False):
+    body = json.dumps(value)
+    content_type = 'application/json'
+    if isinstance(value, str):
+      body = value
+      content_type = 'text/plain; charset=utf-8'
+    encoding = ''
+    if compress:
+      compressed = StringIO()
+      with gzip.GzipFile(fileobj=compressed, mode='wb') as gzip_file:
+        gzip_file.write(body)
+      body = compressed.getvalue()
+      encoding = 'gzip'
+    response = flexmock(name='response', status=status, reason='reason')
+    response.should_receive('getheader').with_args('content-encoding', '')\
+      .and_return(encoding)
+    response.should_receive('getheader').with_args('content-type', '')\
+      .and_return(content_type)
+    return response, body
+
+
+  def test_negotiated_methods_use_json(self):
+    fake_soap = flexmock(name='fake_soap')
+    fake_soap.should_receive('is_done_initializing').with_args('secret')\
+      .and_return(True)
+    flexmock(SOAPpy).should_receive('SOAPProxy')\
+      .with_args('https://public1:17443').and_return(fake_soap)
+
+    flexmock(HTTPSConnectionPool).should_receive('request')\
+      .with_args('public1:17443', 'GET', '/json', None, dict, 5)\
+      .and_return(self.fake_response(200, {'methods':
+        ['get_cluster_stats_json']})).once()
+    flexmock(HTTPSConnectionPool).should_receive('request')\
+      .with_args('public1:17443', 'POST', '/json/get_cluster_stats_json',
+                 '["secret"]', dict)\
+      .and_return(self.fake_response(200, '[{"public_ip": "public1"}]',
+                                     compress=True))
+
+    client = AppControllerClient('public1', 'secret')
+    self.assertTrue(isinstance(client.server, JSONProxy))
+    self.assertEquals([{'public_ip': 'public1'}], client.get_cluster_stats())
+
+    # methods that aren't served over JSON should still use SOAP
+    self.assertTrue(client.is_initialized())
+
+    # and the negotiation should be remembered by later clients
+    self.assertTrue(AppControllerClient('public1', 'secret').is_initialized())
+
+
+  def test_negotiates_on_first_call(self):
+    fake_soap = flexmock(name='fake_soap')
+    flexmock(SOAPpy).should_receive('SOAPProxy').and_return(fake_soap)
+
+    # Creating a client shouldn't wait for the AppController to answer.
+    flexmock(HTTPSConnectionPool).should_receive('request').never()
+    client = AppControllerClient('public1', 'secret')
+    self.assertTrue(isinstance(client.server, JSONProxy))
+    self.assertEquals({}, JSONProxy.supported_methods)
+
+
+  def test_falls_back_to_soap(self):
+    fake_soap = flexmock(name='fake_soap')
+    fake_soap.should_receive('get_all_stats').with_args('secret')\
+      .and_return('{}')
+    flexmock(SOAPpy).should_receive('SOAPProxy').and_return(fake_soap)
+
+    # AppControllers that can't be reached over JSON should use SOAP, and be
+    # asked again on the next call in case they weren't running yet
+    flexmock(HTTPSConnectionPool).should_receive('request')\
+      .with_args('public1:17443', 'GET', '/json', None, dict, 5)\
+      .and_raise(socket.error).twice()
+    client = AppControllerClient('public1', 'secret')
+    self.assertEquals('{}', client.get_all_stats())
+    self.assertFalse('public1:17443' in JSONProxy.supported_methods)
+    self.assertEquals('{}', client.get_all_stats())
+
+    # and so should methods that an AppController stops serving over JSON
+    JSONProxy.supported_methods['public2:17443'] = set(['get_all_stats'])
+    flexmock(HTTPSConnectionPool).should_receive('request')\
+      .with_args('public2:17443', 'POST', '/json/get_all_stats', '["secret"]',
+                 dict)\
+      .and_return(self.fake_response(404, None)).once()
+    self.assertEquals('{}',
+                      AppControllerClient('public2', 'secret').get_all_stats())
+    self.assertEquals(None, JSONProxy.supported_methods['public2:17443'])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -30,6 +30,7 @@ from appscale.tools.local_state import LocalState
 from appscale.tools.node_layout import NodeLayout
 from appscale.tools.node_layout import SimpleNode
 from appscale.tools.parse_args import ParseArgs
+from appscale.tools.retry_policy import RetryPolicy
 
 
 class TestLocalState(unittest.TestCase):
@@ -203,51 +204,6 @@ class TestLocalState(unittest.TestCase):
     LocalState.update_local_metadata(options, 'public1', 'public1')
 
 
-  def test_extract_tgz_app_to_dir(self):
-    flexmock(os)
-    os.should_receive('mkdir').and_return()
-    flexmock(os.path)
-    os.path.should_receive('abspath').with_args('relative/app.tar.gz') \
-      .and_return('/tmp/relative/app.tar.gz')
-
-    flexmock(LocalState)
-    LocalState.should_receive('shell') \
-      .with_args(re.compile("tar zxvf '/tmp/relative/app.tar.gz'"), False) \
-      .and_return()
-
-    os.should_receive('listdir').and_return(['one_folder'])
-    os.path.should_receive('isdir').with_args(re.compile('one_folder')) \
-      .and_return(True)
-
-    location = LocalState.extract_tgz_app_to_dir('relative/app.tar.gz', False)
-    self.assertEquals(True, 'one_folder' in location)
-
-
-  def test_extract_tgz_app_to_dir_with_dotfiles(self):
-    flexmock(os)
-    os.should_receive('mkdir').and_return()
-    flexmock(os.path)
-    os.path.should_receive('abspath').with_args('relative/app.tar.gz') \
-      .and_return('/tmp/relative/app.tar.gz')
-
-    flexmock(LocalState)
-    LocalState.should_receive('shell') \
-      .with_args(re.compile("tar zxvf '/tmp/relative/app.tar.gz'"), False) \
-      .and_return()
-
-    os.should_receive('listdir').and_return(['one_folder', '.dot_file',
-      '.dot_folder'])
-    os.path.should_receive('isdir').with_args(re.compile('one_folder')) \
-      .and_return(True)
-    os.path.should_receive('isdir').with_args(re.compile('.dot_file')) \
-      .and_return(False)
-    os.path.should_receive('isdir').with_args(re.compile('.dot_folder')) \
-      .and_return(True)
-
-    location = LocalState.extract_tgz_app_to_dir('relative/app.tar.gz', False)
-    self.assertTrue('one_folder' in location)
-
-
   def test_shell_exceptions(self):
     fake_tmp_file = flexmock(name='tempfile')
     fake_tmp_file.should_receive('write').and_return()
@@ -278,6 +234,78 @@ class TestLocalState(unittest.TestCase):
         stdin='fake_stdin')
 
 
+  def test_shell_retry_policy(self):
+    fake_tmp_file = flexmock(name='tempfile')
+    fake_tmp_file.should_receive('read').and_return('ls: cannot access')
+    fake_tmp_file.should_receive('seek').and_return()
+    fake_tmp_file.should_receive('close').and_return()
+    flexmock(tempfile).should_receive('NamedTemporaryFile')\
+      .and_return(fake_tmp_file)
+
+    fake_result = flexmock(name='result', returncode=2)
+    fake_result.should_receive('wait').and_return()
+    fake_subprocess = flexmock(subprocess)
+    fake_subprocess.STDOUT = ''
+    flexmock(time).should_receive('sleep').and_return()
+
+    # command errors fail immediately when only transport errors are retried
+    fake_subprocess.should_receive('Popen').and_return(fake_result).once()
+    self.assertRaises(ShellException, LocalState.shell, 'fake_cmd', False,
+      RetryPolicy.transport_errors_only())
+
+    # but transport errors are retried with backoff
+    fake_result.returncode = RetryPolicy.SSH_TRANSPORT_ERROR
+    fake_subprocess.should_receive('Popen').and_return(fake_result).times(3)
+    time.should_receive('sleep').with_args(float).times(2)
+    self.assertRaises(ShellException, LocalState.shell, 'fake_cmd', False,
+      RetryPolicy.transport_errors_only(3))
+
+
+  def test_stream_shell(self):
+    # each line should be yielded as it is read, with the host in front
+    lines = LocalState.stream_shell('printf "one\\ntwo\\n"', False,
+      prefix='public1')
+    self.assertEquals('public1: one', next(lines))
+    self.assertEquals(['public1: two'], list(lines))
+
+    # and stdin should be passed on to the command
+    self.assertEquals(['three'], list(LocalState.stream_shell('cat', False,
+      stdin='three\n')))
+
+    # failures should raise with the last lines of output
+    flexmock(time).should_receive('sleep').and_return()
+    try:
+      list(LocalState.stream_shell('echo boom; exit 3', False, 2))
+      self.fail('stream_shell should have raised a ShellException')
+    except ShellException as shell_error:
+      self.assertIn('boom', str(shell_error))
+
+
+  def test_shell_redacts_secret_heredocs(self):
+    # the contents of secret here documents should never be logged
+    logged = []
+    flexmock(AppScaleLogger).should_receive('verbose').replace_with(
+      lambda message, is_verbose: logged.append(message))
+    script = "cat <<'APPSCALE-SECRET-KEY' >/dev/null\nhunter2\n" \
+      "APPSCALE-SECRET-KEY\nexit 3"
+    try:
+      LocalState.shell('bash', True, 1, stdin=script)
+      self.fail('shell should have raised a ShellException')
+    except ShellException as shell_error:
+      # nor put in error messages
+      self.assertNotIn('hunter2', str(shell_error))
+      self.assertIn('exit 3', str(shell_error))
+    self.assertTrue(logged)
+    self.assertFalse([message for message in logged if 'hunter2' in message])
+
+    # while the rest of a script is kept as is
+    self.assertEquals("cat <<'APPSCALE-SECRET-KEY'\n<redacted>\n"
+      "APPSCALE-SECRET-KEY\nexit 3", LocalState.redact(
+      "cat <<'APPSCALE-SECRET-KEY'\nhunter2\nAPPSCALE-SECRET-KEY\nexit 3"))
+    self.assertEquals("cat <<'EOF'\nhunter2\nEOF", LocalState.redact(
+      "cat <<'EOF'\nhunter2\nEOF"))
+
+
   def test_generate_crash_log(self):
     crashlog_suffix = '123456'
     flexmock(uuid)
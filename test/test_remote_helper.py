@@ -1,16 +1,23 @@
 #!/usr/bin/env python
 
 # General-purpose Python library imports
+import base64
+import hashlib
+import io
 import json
 import os
 import re
 import socket
 import subprocess
 import sys
+import tarfile
 import tempfile
+import threading
 import time
 import unittest
 
+from StringIO import StringIO
+
 
 # Third party libraries
 import boto.ec2
@@ -26,12 +33,21 @@ from appscale.tools.agents.gce_agent import GCEAgent
 from appscale.tools.appcontroller_client import AppControllerClient
 from appscale.tools.appscale_logger import AppScaleLogger
 from appscale.tools.custom_exceptions import BadConfigurationException
+from appscale.tools.custom_exceptions import ShellException
+from appscale.tools.custom_exceptions import TimeoutException
 from appscale.tools.local_state import LocalState
 from appscale.tools.node_layout import NodeLayout
 from appscale.tools.node_layout import SimpleNode
 from appscale.tools.remote_helper import RemoteHelper
 
 
+def script_output(num_steps):
+  """Returns the output that a script started by RemoteHelper.run_script
+  produces when all of its steps succeed."""
+  return '\n'.join('{0} {1} 0'.format(RemoteHelper.SCRIPT_STEP_MARKER, index)
+                   for index in range(num_steps))
+
+
 class FakeAgent(object):
   PARAM_CREDENTIALS = None
   PARAM_SPOT_PRICE = None
@@ -166,6 +182,8 @@ class TestRemoteHelper(unittest.TestCase):
 
     # assume that ssh comes up on the third attempt
     fake_socket = flexmock(name='fake_socket')
+    fake_socket.should_receive('settimeout').with_args(float)
+    fake_socket.should_receive('close')
     fake_socket.should_receive('connect').with_args(('public1',
       RemoteHelper.SSH_PORT)).and_raise(Exception).and_raise(Exception) \
       .and_return(None)
@@ -312,13 +330,128 @@ class TestRemoteHelper(unittest.TestCase):
 
     # assume the rsyncs succeed
     local_state = flexmock(LocalState)
-    local_state.should_receive('shell')\
-      .with_args(re.compile('^rsync'),False)\
-      .and_return().ordered()
+    local_state.should_receive('stream_shell')\
+      .with_args(re.compile('^rsync'), False, 5, prefix='public1',
+        timestamps=True)\
+      .and_return(iter(['sending incremental file list'])).once()
 
     RemoteHelper.rsync_files('public1', 'booscale', '/tmp/booscale-local',
       False)
 
+  def test_ssh_connections_are_multiplexed(self):
+    # connections to the same host, user, and keyname should share a single
+    # control socket, while other connections should get their own
+    options = RemoteHelper.get_ssh_options('public1', 'bookey')
+    self.assertTrue('-o ControlMaster=auto' in options)
+    self.assertTrue(options.startswith(RemoteHelper.SSH_OPTIONS))
+
+    same_options = RemoteHelper.get_ssh_options('public1', 'bookey')
+    self.assertEquals(options, same_options)
+
+    other_host = RemoteHelper.get_ssh_options('public2', 'bookey')
+    other_user = RemoteHelper.get_ssh_options('public1', 'bookey', 'ubuntu')
+    self.assertNotEquals(options, other_host)
+    self.assertNotEquals(options, other_user)
+
+    # and ssh should use the multiplexed connection
+    local_state = flexmock(LocalState)
+    local_state.should_receive('shell').with_args(
+      re.compile('^ssh .*ControlPath={0} .*root@public1 bash'.format(
+        RemoteHelper.ssh_control_paths[('public1', 'root', 'bookey')])),
+      False, 5, stdin='ls').and_return()
+    RemoteHelper.ssh('public1', 'bookey', 'ls', False)
+
+
+  def test_close_ssh_connections(self):
+    RemoteHelper.close_ssh_connections()
+    RemoteHelper.get_ssh_options('public1', 'bookey')
+    RemoteHelper.get_ssh_options('public2', 'bookey')
+    public1_path = RemoteHelper.ssh_control_paths[
+      ('public1', 'root', 'bookey')]
+
+    # only public1 had a master connection opened, so only it should be closed
+    flexmock(os.path)
+    os.path.should_call('exists')
+    os.path.should_receive('exists').with_args(public1_path).and_return(True)
+
+    local_state = flexmock(LocalState)
+    local_state.should_receive('shell').with_args(
+      re.compile('^ssh .*ControlPath={0} -O exit root@public1'.format(
+        public1_path)), False, num_retries=1).and_return().once()
+
+    RemoteHelper.close_ssh_connections()
+    self.assertEquals({}, RemoteHelper.ssh_control_paths)
+
+
+  def test_wait_for_ports(self):
+    # public1 accepts connections right away, but public2 never does
+    fake_socket = flexmock(name='fake_socket')
+    fake_socket.should_receive('settimeout').with_args(float)
+    fake_socket.should_receive('connect').with_args(('public1',
+      RemoteHelper.SSH_PORT)).and_return(None)
+    fake_socket.should_receive('connect').with_args(('public2',
+      RemoteHelper.SSH_PORT)).and_raise(socket.timeout)
+
+    # every socket that is opened should be closed
+    socket_count = {'opened': 0}
+    def count_socket():
+      socket_count['opened'] += 1
+      return fake_socket
+    flexmock(socket).should_receive('socket').replace_with(count_socket)
+    closed = []
+    fake_socket.should_receive('close').replace_with(lambda: closed.append(1))
+
+    targets = [('public1', RemoteHelper.SSH_PORT),
+               ('public2', RemoteHelper.SSH_PORT)]
+    self.assertEquals([('public2', RemoteHelper.SSH_PORT)],
+      RemoteHelper.wait_for_ports(targets, False, deadline=0.2))
+    self.assertEquals(socket_count['opened'], len(closed))
+
+
+  def test_wait_for_many_ports(self):
+    # large deployments shouldn't start a thread for every port
+    targets = [('public{0}'.format(index), RemoteHelper.SSH_PORT)
+               for index in range(RemoteHelper.MAX_FAN_OUT_WORKERS + 5)]
+    flexmock(RemoteHelper).should_receive('fan_out').with_args(targets,
+      object).and_return((dict((target, True) for target in targets), {}))\
+      .once()
+    self.assertEquals([], RemoteHelper.wait_for_ports(targets, False))
+
+
+  def test_terminate_cloud_infrastructure_detaches_disks_serially(self):
+    # disks are unmounted on every machine at once, but the cloud is only
+    # connected to from this thread
+    flexmock(LocalState).should_receive('get_infrastructure').\
+      and_return('gce')
+    flexmock(LocalState).should_receive('get_local_nodes_info').and_return([
+      {'public_ip': 'public1', 'instance_id': 'i-1', 'disk': 'disk1'},
+      {'public_ip': 'public2', 'instance_id': 'i-2'},
+      {'public_ip': 'public3', 'instance_id': 'i-3', 'disk': 'disk3'}])
+    flexmock(LocalState).should_receive('cleanup_keyname').once()
+    unmounted = []
+    flexmock(RemoteHelper).should_receive('unmount_persistent_disk').\
+      replace_with(lambda host, keyname, is_verbose: unmounted.append(host))
+
+    detached = []
+    def detach_disk(params, disk, instance_id):
+      detached.append((disk, instance_id, threading.current_thread()))
+    agent = flexmock(name='agent', PARAM_INSTANCE_IDS='instance_ids',
+                     detach_disk=detach_disk)
+    agent.should_receive('get_cloud_params').and_return({})
+    agent.should_receive('describe_instances').and_return(
+      ([], [], ['i-1', 'i-2', 'i-3']))
+    agent.should_receive('terminate_instances').once()
+    agent.should_receive('cleanup_state').once()
+    flexmock(factory.InfrastructureAgentFactory).\
+      should_receive('create_agent').and_return(agent)
+
+    RemoteHelper.terminate_cloud_infrastructure('bookey', False)
+    self.assertEquals(['public1', 'public3'], sorted(unmounted))
+    self.assertEquals([('disk1', 'i-1', threading.current_thread()),
+                       ('disk3', 'i-3', threading.current_thread())],
+                      detached)
+
+
   def test_copy_deployment_credentials_in_cloud(self):
     options = flexmock(
       keyname='key1',
@@ -327,18 +460,32 @@ class TestRemoteHelper(unittest.TestCase):
     )
 
     local_state = flexmock(LocalState)
-    remote_helper = flexmock(RemoteHelper)
-    local_state.should_receive('get_secret_key_location').and_return()
-    local_state.should_receive('get_key_path_from_name').and_return()
-    local_state.should_receive('get_certificate_location').and_return()
-    local_state.should_receive('get_private_key_location').and_return()
-
-    remote_helper.should_receive('scp').and_return()
+    local_state.should_receive('get_secret_key_location').\
+      and_return('/root/.appscale/key1.secret')
+    local_state.should_receive('get_key_path_from_name').\
+      and_return('/root/.appscale/key1.key')
+    local_state.should_receive('get_certificate_location').\
+      and_return('/root/.appscale/key1-cert.pem')
+    local_state.should_receive('get_private_key_location').\
+      and_return('/root/.appscale/key1-key.pem')
     local_state.should_receive('generate_ssl_cert').and_return()
-    popen_object = flexmock(communicate=lambda: ['hash_id'])
-    flexmock(subprocess).should_receive('Popen').and_return(popen_object)
-    remote_helper.should_receive('ssh').and_return()
-    flexmock(AppScaleLogger).should_receive('log').and_return()
+
+    # all of the credentials should be sent at once, and the certificate
+    # hashed on the node instead of here
+    credentials = [
+      ('/root/.appscale/key1.secret', '/etc/appscale/secret.key', 0600),
+      ('/root/.appscale/key1.key', '/etc/appscale/ssh.key', 0600),
+      ('/root/.appscale/key1-cert.pem', '/etc/appscale/certs/mycert.pem',
+       0644),
+      ('/root/.appscale/key1-key.pem', '/etc/appscale/certs/mykey.pem', 0600)
+    ]
+    remote_helper = flexmock(RemoteHelper)
+    remote_helper.should_receive('push_bundle').with_args('public1', 'key1',
+      credentials, True, post_commands=['ln -fs /etc/appscale/certs/mycert.pem '
+      '/etc/ssl/certs/$(openssl x509 -hash -noout -in '
+      '/etc/appscale/certs/mycert.pem).0']).\
+      and_return().once()
+    flexmock(subprocess).should_receive('Popen').never()
 
     RemoteHelper.copy_deployment_credentials('public1', options)
 
@@ -351,29 +498,67 @@ class TestRemoteHelper(unittest.TestCase):
       infrastructure='gce',
       verbose=True,
     )
-    local_state.should_receive('get_oauth2_storage_location').and_return()
+    local_state.should_receive('get_client_secrets_location').\
+      and_return('/root/.appscale/key1-secrets.json')
+    local_state.should_receive('get_oauth2_storage_location').\
+      and_return('/root/.appscale/key1-oauth2.dat')
+    gce_credentials = credentials + [
+      ('/root/.appscale/key1-secrets.json',
+       '/etc/appscale/client_secrets.json', 0600),
+      ('/root/.appscale/key1-oauth2.dat', '/etc/appscale/oauth2.dat', 0600)
+    ]
+    remote_helper.should_receive('push_bundle').with_args('public1', 'key1',
+      gce_credentials, True, post_commands=list).and_return().once()
 
     RemoteHelper.copy_deployment_credentials('public1', options)
 
+
+  def test_push_bundle(self):
+    # the archive should hold each file under its remote path
+    flexmock(sys.modules['__builtin__']).should_receive('open').\
+      with_args('/root/.appscale/bookey.secret', 'rb').\
+      replace_with(lambda path, mode: io.BytesIO('secret'))
+    entries = [('/root/.appscale/bookey.secret', '/etc/appscale/secret.key',
+                0600)]
+    bundle = tarfile.open(fileobj=StringIO(RemoteHelper.build_bundle(entries)))
+    member = bundle.getmember('etc/appscale/secret.key')
+    self.assertEquals(0600, member.mode)
+    self.assertEquals('secret', bundle.extractfile(member).read())
+
+    # and be sent with the install and post commands in one session
+    flexmock(LocalState).should_receive('shell').with_args(re.compile('^ssh'),
+      False, 5, stdin=re.compile('(?s)base64 -d.*mv -f '
+        '"/etc/appscale/secret.key.new" "/etc/appscale/secret.key".*chmod')).\
+      and_return(script_output(4)).once()
+    RemoteHelper.push_bundle('public1', 'bookey', entries, False,
+      post_commands=['chmod 600 /etc/appscale/secret.key'])
+
+    # and the archive should be left out of the error if unpacking it fails
+    encoded_bundle = base64.encodestring(RemoteHelper.build_bundle(entries))
+    flexmock(LocalState).should_receive('shell').and_return(
+      script_output(1) + '\n{0} 1 2'.format(RemoteHelper.SCRIPT_STEP_MARKER))
+    try:
+      RemoteHelper.push_bundle('public1', 'bookey', entries, False)
+      self.fail('push_bundle should have raised a ShellException')
+    except ShellException as shell_error:
+      self.assertIn('<redacted>', str(shell_error))
+      self.assertNotIn(encoded_bundle.split()[0], str(shell_error))
+
+
   def test_start_remote_appcontroller(self):
-    # mock out removing the old json file
+    # mock out removing the old json file, starting monit, and starting the
+    # AppController on public1, which all happen in a single script
     local_state = flexmock(LocalState)
     local_state.should_receive('shell')\
-      .with_args(re.compile('^ssh'),False,5,stdin=re.compile('rm -rf'))\
-      .and_return()
-
-    # assume we started monit on public1 fine
-    local_state.should_receive('shell')\
-      .with_args(re.compile('^ssh'), False, 5, stdin=re.compile('monit'))\
-      .and_return()
-
-    # and assume we started the AppController on public1 fine
-    local_state.should_receive('shell').with_args(
-      re.compile('^ssh'), False, 5, stdin='service appscale-controller start')
+      .with_args(re.compile('^ssh'), False, 5,
+        stdin=re.compile('(?s)rm -rf.*monit.*service appscale-controller start'))\
+      .and_return(script_output(4)).once()
 
     # finally, assume the appcontroller comes up after a few tries
     # assume that ssh comes up on the third attempt
     fake_socket = flexmock(name='fake_socket')
+    fake_socket.should_receive('settimeout').with_args(float)
+    fake_socket.should_receive('close')
     fake_socket.should_receive('connect').with_args(('public1',
       AppControllerClient.PORT)).and_raise(Exception) \
       .and_raise(Exception).and_return(None)
@@ -389,25 +574,143 @@ class TestRemoteHelper(unittest.TestCase):
     RemoteHelper.start_remote_appcontroller('public1', 'bookey', False)
 
 
-  def test_copy_local_metadata(self):
-    # Assume the locations files were copied successfully.
+  def test_run_script(self):
+    # both steps should be sent in a single ssh call, and their outputs
+    # should be decoded from the envelope
     local_state = flexmock(LocalState)
-    locations_yaml = '{}/locations-bookey.yaml'.\
-      format(RemoteHelper.CONFIG_DIR)
-    local_state.should_receive('shell').with_args(
-      re.compile('^scp .*{}'.format(locations_yaml)), False, 5)
+    local_state.should_receive('shell').with_args(re.compile('^ssh'), False,
+      5, stdin=re.compile('(?s)mktemp.*hostname.*whoami')).and_return(
+      'Welcome to Ubuntu\n'
+      '{0} 0 0 cHVibGljMQo=\n'
+      '{0} 1 0 cm9vdAo=\n'.format(RemoteHelper.SCRIPT_STEP_MARKER)).once()
 
-    locations_json = '{}/locations-bookey.json'.\
-      format(RemoteHelper.CONFIG_DIR)
-    local_state.should_receive('shell').with_args(
-      re.compile('^scp .*{}'.format(locations_json)), False, 5)
+    results = RemoteHelper.run_script('public1', 'bookey',
+      ['hostname', 'whoami'], False)
+    self.assertEquals([
+      {'command': 'hostname', 'exit_code': 0, 'output': 'public1\n'},
+      {'command': 'whoami', 'exit_code': 0, 'output': 'root\n'}], results)
 
-    local_state.should_receive('shell').with_args(
-      re.compile('^scp .*/root/.appscale/locations-bookey.json'), False, 5)
 
-    # Assume the secret file was copied successfully.
-    local_state.should_receive('shell').with_args(
-      re.compile('^scp .*bookey.secret'), False, 5)
+  def test_run_script_with_failing_step(self):
+    # the script stops at the first failing step, and is retried
+    local_state = flexmock(LocalState)
+    local_state.should_receive('shell').with_args(re.compile('^ssh'), False,
+      2, stdin=str).and_return(
+      '{0} 0 0\n{0} 1 1 Ym9vbQo=\n'.format(RemoteHelper.SCRIPT_STEP_MARKER)
+      ).twice()
+
+    self.assertRaises(ShellException, RemoteHelper.run_script, 'public1',
+      'bookey', ['true', 'false', 'true'], False, num_retries=2)
+
+
+  def fake_stream_process(self, received, digest=None):
+    flexmock(LocalState).should_receive('get_key_path_from_name')\
+      .and_return('/root/.appscale/bookey.key')
+    # the remote host reports the hash of what it received once it finishes
+    def read_output():
+      remote_digest = digest or hashlib.sha1(received.getvalue()).hexdigest()
+      return '{0}  /opt/appscale/apps/app.tar.gz.part\n'.format(remote_digest)
+
+    process = flexmock(name='ssh', returncode=0,
+                       stdin=flexmock(write=received.write, close=lambda: None),
+                       stdout=flexmock(read=read_output))
+    process.should_receive('wait')
+    return process
+
+
+  def test_stream_to_host(self):
+    # the file should be sent over a single ssh session, and only moved into
+    # place once its checksum is verified
+    received = StringIO()
+    process = self.fake_stream_process(received)
+    commands = []
+    def start_stream(command, **kwargs):
+      commands.append(command)
+      return process
+    flexmock(subprocess).should_receive('Popen').with_args(
+      list, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+      stderr=subprocess.STDOUT).replace_with(start_stream)
+    flexmock(RemoteHelper).should_receive('ssh').with_args('public1',
+      'bookey', re.compile(r'^mv -f /opt/appscale/apps/app.tar.gz.\w+.part '
+      '/opt/appscale/apps/app.tar.gz$'), False, 'root').once()
+
+    sent = RemoteHelper.stream_to_host('public1', 'bookey',
+      lambda fileobj: fileobj.write('contents'),
+      '/opt/appscale/apps/app.tar.gz', False)
+    self.assertEquals(8, sent)
+    self.assertEquals('contents', received.getvalue())
+
+    # since ssh's output is read through a pipe, it shouldn't become the
+    # master connection
+    self.assertIn('ControlMaster=no', commands[0])
+
+
+  def test_stream_to_host_with_bad_checksum(self):
+    flexmock(subprocess).should_receive('Popen')\
+      .and_return(self.fake_stream_process(StringIO(), 'bad'))\
+      .and_return(self.fake_stream_process(StringIO(), 'bad')).twice()
+    flexmock(RemoteHelper).should_receive('ssh').with_args('public1',
+      'bookey', re.compile('^rm -f '), False, 'root', num_retries=1).twice()
+
+    self.assertRaises(ShellException, RemoteHelper.stream_to_host, 'public1',
+      'bookey', lambda fileobj: fileobj.write('contents'),
+      '/opt/appscale/apps/app.tar.gz', False, num_retries=2)
+
+
+  def test_fan_out(self):
+    # every host should be operated on once, with successes and failures
+    # reported separately
+    def check_host(host):
+      if host == 'public2':
+        raise ShellException('ssh failed')
+      return host.upper()
+
+    results, errors = RemoteHelper.fan_out(
+      ['public1', 'public2', 'public3', 'public1'], check_host, max_workers=2,
+      description='Checking hosts')
+    self.assertEquals({'public1': 'PUBLIC1', 'public3': 'PUBLIC3'}, results)
+    self.assertEquals(['public2'], errors.keys())
+    self.assertTrue(isinstance(errors['public2'], ShellException))
+
+
+  def test_fan_out_fail_fast(self):
+    # with a single worker, nothing after the first failure should run
+    operated_on = []
+    def fail(host):
+      operated_on.append(host)
+      raise ShellException('ssh failed')
+
+    results, errors = RemoteHelper.fan_out(['public1', 'public2', 'public3'],
+      fail, max_workers=1, fail_fast=True)
+    self.assertEquals({}, results)
+    self.assertEquals(['public1'], errors.keys())
+    self.assertEquals(['public1'], operated_on)
+
+
+  def test_fan_out_deadline(self):
+    # hosts that don't finish in time are reported as timing out
+    release = threading.Event()
+    def hang(host):
+      if host == 'public2':
+        release.wait(5)
+      return host
+
+    results, errors = RemoteHelper.fan_out(['public1', 'public2'], hang,
+      deadline=0.1)
+    release.set()
+    self.assertEquals({'public1': 'public1'}, results)
+    self.assertTrue(isinstance(errors['public2'], TimeoutException))
+
+
+  def test_copy_local_metadata(self):
+    # Assume the locations and secret files were copied successfully.
+    flexmock(RemoteHelper).should_receive('push_bundle').with_args('public1',
+      'bookey', [
+        ('/root/.appscale/locations-bookey.json',
+         '{}/locations-bookey.json'.format(RemoteHelper.CONFIG_DIR), 0644),
+        ('/root/.appscale/bookey.secret',
+         '{}/bookey.secret'.format(RemoteHelper.CONFIG_DIR), 0600)
+      ], False).and_return().once()
 
     RemoteHelper.copy_local_metadata('public1', 'bookey', False)
 
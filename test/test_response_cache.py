@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp() + os.sep
+    flexmock(ResponseCache, CACHE_DIR=self.cache_dir)
+    os.environ[ResponseCache.DISK_CACHE_ENV_VAR] = ResponseCache.DISK_CACHE
+
+
+  def tearDown(self):
+    del os.environ[ResponseCache.DISK_CACHE_ENV_VAR]
+    shutil.rmtree(self.cache_dir)
+
+
+  def test_answers_expire(self):
+    flexmock(time).should_receive('time').and_return(100).and_return(100)\
+      .and_return(200)
+    cache = ResponseCache()
+    cache.put('public1 get_role_info []', '{}', 30)
+
+    hits = ResponseCache.stats['hits']
+    misses = ResponseCache.stats['misses']
+    self.assertEquals((True, '{}'), cache.get('public1 get_role_info []'))
+    self.assertEquals((False, None), cache.get('public1 get_role_info []'))
+    self.assertEquals(hits + 1, ResponseCache.stats['hits'])
+    self.assertEquals(misses + 1, ResponseCache.stats['misses'])
+
+    # without a keyname, nothing should be written to disk
+    self.assertEquals([], os.listdir(self.cache_dir))
+
+
+  def test_disk_tier_is_shared_between_caches(self):
+    writer = ResponseCache('bookey')
+    writer.put('public1 get_role_info []', '{}', 30)
+    self.assertEquals(['responses-bookey.json'], os.listdir(self.cache_dir))
+
+    # a later invocation of the tools should find the answer
+    self.assertEquals((True, '{}'),
+      ResponseCache('bookey').get('public1 get_role_info []'))
+    self.assertEquals((False, None),
+      ResponseCache('otherkey').get('public1 get_role_info []'))
+
+    # and invalidating should remove it from both tiers
+    writer.invalidate()
+    self.assertEquals([], os.listdir(self.cache_dir))
+    self.assertEquals((False, None), writer.get('public1 get_role_info []'))
+
+    # the disk tier is only used when it has been enabled
+    del os.environ[ResponseCache.DISK_CACHE_ENV_VAR]
+    self.assertEquals(None, writer.get_disk_location())
+    os.environ[ResponseCache.DISK_CACHE_ENV_VAR] = ResponseCache.DISK_CACHE
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import random
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.retry_policy import RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+
+  def setUp(self):
+    # take the randomness out of the backoff
+    flexmock(random).should_receive('random').and_return(0)
+
+
+  def test_from_retries(self):
+    # a number of retries keeps the fixed wait that shell commands always had
+    flexmock(random).should_receive('random').and_return(1)
+    policy = RetryPolicy.from_retries(3)
+    self.assertEquals(3, policy.max_attempts)
+    self.assertTrue(policy.is_retryable(1))
+    self.assertEquals([RetryPolicy.FIXED_DELAY, RetryPolicy.FIXED_DELAY, None],
+      [policy.get_delay(attempt, 1) for attempt in range(1, 4)])
+
+    policy = RetryPolicy.non_retryable()
+    self.assertEquals(policy, RetryPolicy.from_retries(policy))
+
+
+  def test_exponential_backoff(self):
+    policy = RetryPolicy(max_attempts=6, base_delay=1, max_delay=5)
+    self.assertEquals([1, 2, 4, 5, 5],
+      [policy.get_delay(attempt, 1) for attempt in range(1, 6)])
+
+    # no more retries are allowed after the last attempt
+    self.assertEquals(None, policy.get_delay(6, 1))
+
+
+  def test_jitter(self):
+    flexmock(random).should_receive('random').and_return(1)
+    policy = RetryPolicy(base_delay=4, jitter=0.5)
+    self.assertEquals(2, policy.get_delay(1, 1))
+
+
+  def test_transport_errors_only(self):
+    policy = RetryPolicy.transport_errors_only()
+    self.assertEquals(1, policy.get_delay(1, RetryPolicy.SSH_TRANSPORT_ERROR))
+    self.assertEquals(None, policy.get_delay(1, 2))
+
+
+  def test_non_retryable(self):
+    self.assertEquals(None, RetryPolicy.non_retryable().get_delay(1, 255))
+
+
+  def test_budget(self):
+    policy = RetryPolicy(base_delay=2, budget=5)
+    self.assertEquals(2, policy.get_delay(1, 1, waited=0))
+    self.assertEquals(None, policy.get_delay(2, 1, waited=2))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import httplib
+import socket
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.soap_transport import HTTPSConnectionPool
+from appscale.tools.soap_transport import PooledHTTPTransport
+
+
+class TestSOAPTransport(unittest.TestCase):
+
+
+  def setUp(self):
+    HTTPSConnectionPool.close_all()
+
+
+  def tearDown(self):
+    HTTPSConnectionPool.close_all()
+
+
+  def fake_response(self, will_close=False):
+    response = flexmock(name='response', status=200, reason='OK',
+      will_close=will_close)
+    response.should_receive('read').and_return('<envelope/>')
+    response.should_receive('getheader').and_return('text/xml')
+    return response
+
+
+  def test_calls_reuse_connections(self):
+    connection = flexmock(name='connection', sock=None)
+    connection.should_receive('request').with_args('POST', '/', '<call/>',
+      dict)
+    connection.should_receive('getresponse').and_return(self.fake_response())
+    connection.should_receive('close')
+
+    # only one connection should be made, even by separate transports
+    flexmock(httplib).should_receive('HTTPSConnection').\
+      and_return(connection).once()
+    for _ in range(2):
+      self.assertEquals(('<envelope/>', None), PooledHTTPTransport().call(
+        'https://public1:17443', '<call/>', None))
+    self.assertEquals({'public1:17443': [connection]},
+      HTTPSConnectionPool.idle_connections)
+
+
+  def test_stale_connections_are_replaced(self):
+    stale = flexmock(name='stale', sock=None)
+    stale.should_receive('request').and_raise(httplib.BadStatusLine(''))
+    stale.should_receive('close').once()
+    HTTPSConnectionPool.release('public1:17443', stale)
+
+    # the request should be sent again on a new connection, which is not
+    # kept if the server asks for it to be closed
+    connection = flexmock(name='connection', sock=None)
+    connection.should_receive('request')
+    connection.should_receive('getresponse').\
+      and_return(self.fake_response(will_close=True))
+    connection.should_receive('close').once()
+    flexmock(httplib).should_receive('HTTPSConnection').\
+      and_return(connection).once()
+
+    PooledHTTPTransport().call('https://public1:17443', '<call/>', None)
+    self.assertEquals({'public1:17443': []},
+      HTTPSConnectionPool.idle_connections)
+
+
+  def test_closed_connections_are_replaced(self):
+    # a kept connection that the server closed ends without a status line
+    stale = flexmock(name='stale', sock=None)
+    stale.should_receive('request')
+    stale.should_receive('getresponse').and_raise(httplib.BadStatusLine(
+      HTTPSConnectionPool.EMPTY_STATUS_LINES[-1]))
+    stale.should_receive('close').once()
+    HTTPSConnectionPool.release('public1:17443', stale)
+
+    # so the request should be sent again on a new connection
+    connection = flexmock(name='connection', sock=None)
+    connection.should_receive('request').once()
+    connection.should_receive('getresponse').and_return(self.fake_response())
+    connection.should_receive('close')
+    flexmock(httplib).should_receive('HTTPSConnection').\
+      and_return(connection).once()
+
+    PooledHTTPTransport().call('https://public1:17443', '<call/>', None)
+
+
+  def test_errors_after_sending_are_raised(self):
+    # once the request was sent, the server may have acted on it, so it
+    # shouldn't be sent again
+    stale = flexmock(name='stale', sock=None)
+    stale.should_receive('request').once()
+    stale.should_receive('getresponse').and_raise(socket.error)
+    stale.should_receive('close').once()
+    HTTPSConnectionPool.release('public1:17443', stale)
+    flexmock(httplib).should_receive('HTTPSConnection').never()
+
+    self.assertRaises(socket.error, PooledHTTPTransport().call,
+      'https://public1:17443', '<call/>', None)
+
+
+  def test_new_connection_errors_are_raised(self):
+    connection = flexmock(name='connection', sock=None)
+    connection.should_receive('request').and_raise(socket.error)
+    connection.should_receive('close').once()
+    flexmock(httplib).should_receive('HTTPSConnection').\
+      and_return(connection).once()
+
+    self.assertRaises(socket.error, PooledHTTPTransport().call,
+      'https://public1:17443', '<call/>', None)
+
+
+if __name__ == "__main__":
+  unittest.main()
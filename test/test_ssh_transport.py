@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import os
+import socket
+import time
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools import ssh_transport
+from appscale.tools.appscale_logger import AppScaleLogger
+from appscale.tools.custom_exceptions import ShellException
+from appscale.tools.local_state import LocalState
+from appscale.tools.remote_helper import RemoteHelper
+from appscale.tools.retry_policy import RetryPolicy
+from appscale.tools.ssh_transport import SSHTransportPool
+
+
+class FakeSSHException(Exception):
+  pass
+
+
+class TestSSHTransport(unittest.TestCase):
+
+
+  def setUp(self):
+    flexmock(AppScaleLogger)
+    AppScaleLogger.should_receive('log').and_return()
+    AppScaleLogger.should_receive('verbose').and_return()
+    flexmock(time)
+    time.should_receive('sleep').and_return()
+    flexmock(LocalState).should_receive('get_key_path_from_name') \
+      .with_args('bookey').and_return('/root/.appscale/bookey.key')
+
+    # pretend that paramiko is installed and the pool has been selected
+    self.paramiko = ssh_transport.paramiko
+    self.fake_paramiko = flexmock(name='paramiko',
+      SSHException=FakeSSHException, AutoAddPolicy=lambda: None)
+    ssh_transport.paramiko = self.fake_paramiko
+    os.environ[SSHTransportPool.TRANSPORT_ENV_VAR] = \
+      SSHTransportPool.POOL_TRANSPORT
+    SSHTransportPool.close_all()
+
+
+  def tearDown(self):
+    ssh_transport.paramiko = self.paramiko
+    del os.environ[SSHTransportPool.TRANSPORT_ENV_VAR]
+    SSHTransportPool.close_all()
+
+
+  def fake_client(self, channel):
+    transport = flexmock(name='transport')
+    transport.should_receive('is_active').and_return(True)
+    transport.should_receive('open_session').and_return(channel)
+
+    client = flexmock(name='client')
+    client.should_receive('set_missing_host_key_policy')
+    client.should_receive('connect').with_args('public1', username='root',
+      key_filename='/root/.appscale/bookey.key', timeout=int,
+      allow_agent=False, look_for_keys=False).once()
+    client.should_receive('get_transport').and_return(transport)
+    client.should_receive('close')
+    return client
+
+
+  def test_is_enabled(self):
+    self.assertTrue(SSHTransportPool.is_enabled())
+
+    del os.environ[SSHTransportPool.TRANSPORT_ENV_VAR]
+    self.assertFalse(SSHTransportPool.is_enabled())
+    os.environ[SSHTransportPool.TRANSPORT_ENV_VAR] = \
+      SSHTransportPool.POOL_TRANSPORT
+
+    ssh_transport.paramiko = None
+    self.assertFalse(SSHTransportPool.is_enabled())
+
+
+  def test_ssh_reuses_pooled_connection(self):
+    channel = flexmock(name='channel')
+    channel.should_receive('set_combine_stderr').with_args(True)
+    channel.should_receive('exec_command').with_args('bash')
+    channel.should_receive('sendall').with_args('ls /')
+    channel.should_receive('shutdown_write')
+    channel.should_receive('recv').and_return('bin etc\n').and_return('') \
+      .and_return('boot\n').and_return('')
+    channel.should_receive('recv_exit_status').and_return(0)
+    channel.should_receive('close')
+
+    # only one connection should be made, and no ssh processes forked
+    client = self.fake_client(channel)
+    self.fake_paramiko.should_receive('SSHClient').and_return(client).once()
+    flexmock(LocalState).should_receive('shell').never()
+
+    self.assertEquals('bin etc\n', RemoteHelper.ssh('public1', 'bookey',
+      'ls /', False))
+    self.assertEquals('boot\n', RemoteHelper.ssh('public1', 'bookey', 'ls /',
+      False))
+
+
+  def test_ssh_raises_after_retries(self):
+    channel = flexmock(name='channel')
+    channel.should_receive('set_combine_stderr')
+    channel.should_receive('exec_command')
+    channel.should_receive('sendall')
+    channel.should_receive('shutdown_write')
+    channel.should_receive('recv').and_return('boom').and_return('')
+    channel.should_receive('recv_exit_status').and_return(1)
+    channel.should_receive('close')
+
+    client = self.fake_client(channel)
+    self.fake_paramiko.should_receive('SSHClient').and_return(client)
+
+    self.assertRaises(ShellException, RemoteHelper.ssh, 'public1', 'bookey',
+      'false', False, num_retries=2)
+
+
+  def test_transfers_follow_retry_policy(self):
+    sftp = flexmock(name='sftp')
+    sftp.should_receive('close')
+    client = flexmock(name='client')
+    client.should_receive('open_sftp').and_return(sftp)
+    flexmock(SSHTransportPool).should_receive('acquire').and_return(client)
+    flexmock(SSHTransportPool).should_receive('discard')
+
+    # connection errors should be retried as many times as allowed
+    copies = []
+    def drop_connection(_):
+      copies.append('copy')
+      raise socket.error('connection reset')
+    self.assertRaises(ShellException, SSHTransportPool._transfer, 'public1',
+      'root', '/root/.appscale/bookey.key', 'copy', drop_connection, False, 2)
+    self.assertEquals(2, len(copies))
+
+    # while a missing file is a failure of the copy itself, which a policy
+    # that only retries transport errors shouldn't repeat
+    copies = []
+    def fail_copy(_):
+      copies.append('copy')
+      raise IOError('No such file or directory')
+    self.assertRaises(ShellException, SSHTransportPool._transfer, 'public1',
+      'root', '/root/.appscale/bookey.key', 'copy', fail_copy, False,
+      RetryPolicy.transport_errors_only())
+    self.assertEquals(1, len(copies))
+
+
+  def test_connection_errors_are_not_pooled(self):
+    client = flexmock(name='client')
+    client.should_receive('set_missing_host_key_policy')
+    client.should_receive('connect')
+    client.should_receive('get_transport').and_raise(socket.error)
+    client.should_receive('close').once()
+    self.fake_paramiko.should_receive('SSHClient').and_return(client)
+
+    self.assertRaises(socket.error, SSHTransportPool.execute, 'public1',
+      'root', '/root/.appscale/bookey.key', 'true')
+    self.assertEquals({}, SSHTransportPool.idle_connections)
+
+
+if __name__ == "__main__":
+  unittest.main()
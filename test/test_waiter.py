@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+
+# General-purpose Python library imports
+import time
+import unittest
+
+
+# Third party libraries
+from flexmock import flexmock
+
+
+# AppScale import, the library that we're testing here
+from appscale.tools.custom_exceptions import TimeoutException
+from appscale.tools.waiter import Waiter
+
+
+class TestWaiter(unittest.TestCase):
+
+
+  def setUp(self):
+    self.sleeps = []
+    self.now = [100.0]
+    def fake_sleep(seconds):
+      self.sleeps.append(seconds)
+      self.now[0] += seconds
+    flexmock(time).should_receive('sleep').replace_with(fake_sleep)
+    flexmock(time).should_receive('time').replace_with(lambda: self.now[0])
+
+
+  def test_delays_back_off_up_to_max_delay(self):
+    answers = [False, False, False, False, False, 'ready']
+    result = Waiter(min_delay=1, max_delay=3).wait(lambda: answers.pop(0))
+    self.assertEquals('ready', result)
+    self.assertEquals([1, 1.5, 2.25, 3, 3], self.sleeps)
+
+
+  def test_deadline_raises_timeout(self):
+    waiter = Waiter(min_delay=1, max_delay=1, deadline=2.5)
+    self.assertRaises(TimeoutException, waiter.wait, lambda: False)
+
+    # the last sleep should be cut short so that we don't overshoot
+    self.assertEquals([1, 1, 0.5], self.sleeps)
+
+
+  def test_long_poll_replaces_sleeping(self):
+    answers = [False, False, False, True]
+    polls = []
+    def long_poll():
+      polls.append(True)
+      if len(polls) == 2:
+        raise ValueError("controller restarting")
+
+    self.assertTrue(Waiter(min_delay=1).wait(lambda: answers.pop(0),
+                                             long_poll=long_poll))
+    self.assertEquals(3, len(polls))
+
+    # only the failed long poll should fall back to sleeping
+    self.assertEquals([1], self.sleeps)
+
+
+if __name__ == "__main__":
+  unittest.main()